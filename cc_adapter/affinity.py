@@ -0,0 +1,23 @@
+import hashlib
+import json
+from typing import Any, Dict
+
+
+def conversation_key(payload: Dict[str, Any]) -> str:
+    """
+    Stable key for a conversation: the system prompt plus the first user turn.
+
+    Every later turn of the same conversation shares that prefix, so pinning the
+    key to one backend or API key keeps the upstream prompt/KV cache warm.
+    """
+    head = []
+    for message in payload.get("messages") or []:
+        if not isinstance(message, dict):
+            continue
+        head.append([message.get("role"), message.get("content")])
+        if message.get("role") == "user":
+            break
+    if not head:
+        return ""
+    raw = json.dumps(head, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,306 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from . import metrics
+from .retry import status_of
+
+logger = logging.getLogger(__name__)
+
+# Conversations remembered for stickiness before the oldest are forgotten.
+MAX_STICKY = 1024
+# Weight of the newest sample in a backend's latency average.
+LATENCY_ALPHA = 0.2
+# Seconds allowed for one health check (GET of the backend's /models).
+HEALTH_TIMEOUT = 5.0
+
+
+def parse_backends(spec: str, fallback: str = "") -> List[Tuple[str, int]]:
+    """
+    Parse LMSTUDIO_BACKENDS: comma-separated chat-completions URLs, each with an
+    optional `*weight` suffix, e.g. "http://gpu1:1234/v1/chat/completions*3, http://gpu2:1234/...".
+
+    Falls back to the single `fallback` URL (LMSTUDIO_BASE) when the spec is empty.
+    """
+    backends: List[Tuple[str, int]] = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, sep, raw_weight = item.rpartition("*")
+        if not sep:
+            url, raw_weight = item, "1"
+        try:
+            weight = int(raw_weight)
+        except ValueError:
+            logger.warning("Ignoring LM Studio backend %r: invalid weight", item)
+            continue
+        if url.strip() and weight > 0:
+            backends.append((url.strip(), weight))
+    if not backends and fallback:
+        backends.append((fallback, 1))
+    return backends
+
+
+def models_url(url: str) -> str:
+    """The /models endpoint next to a backend's chat-completions URL."""
+    base = url.rstrip("/")
+    if base.endswith("/chat/completions"):
+        return base[: -len("/chat/completions")] + "/models"
+    return base + "/models"
+
+
+def _is_backend_failure(exc: BaseException) -> bool:
+    # Bad requests (400 for over-long prompts, ...) are the caller's fault, not the backend's.
+    if isinstance(exc, requests.HTTPError):
+        status = status_of(exc)
+        return status is None or status >= 500
+    return isinstance(exc, requests.RequestException)
+
+
+class Backend:
+    def __init__(self, url: str, weight: int = 1):
+        self.url = url
+        self.weight = weight
+        self.inflight = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.latency = 0.0
+        self.needs_check = False
+        self.checking = False
+        self.checks_failed = 0
+        self.last_ok = time.monotonic()
+
+    def healthy(self, now: float) -> bool:
+        return self.ejected_until <= now and not self.needs_check
+
+    def observe_latency(self, latency: float) -> None:
+        self.latency = latency if not self.latency else LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * self.latency
+
+    def load(self) -> float:
+        return (self.inflight + 1) / self.weight
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        return {
+            "weight": self.weight,
+            "inflight": self.inflight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency": round(self.latency, 3),
+            "ejected_for": round(max(0.0, self.ejected_until - now), 1),
+            "awaiting_check": self.needs_check,
+            "checks_failed": self.checks_failed,
+        }
+
+
+class BackendPool:
+    """
+    Weighted least-outstanding-requests dispatch over LM Studio backends.
+
+    Requests of a known conversation stick to the backend that served it while
+    that backend is healthy. Backends failing `eject_failures` times in a row are
+    ejected for `eject_seconds`; when every backend is ejected the least loaded
+    one is used anyway.
+
+    With `health_interval` set, picks also start background health checks (a GET
+    of the backend's /models): an ejected backend is only re-admitted once a check
+    passes, and a backend idle for `health_interval` seconds is checked and ejected
+    if it fails. Without it, ejected backends return when `eject_seconds` expire.
+    """
+
+    def __init__(
+        self,
+        backends: List[Tuple[str, int]],
+        eject_failures: int = 3,
+        eject_seconds: float = 30.0,
+        health_interval: float = 0.0,
+    ):
+        self.backends = [Backend(url, weight) for url, weight in backends]
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+        self.proxies: Optional[Dict[str, str]] = None
+        self._sticky: "OrderedDict[str, Backend]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, settings: Any) -> "BackendPool":
+        self.eject_failures = int(getattr(settings, "lmstudio_eject_failures", self.eject_failures))
+        self.eject_seconds = float(getattr(settings, "lmstudio_eject_seconds", self.eject_seconds))
+        self.health_interval = float(getattr(settings, "lmstudio_health_interval", self.health_interval) or 0)
+        if hasattr(settings, "resolved_proxies"):
+            self.proxies = settings.resolved_proxies()
+        if self.health_interval <= 0:
+            with self._lock:
+                for backend in self.backends:
+                    backend.needs_check = False
+        return self
+
+    def _due_checks(self, now: float) -> List[Backend]:
+        # Caller holds the lock.
+        if self.health_interval <= 0:
+            return []
+        due = []
+        for backend in self.backends:
+            if backend.checking or backend.ejected_until > now:
+                continue
+            idle = not backend.inflight and now - backend.last_ok >= self.health_interval
+            if backend.needs_check or idle:
+                backend.checking = True
+                due.append(backend)
+        return due
+
+    def check(self, backend: Backend) -> bool:
+        """Run one health check of `backend`, re-admitting or ejecting it; return whether it passed."""
+        try:
+            resp = requests.get(models_url(backend.url), timeout=HEALTH_TIMEOUT, proxies=self.proxies)
+            try:
+                resp.raise_for_status()
+            finally:
+                resp.close()
+            error = ""
+        except requests.RequestException as exc:
+            error = str(exc)
+        now = time.monotonic()
+        with self._lock:
+            backend.checking = False
+            if not error:
+                if backend.needs_check:
+                    metrics.incr("lmstudio_pool.readmitted")
+                    logger.info("LM Studio backend %s passed its health check; re-admitting", backend.url)
+                backend.needs_check = False
+                backend.consecutive_failures = 0
+                backend.last_ok = now
+                return True
+            backend.checks_failed += 1
+            backend.needs_check = True
+            backend.ejected_until = now + self.eject_seconds
+        metrics.incr("lmstudio_pool.health_failed")
+        logger.warning(
+            "LM Studio backend %s failed its health check (%s); ejecting for %.0fs",
+            backend.url,
+            error,
+            self.eject_seconds,
+        )
+        return False
+
+    def acquire(self, key: str = "") -> Backend:
+        now = time.monotonic()
+        with self._lock:
+            due = self._due_checks(now)
+            healthy = [backend for backend in self.backends if backend.healthy(now)]
+            backend = self._sticky.get(key) if key else None
+            if backend is not None and backend in healthy:
+                self._sticky.move_to_end(key)
+                metrics.incr("lmstudio_pool.sticky")
+            else:
+                candidates = healthy or self.backends
+                backend = min(candidates, key=lambda item: (item.load(), item.latency))
+                if key:
+                    self._sticky[key] = backend
+                    while len(self._sticky) > MAX_STICKY:
+                        self._sticky.popitem(last=False)
+            backend.inflight += 1
+            backend.requests += 1
+        for checked in due:
+            threading.Thread(target=self.check, args=(checked,), name="cc-adapter-health", daemon=True).start()
+        return backend
+
+    def record_latency(self, url: str, latency: float) -> None:
+        """Fold an out-of-band latency sample (e.g. a probe) into a backend's average."""
+        with self._lock:
+            for backend in self.backends:
+                if backend.url == url:
+                    backend.observe_latency(latency)
+
+    def release(self, backend: Backend, latency: Optional[float] = None, failed: bool = False) -> None:
+        with self._lock:
+            backend.inflight = max(0, backend.inflight - 1)
+            if latency is not None:
+                backend.observe_latency(latency)
+            if not failed:
+                backend.consecutive_failures = 0
+                backend.last_ok = time.monotonic()
+                return
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            if self.eject_failures > 0 and backend.consecutive_failures >= self.eject_failures:
+                backend.ejected_until = time.monotonic() + self.eject_seconds
+                backend.needs_check = self.health_interval > 0
+                backend.consecutive_failures = 0
+                metrics.incr("lmstudio_pool.ejected")
+                logger.warning("Ejecting LM Studio backend %s for %.0fs", backend.url, self.eject_seconds)
+
+    @contextmanager
+    def lease(self, key: str = "") -> Iterator["Lease"]:
+        """Hold a backend for one request; call `responded()` once the backend has answered."""
+        lease = Lease(self.acquire(key))
+        try:
+            yield lease
+        except BaseException as exc:
+            self.release(lease.backend, lease.latency, failed=_is_backend_failure(exc))
+            raise
+        self.release(lease.backend, lease.latency)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return {backend.url: backend.snapshot(now) for backend in self.backends}
+
+
+class Lease:
+    def __init__(self, backend: Backend):
+        self.backend = backend
+        self.url = backend.url
+        self.started = time.monotonic()
+        self.latency: Optional[float] = None
+
+    def responded(self) -> None:
+        """Record time to response headers as the backend's latency sample."""
+        if self.latency is None:
+            self.latency = time.monotonic() - self.started
+
+
+class PoolRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pools: Dict[Tuple[Tuple[str, int], ...], BackendPool] = {}
+
+    def get(self, settings: Any) -> BackendPool:
+        backends = tuple(
+            parse_backends(getattr(settings, "lmstudio_backends", ""), getattr(settings, "lmstudio_base", ""))
+        )
+        with self._lock:
+            pool = self._pools.get(backends)
+            if pool is None:
+                pool = self._pools[backends] = BackendPool(list(backends))
+        return pool.configure(settings)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            pools = list(self._pools.values())
+        merged: Dict[str, Dict[str, Any]] = {}
+        for pool in pools:
+            merged.update(pool.snapshot())
+        return merged
+
+    def reset(self) -> None:
+        with self._lock:
+            self._pools.clear()
+
+
+REGISTRY = PoolRegistry()
+
+
+def for_settings(settings: Any) -> BackendPool:
+    return REGISTRY.get(settings)
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    return REGISTRY.snapshot()
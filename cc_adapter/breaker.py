@@ -0,0 +1,196 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+import requests
+
+from . import metrics
+from .retry import status_of
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(RuntimeError):
+    """Raised without contacting the upstream while its breaker is open."""
+
+
+def _counts_as_failure(exc: BaseException) -> bool:
+    # Client disconnects and request errors (400/401/...) say nothing about upstream health.
+    if isinstance(exc, requests.HTTPError):
+        status = status_of(exc)
+        return status is None or status == 429 or status >= 500
+    return isinstance(exc, requests.RequestException)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker for one upstream endpoint.
+
+    Trips after `failure_threshold` consecutive failures or over-threshold
+    latencies, rejects calls for `reset_timeout` seconds, then admits up to
+    `half_open_probes` concurrent probes; that many successes close it again.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.failure_threshold = 5
+        self.reset_timeout = 30.0
+        self.half_open_probes = 1
+        self.latency_threshold = 0.0
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.last_latency = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def configure(self, settings: Any) -> "CircuitBreaker":
+        self.failure_threshold = int(getattr(settings, "breaker_failure_threshold", 5) or 0)
+        self.reset_timeout = float(getattr(settings, "breaker_reset_timeout", 30.0) or 0.0)
+        self.half_open_probes = max(1, int(getattr(settings, "breaker_half_open_probes", 1) or 1))
+        self.latency_threshold = float(getattr(settings, "breaker_latency_threshold", 0.0) or 0.0)
+        return self
+
+    def _open(self, reason: str) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        metrics.incr(f"breaker.opened.{self.key.split(' ', 1)[0]}")
+        logger.warning("Circuit opened for %s (%s)", self.key, reason)
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed; half-open admissions count as probes."""
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+                logger.info("Circuit half-open for %s; probing", self.key)
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def record_success(self, latency: float) -> None:
+        self.last_latency = latency
+        if self.latency_threshold and latency > self.latency_threshold:
+            metrics.incr(f"breaker.slow.{self.key.split(' ', 1)[0]}")
+            self.record_failure(f"latency {latency:.1f}s > {self.latency_threshold:g}s")
+            return
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self.state = CLOSED
+                    logger.info("Circuit closed for %s", self.key)
+            self.consecutive_failures = 0
+
+    def record_failure(self, reason: str = "failure") -> None:
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                self._open(f"probe failed: {reason}")
+            elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._open(f"{self.consecutive_failures} consecutive failures, last: {reason}")
+
+    def release(self) -> None:
+        """Return a probe slot for a call that ended without an upstream verdict."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def call(self, fn: Callable[[], T], first_byte: Optional[Callable[[], Optional[float]]] = None) -> T:
+        """
+        Run `fn` through the breaker.
+
+        `first_byte` returns the monotonic time the first output was produced
+        (streams); latency is measured to it instead of to completion.
+        """
+        if not self.allow():
+            metrics.incr(f"breaker.rejected.{self.key.split(' ', 1)[0]}")
+            raise CircuitOpen(f"Circuit open for {self.key}; failing fast")
+        started = time.monotonic()
+        try:
+            result = fn()
+        except Exception as exc:
+            if _counts_as_failure(exc):
+                self.record_failure(str(exc))
+            else:
+                self.release()
+            raise
+        except BaseException:
+            self.release()
+            raise
+        finished = (first_byte() if first_byte else None) or time.monotonic()
+        self.record_success(max(0.0, finished - started))
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            data: Dict[str, Any] = {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "last_latency": round(self.last_latency, 3),
+            }
+            if self.state != CLOSED:
+                data["open_for"] = round(time.monotonic() - self.opened_at, 1)
+            return data
+
+
+def base_url_for(settings: Any, provider: str) -> str:
+    return {
+        "poe": getattr(settings, "poe_base_url", ""),
+        "openrouter": getattr(settings, "openrouter_base", ""),
+        "codex": getattr(settings, "codex_base_url", ""),
+        "lmstudio": getattr(settings, "lmstudio_base", ""),
+    }.get(provider, "")
+
+
+class BreakerRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+    def get(self, settings: Any, provider: str, base_url: Optional[str] = None) -> CircuitBreaker:
+        url = base_url if base_url is not None else base_url_for(settings, provider)
+        key = (provider, url)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(f"{provider} {url}".strip())
+        return breaker.configure(settings)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.key: breaker.snapshot() for breaker in breakers}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._breakers.clear()
+
+
+REGISTRY = BreakerRegistry()
+
+
+def for_provider(settings: Any, provider: str) -> CircuitBreaker:
+    return REGISTRY.get(settings, provider)
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    return REGISTRY.snapshot()
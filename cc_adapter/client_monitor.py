@@ -0,0 +1,201 @@
+import logging
+import selectors
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ClientDisconnected(ConnectionResetError):
+    """Raised inside a stream bridge once the client has gone away."""
+
+
+def shutdown_upstream(resp: Any) -> None:
+    """
+    Abort an in-flight upstream response from another thread.
+
+    Closing a socket does not wake a thread blocked in recv(), so the raw
+    socket is shut down first (best-effort across urllib3 versions).
+    """
+    raw = getattr(resp, "raw", None)
+    fp = getattr(getattr(raw, "_fp", None), "fp", None)
+    sock = getattr(getattr(fp, "raw", None), "_sock", None) or getattr(fp, "_sock", None)
+    if sock is None:
+        connection = getattr(raw, "_connection", None) or getattr(raw, "connection", None)
+        sock = getattr(connection, "sock", None)
+    if isinstance(sock, socket.socket):
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    try:
+        resp.close()
+    except Exception:
+        pass
+
+
+_SCOPE = threading.local()
+
+
+class UpstreamScope:
+    """
+    The upstream responses opened by one call, so another thread can abort it.
+
+    Providers hand every upstream response to `track()`. While a scope is
+    `active()` on the calling thread, `abort()` shuts those responses down, and
+    any the call opens afterwards as soon as they are tracked, so the call fails
+    quickly instead of reading (and being billed for) the rest of the answer.
+    A call still waiting for response headers is only stopped once they arrive.
+    """
+
+    def __init__(self) -> None:
+        self.aborted = False
+        self.shut_down = 0
+        self._responses: List[Any] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def active(self) -> Iterator["UpstreamScope"]:
+        previous = getattr(_SCOPE, "scope", None)
+        _SCOPE.scope = self
+        try:
+            yield self
+        finally:
+            _SCOPE.scope = previous
+
+    def add(self, resp: Any) -> None:
+        with self._lock:
+            if not self.aborted:
+                self._responses.append(resp)
+                return
+            self.shut_down += 1
+        shutdown_upstream(resp)
+
+    def abort(self) -> None:
+        with self._lock:
+            self.aborted = True
+            responses, self._responses = self._responses, []
+            self.shut_down += len(responses)
+        for resp in responses:
+            shutdown_upstream(resp)
+
+
+def track(resp: Any) -> Any:
+    """Register an upstream response with the calling thread's `UpstreamScope`, if any."""
+    scope = getattr(_SCOPE, "scope", None)
+    if scope is not None:
+        scope.add(resp)
+    return resp
+
+
+def client_gone(handler: Any) -> bool:
+    """
+    Non-blocking check whether the client closed its end of the connection.
+
+    Used while a request waits for a slot and no upstream response exists yet;
+    probe errors count as "still connected".
+    """
+    sock = getattr(handler, "connection", None)
+    if not isinstance(sock, socket.socket):
+        return False
+    try:
+        with selectors.DefaultSelector() as selector:
+            selector.register(sock, selectors.EVENT_READ)
+            if not selector.select(0):
+                return False
+        return not sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+    except ConnectionError:
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+class ClientMonitor:
+    """
+    Poll the client socket for EOF while a stream is in flight.
+
+    When the client disconnects (Esc in Claude Code, client timeout), the
+    upstream response is shut down immediately instead of waiting for the next
+    write to fail, which may be minutes away during long reasoning phases.
+    """
+
+    def __init__(self, handler: Any, resp: Any, interval: float = 0.5):
+        self.handler = handler
+        self.resp = resp
+        self.interval = float(interval or 0)
+        self.disconnected = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _client_socket(self) -> Optional[socket.socket]:
+        sock = getattr(self.handler, "connection", None)
+        return sock if isinstance(sock, socket.socket) else None
+
+    def start(self) -> "ClientMonitor":
+        if self.interval <= 0 or self._client_socket() is None:
+            return self
+        self._thread = threading.Thread(target=self._run, name="cc-adapter-client-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def check(self) -> None:
+        if self.disconnected:
+            raise ClientDisconnected("Client disconnected")
+
+    def _client_gone(self, selector: selectors.BaseSelector, sock: socket.socket) -> bool:
+        # selectors uses poll/epoll where available, so high fd numbers are fine. A probe
+        # that errors tells us nothing about the client: keep streaming and try again.
+        try:
+            readable = selector.select(self.interval)
+        except (OSError, ValueError) as exc:
+            logger.debug("Client socket probe failed: %s", exc)
+            self._stop.wait(self.interval)
+            return False
+        if not readable:
+            return False
+        try:
+            data = sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+        except (BlockingIOError, InterruptedError):
+            return False
+        except ConnectionError:
+            return True
+        except OSError as exc:
+            logger.debug("Client socket probe failed: %s", exc)
+            self._stop.wait(self.interval)
+            return False
+        if data:
+            # Pipelined bytes from the client; it is alive. Avoid a busy loop.
+            self._stop.wait(self.interval)
+            return False
+        return True
+
+    def _run(self) -> None:
+        sock = self._client_socket()
+        if sock is None:
+            return
+        try:
+            selector = selectors.DefaultSelector()
+            selector.register(sock, selectors.EVENT_READ)
+        except (OSError, ValueError) as exc:
+            logger.debug("Not watching client socket: %s", exc)
+            return
+        try:
+            while not self._stop.is_set():
+                if not self._client_gone(selector, sock):
+                    continue
+                if self._stop.is_set():
+                    return
+                self.disconnected = True
+                metrics.incr("stream.client_cancelled")
+                logger.info("Client disconnected mid-stream; cancelling upstream generation")
+                shutdown_upstream(self.resp)
+                return
+        finally:
+            selector.close()
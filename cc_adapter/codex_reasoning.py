@@ -0,0 +1,47 @@
+import base64
+import json
+from typing import Any, Dict, Optional
+
+# Thinking-block signatures minted by cc-adapter for Codex reasoning items. The
+# prefix keeps them distinguishable from genuine Anthropic signatures.
+SIGNATURE_PREFIX = "cc-adapter-codex-reasoning:"
+
+
+def encode_reasoning_signature(item: Dict[str, Any]) -> str:
+    """
+    Pack a Responses API reasoning item into an Anthropic thinking signature.
+
+    Only the fields needed to replay the item are kept; the item id is dropped
+    because the backend runs with `store: false` and cannot resolve it.
+    """
+    if not isinstance(item, dict) or not item.get("encrypted_content"):
+        return ""
+    packed: Dict[str, Any] = {
+        "encrypted_content": str(item.get("encrypted_content")),
+        "summary": item.get("summary") if isinstance(item.get("summary"), list) else [],
+    }
+    raw = json.dumps(packed, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return SIGNATURE_PREFIX + base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def is_reasoning_signature(signature: Any) -> bool:
+    return isinstance(signature, str) and signature.startswith(SIGNATURE_PREFIX)
+
+
+def decode_reasoning_signature(signature: Any) -> Optional[Dict[str, Any]]:
+    """Turn a signature produced by `encode_reasoning_signature` back into a reasoning input item."""
+    if not is_reasoning_signature(signature):
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(signature[len(SIGNATURE_PREFIX) :].encode("ascii"))
+        packed = json.loads(raw.decode("utf-8"))
+    except Exception:
+        return None
+    if not isinstance(packed, dict) or not packed.get("encrypted_content"):
+        return None
+    summary = packed.get("summary")
+    return {
+        "type": "reasoning",
+        "summary": summary if isinstance(summary, list) else [],
+        "encrypted_content": str(packed.get("encrypted_content")),
+    }
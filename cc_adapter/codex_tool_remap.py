@@ -1,6 +1,7 @@
 import json
 import os
 import re
+from bisect import bisect_left
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
@@ -257,13 +258,97 @@ def _parse_apply_patch(patch_text: str) -> List[Dict[str, Any]]:
     return ops
 
 
-def _find_subsequence(haystack: List[str], needle: List[str]) -> Optional[int]:
-    if not needle:
-        return 0
-    for start in range(0, len(haystack) - len(needle) + 1):
-        if haystack[start : start + len(needle)] == needle:
-            return start
-    return None
+# Line normalizations tried in order when locating hunk context, from exact
+# matching to progressively more whitespace-tolerant comparisons.
+_LINE_NORMALIZERS = (
+    lambda line: line,
+    str.rstrip,
+    str.strip,
+    lambda line: " ".join(line.split()),
+)
+
+
+class _LineIndex:
+    """Hash index of line positions, built lazily for each normalization level."""
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+        self._levels: Dict[int, Tuple[List[str], Dict[str, List[int]]]] = {}
+
+    def _level(self, level: int) -> Tuple[List[str], Dict[str, List[int]]]:
+        built = self._levels.get(level)
+        if built is None:
+            normalize = _LINE_NORMALIZERS[level]
+            normalized = [normalize(line) for line in self.lines]
+            positions: Dict[str, List[int]] = {}
+            for idx, line in enumerate(normalized):
+                positions.setdefault(line, []).append(idx)
+            built = (normalized, positions)
+            self._levels[level] = built
+        return built
+
+    def find(self, needle: List[str], hint: int = 0) -> Optional[int]:
+        """
+        Return the start of `needle` in the indexed lines, or None.
+
+        Candidates are seeded from the rarest needle line; matches at or after
+        `hint` win over earlier ones so consecutive hunks resolve in order.
+        """
+        total = len(self.lines)
+        if not needle:
+            return min(max(hint, 0), total)
+        size = len(needle)
+        if size > total:
+            return None
+        for level, normalize in enumerate(_LINE_NORMALIZERS):
+            normalized, positions = self._level(level)
+            target = [normalize(line) for line in needle]
+            anchor = min(range(size), key=lambda k: len(positions.get(target[k], ())))
+            seeds = positions.get(target[anchor])
+            if not seeds:
+                continue
+            starts = [p - anchor for p in seeds if 0 <= p - anchor <= total - size]
+            split = bisect_left(starts, hint)
+            for start in starts[split:] + starts[:split]:
+                if normalized[start : start + size] == target:
+                    return start
+        return None
+
+
+class FileContentCache:
+    """
+    Per-request cache of file contents used while remapping apply_patch.
+
+    Entries are validated against the file's mtime and size, and patched
+    content is remembered so later patches in the same response build on it.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, Tuple[Optional[Tuple[int, int]], str]] = {}
+
+    @staticmethod
+    def _stamp(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def read_text(self, path: Path) -> str:
+        key = str(path)
+        stamp = self._stamp(path)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        text = path.read_text(encoding="utf-8", errors="replace")
+        self._entries[key] = (stamp, text)
+        return text
+
+    def remember(self, path: Path, text: str) -> None:
+        self._entries[str(path)] = (self._stamp(path), text)
+
+    def forget(self, path: Path) -> None:
+        self._entries.pop(str(path), None)
 
 
 def _apply_patch_lines_to_text(original: str, patch_lines: List[str]) -> str:
@@ -288,18 +373,48 @@ def _apply_patch_lines_to_text(original: str, patch_lines: List[str]) -> str:
     if current:
         hunks.append(current)
 
-    out_lines = list(lines)
+    edits: List[Tuple[List[str], List[str]]] = []
     for hunk in hunks:
         old_seq = [ln[1:] for ln in hunk if ln and ln[0] in (" ", "-")]
         new_seq = [ln[1:] for ln in hunk if ln and ln[0] in (" ", "+")]
-        if not old_seq and not new_seq:
-            continue
-        pos = _find_subsequence(out_lines, old_seq)
+        if old_seq or new_seq:
+            edits.append((old_seq, new_seq))
+
+    # Fast path: locate every hunk in the original text, carrying the end of the
+    # previous hunk forward as the search hint, then splice once.
+    index = _LineIndex(lines)
+    placements: List[Tuple[int, int, List[str]]] = []
+    hint = 0
+    for old_seq, new_seq in edits:
+        pos = index.find(old_seq, hint)
+        if pos is None or pos < hint:
+            # The context may include lines written by an earlier hunk.
+            placements = []
+            break
+        placements.append((pos, len(old_seq), new_seq))
+        hint = pos + len(old_seq)
+    else:
+        out_lines: List[str] = []
+        cursor = 0
+        for pos, old_len, new_seq in placements:
+            out_lines.extend(lines[cursor:pos])
+            out_lines.extend(new_seq)
+            cursor = pos + old_len
+        out_lines.extend(lines[cursor:])
+        return _render_patched_lines(out_lines, ends_with_newline)
+
+    # Out-of-order, overlapping or dependent hunks: apply sequentially against the updated text.
+    out_lines = list(lines)
+    for old_seq, new_seq in edits:
+        pos = _LineIndex(out_lines).find(old_seq)
         if pos is None:
             raise ValueError("Failed to apply patch hunk (context not found)")
         out_lines = out_lines[:pos] + new_seq + out_lines[pos + len(old_seq) :]
+    return _render_patched_lines(out_lines, ends_with_newline)
 
-    rendered = "\n".join(out_lines)
+
+def _render_patched_lines(lines: List[str], ends_with_newline: bool) -> str:
+    rendered = "\n".join(lines)
     if ends_with_newline:
         rendered += "\n"
     return rendered
@@ -327,11 +442,14 @@ def remap_codex_tool_call(
     name: str,
     arguments: Any,
     incoming: Optional[Dict[str, Any]],
+    file_cache: Optional[FileContentCache] = None,
 ) -> Optional[List[Tuple[str, str, Dict[str, Any]]]]:
     """
     Return a list of (new_call_id, new_tool_name, new_input) if remapping is needed.
 
     Remapping is best-effort and only targets common Codex CLI tool names.
+    Pass a `file_cache` shared across one request's tool calls to avoid
+    re-reading files that several apply_patch calls touch.
     """
     if not incoming:
         return None
@@ -400,6 +518,7 @@ def remap_codex_tool_call(
             return None
 
         ops = _parse_apply_patch(patch_text)
+        cache = file_cache if file_cache is not None else FileContentCache()
         remapped: List[Tuple[str, str, Dict[str, Any]]] = []
         next_suffix = 0
 
@@ -420,9 +539,11 @@ def remap_codex_tool_call(
                 new_id = call_id if next_suffix == 0 else f"{call_id}:{next_suffix}"
                 next_suffix += 1
                 remapped.append((new_id, write_tool.name, write_input))
+                cache.remember(abs_path, content)
                 continue
 
             if action == "delete":
+                cache.forget(abs_path)
                 if delete_tool:
                     delete_input = _build_delete_input(delete_tool, str(abs_path))
                     if delete_input:
@@ -445,13 +566,16 @@ def remap_codex_tool_call(
                 patch_lines = op.get("patch_lines") or []
                 if not isinstance(patch_lines, list):
                     continue
-                old_text = abs_path.read_text(encoding="utf-8", errors="replace")
+                old_text = cache.read_text(abs_path)
                 new_text = _apply_patch_lines_to_text(old_text, [str(x) for x in patch_lines])
                 dest_rel = str(op.get("move_to") or "").strip()
                 dest_path = _safe_abspath(base_dir, dest_rel) if dest_rel else abs_path
                 write_input = _build_write_input(write_tool, str(dest_path), new_text)
                 if not write_input:
                     continue
+                if dest_path != abs_path:
+                    cache.forget(abs_path)
+                cache.remember(dest_path, new_text)
                 new_id = call_id if next_suffix == 0 else f"{call_id}:{next_suffix}"
                 next_suffix += 1
                 remapped.append((new_id, write_tool.name, write_input))
@@ -14,6 +14,14 @@ class Settings:
     lmstudio_base: str = os.getenv("LMSTUDIO_BASE", "http://127.0.0.1:1234/v1/chat/completions")
     lmstudio_model: str = os.getenv("LMSTUDIO_MODEL", "gpt-oss-120b")
     lmstudio_timeout: int = int(os.getenv("LMSTUDIO_TIMEOUT", "3600"))
+    # Weighted LM Studio backends ("url*weight, url"); empty uses LMSTUDIO_BASE alone.
+    lmstudio_backends: str = os.getenv("LMSTUDIO_BACKENDS", "")
+    # Consecutive failures that eject a backend from the pool, and for how many seconds.
+    lmstudio_eject_failures: int = int(os.getenv("LMSTUDIO_EJECT_FAILURES", "3"))
+    lmstudio_eject_seconds: float = float(os.getenv("LMSTUDIO_EJECT_SECONDS", "30"))
+    # Seconds of idleness before a backend is health-checked (GET .../models); ejected backends
+    # then return only after a check passes. 0 disables checks and re-admits on expiry.
+    lmstudio_health_interval: float = float(os.getenv("LMSTUDIO_HEALTH_INTERVAL", "30"))
 
     poe_base_url: str = os.getenv("POE_BASE_URL", "https://api.poe.com/v1/chat/completions")
     poe_api_key: str = os.getenv("POE_API_KEY", "")
@@ -27,7 +35,9 @@ class Settings:
     codex_access_token: str = os.getenv("OPENAI_CODEX_ACCESS_TOKEN", "")
     codex_refresh_token: str = os.getenv("OPENAI_CODEX_REFRESH_TOKEN", "")
     codex_expires_at_ms: int = int(os.getenv("OPENAI_CODEX_EXPIRES_AT_MS", "0"))
-    codex_include_encrypted_reasoning: str = os.getenv("CODEX_INCLUDE_ENCRYPTED_REASONING", "off")
+    # "auto" keeps the model presets' request for encrypted reasoning (replayed as thinking signatures);
+    # "on" adds it for every model, "off" strips it.
+    codex_include_encrypted_reasoning: str = os.getenv("CODEX_INCLUDE_ENCRYPTED_REASONING", "auto")
     codex_bridge: str = os.getenv("CODEX_BRIDGE", "auto")
     codex_bridge_prompt_file: str = os.getenv("CODEX_BRIDGE_PROMPT_FILE", "")
     codex_bridge_strip_system: str = os.getenv("CODEX_BRIDGE_STRIP_SYSTEM", "auto")
@@ -35,6 +45,99 @@ class Settings:
     https_proxy: str = os.getenv("HTTPS_PROXY") or os.getenv("https_proxy") or ""
     all_proxy: str = os.getenv("ALL_PROXY") or os.getenv("all_proxy") or ""
     no_proxy: str = os.getenv("NO_PROXY") or os.getenv("no_proxy") or ""
+    # Seconds between client-liveness polls during streams (0 disables).
+    client_watch_interval: float = float(os.getenv("CLIENT_WATCH_INTERVAL", "0.5"))
+    # Seconds of upstream silence before an SSE ping is sent to the client (0 disables).
+    sse_ping_interval: float = float(os.getenv("SSE_PING_INTERVAL", "15"))
+    # Bytes of SSE output buffered for a slow client while the upstream keeps being
+    # drained (0 writes synchronously); SSE_RELAY_POLICY=block|disconnect past that mark.
+    sse_relay_buffer: int = int(os.getenv("SSE_RELAY_BUFFER", "0"))
+    sse_relay_policy: str = os.getenv("SSE_RELAY_POLICY", "block")
+    # Seconds a full relay waits for the client before dropping it, under either policy.
+    sse_relay_stall_timeout: float = float(os.getenv("SSE_RELAY_STALL_TIMEOUT", "60"))
+    # Commit the SSE response and message_start before contacting the upstream.
+    early_stream_start: str = os.getenv("EARLY_STREAM_START", "off")
+    # Per-phase upstream timeouts (seconds); UPSTREAM_TIMEOUTS overrides per provider,
+    # e.g. "lmstudio.first_byte=1800,poe.idle=120". LM Studio's first byte also honors LMSTUDIO_TIMEOUT.
+    upstream_connect_timeout: float = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "10"))
+    upstream_first_byte_timeout: float = float(os.getenv("UPSTREAM_FIRST_BYTE_TIMEOUT", "300"))
+    upstream_idle_timeout: float = float(os.getenv("UPSTREAM_IDLE_TIMEOUT", "300"))
+    # Non-streaming calls wait for the whole answer (0 = LMSTUDIO_TIMEOUT, the historical budget).
+    upstream_response_timeout: float = float(os.getenv("UPSTREAM_RESPONSE_TIMEOUT", "0"))
+    upstream_timeouts: str = os.getenv("UPSTREAM_TIMEOUTS", "")
+    # Shared upstream retries (429/5xx, connection errors, stalls) while nothing reached the client.
+    upstream_max_retries: int = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+    upstream_retry_backoff: float = float(os.getenv("UPSTREAM_RETRY_BACKOFF", "0.5"))
+    upstream_retry_max_backoff: float = float(os.getenv("UPSTREAM_RETRY_MAX_BACKOFF", "8"))
+    # Ordered provider fallbacks, e.g. "poe:claude-opus-4.5 -> openrouter:claude-opus-4.5; ...".
+    failover_chains: str = os.getenv("FAILOVER_CHAINS", "")
+    # Resume OpenRouter/Poe text answers whose upstream died mid-stream (0 disables).
+    stream_resume_attempts: int = int(os.getenv("STREAM_RESUME_ATTEMPTS", "0"))
+    # Consecutive upstream failures that open a provider's circuit breaker (0 disables).
+    breaker_failure_threshold: int = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    # Seconds an open breaker fails fast before admitting half-open probes.
+    breaker_reset_timeout: float = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+    # Successful half-open probes needed to close the breaker again.
+    breaker_half_open_probes: int = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+    # Time-to-first-output (seconds) above which a call counts as a failure (0 disables).
+    breaker_latency_threshold: float = float(os.getenv("BREAKER_LATENCY_THRESHOLD", "0"))
+    # Longest a Poe/OpenRouter request waits on the rate-limit governor before sending (0 disables pacing).
+    rate_limit_max_wait: float = float(os.getenv("RATE_LIMIT_MAX_WAIT", "10"))
+    # POE_API_KEY/OPENROUTER_API_KEY may list several comma-separated keys; a key sits out
+    # this many seconds after a 429 (unless Retry-After says otherwise), or after a 401/403.
+    api_key_quarantine: float = float(os.getenv("API_KEY_QUARANTINE", "60"))
+    api_key_auth_quarantine: float = float(os.getenv("API_KEY_AUTH_QUARANTINE", "900"))
+    # Hedge non-streaming requests: once a model's observed p90 latency passes without an answer,
+    # send a duplicate (to HEDGE_TARGET "provider:model", default the same upstream), keep the
+    # first answer and abort the other. HEDGE_BUDGET caps hedges as a fraction of hedge-eligible
+    # requests. Without HEDGE_TARGET the duplicate reuses the primary's API key and rate-limit budget.
+    hedge: str = os.getenv("HEDGE", "off")
+    hedge_target: str = os.getenv("HEDGE_TARGET", "")
+    hedge_budget: float = float(os.getenv("HEDGE_BUDGET", "0.1"))
+    # Seconds between background latency probes of the default model, failover hops and
+    # PROBE_MODELS (0 disables); probed failover chains are tried fastest-first. LM Studio
+    # models are probed on every LMSTUDIO_BACKENDS entry, which also feeds backend picking.
+    probe_interval: float = float(os.getenv("PROBE_INTERVAL", "0"))
+    probe_models: str = os.getenv("PROBE_MODELS", "")
+    # Concurrent upstream calls per provider before requests queue by priority class
+    # (main agent, subagent, background; header x-cc-adapter-priority overrides). 0 disables.
+    scheduler_concurrency: int = int(os.getenv("SCHEDULER_CONCURRENCY", "0"))
+    # Seconds of queueing that promote a waiting request by one priority class.
+    scheduler_aging: float = float(os.getenv("SCHEDULER_AGING", "10"))
+    # Per-client fair queuing. Clients are identified by the first FAIR_QUEUE_IDENTITY source
+    # present: metadata.user_id ("user"), the x-api-key/Authorization token ("token") or the
+    # source address ("address").
+    fair_queue_identity: str = os.getenv("FAIR_QUEUE_IDENTITY", "user,token,address")
+    # Requests dispatched at once across all clients before they queue by weighted share (0 = unlimited).
+    fair_queue_concurrency: int = int(os.getenv("FAIR_QUEUE_CONCURRENCY", "0"))
+    # Relative shares per client, e.g. "addr:10.0.0.5=2,user:alice=3" (default 1).
+    fair_queue_weights: str = os.getenv("FAIR_QUEUE_WEIGHTS", "")
+    # Per-client caps: requests in flight and estimated input tokens per minute (0 = unlimited).
+    fair_client_concurrency: int = int(os.getenv("FAIR_CLIENT_CONCURRENCY", "0"))
+    fair_client_tpm: int = int(os.getenv("FAIR_CLIENT_TPM", "0"))
+    # Share one upstream call between identical concurrent requests (opt-in).
+    single_flight: str = os.getenv("SINGLE_FLIGHT", "off")
+    # Exact-match response cache for tool-free requests that are deterministic (temperature 0)
+    # or on RESPONSE_CACHE_MODELS; while it is on, clients can opt in other tool-free
+    # requests with `x-cc-adapter-cache: on`.
+    response_cache: str = os.getenv("RESPONSE_CACHE", "off")
+    response_cache_ttl: float = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    response_cache_size: int = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+    response_cache_models: str = os.getenv("RESPONSE_CACHE_MODELS", "")
+    # Persist cached responses under the config dir (cache/responses) across restarts,
+    # keeping at most RESPONSE_CACHE_DISK_SIZE files.
+    response_cache_disk: str = os.getenv("RESPONSE_CACHE_DISK", "off")
+    response_cache_disk_size: int = int(os.getenv("RESPONSE_CACHE_DISK_SIZE", "4096"))
+    # Answer trivial probe requests locally (or route them elsewhere) by declarative rules;
+    # SHORT_CIRCUIT_RULES is a JSON list or a path to one, checked before the built-in rules.
+    short_circuit: str = os.getenv("SHORT_CIRCUIT", "off")
+    short_circuit_rules: str = os.getenv("SHORT_CIRCUIT_RULES", "")
+    # Extra routing-table entries (JSON list or path) checked before the built-in Haiku routes.
+    # The built-in table only keeps the old Haiku special cases; routing by latency or request
+    # shape (e.g. small tool-less prompts to a fast model) needs routes written here.
+    routing_table: str = os.getenv("ROUTING_TABLE", "")
+    # Per-request monotonic deadline taken from a client timeout header (0 = none).
+    request_deadline: float = 0.0
 
     def resolved_proxies(self) -> Optional[Dict[str, str]]:
         """Build a requests-compatible proxies mapping from settings."""
@@ -1,7 +1,8 @@
 import json
 from typing import Any, Dict, List, Optional, Set
 
-from .codex_tool_remap import remap_codex_tool_call
+from .codex_reasoning import decode_reasoning_signature
+from .codex_tool_remap import FileContentCache, remap_codex_tool_call
 
 
 def _flatten_text(content: Any) -> str:
@@ -66,7 +67,9 @@ def _map_thinking(thinking: Any) -> Optional[Dict[str, Any]]:
     return None
 
 
-def anthropic_to_openai(body: Dict[str, Any], model_name: str) -> Dict[str, Any]:
+def anthropic_to_openai(
+    body: Dict[str, Any], model_name: str, *, keep_reasoning_items: bool = False
+) -> Dict[str, Any]:
     messages: List[Dict[str, Any]] = []
     pending_tool_calls = False
     pending_tool_call_ids: Set[str] = set()
@@ -175,11 +178,16 @@ def anthropic_to_openai(body: Dict[str, Any], model_name: str) -> Dict[str, Any]
         elif role == "assistant":
             text_parts: List[str] = []
             tool_calls: List[Dict[str, Any]] = []
+            reasoning_items: List[Dict[str, Any]] = []
             if isinstance(content, list):
                 for part in content:
                     if isinstance(part, dict):
                         if part.get("type") == "text":
                             text_parts.append(str(part.get("text", "")))
+                        elif part.get("type") == "thinking" and keep_reasoning_items:
+                            reasoning_item = decode_reasoning_signature(part.get("signature"))
+                            if reasoning_item:
+                                reasoning_items.append(reasoning_item)
                         elif part.get("type") == "tool_use":
                             try:
                                 arg_text = json.dumps(part.get("input", {}))
@@ -203,6 +211,8 @@ def anthropic_to_openai(body: Dict[str, Any], model_name: str) -> Dict[str, Any]
             elif isinstance(content, str):
                 text_parts.append(content)
             assistant_message: Dict[str, Any] = {"role": "assistant"}
+            if reasoning_items:
+                assistant_message["reasoning_items"] = reasoning_items
             if text_parts:
                 assistant_message["content"] = "\n".join(text_parts)
             if tool_calls:
@@ -356,6 +366,7 @@ def openai_to_anthropic(
     stop_reason = None
     usage_block: Dict[str, Any] = {}
     output_chars = 0
+    file_cache = FileContentCache()
 
     def _extract_thinking(reasoning: Any) -> str:
         if reasoning is None:
@@ -390,13 +401,15 @@ def openai_to_anthropic(
 
         reasoning_content = message.get("reasoning_content") or message.get("reasoning")
         thinking_text = _extract_thinking(reasoning_content)
-        if thinking_text:
+        # Codex reasoning items arrive with a signature that replays them on the next turn.
+        signature = str(reasoning_content.get("signature") or "") if isinstance(reasoning_content, dict) else ""
+        if thinking_text or signature:
             blocks.insert(
                 0,
                 {
                     "type": "thinking",
                     "thinking": thinking_text,
-                    "signature": "",
+                    "signature": signature,
                 },
             )
 
@@ -410,6 +423,7 @@ def openai_to_anthropic(
                     name=str(tool_name),
                     arguments=tool_args,
                     incoming=original_request,
+                    file_cache=file_cache,
                 )
             except Exception:
                 remapped = None
@@ -447,6 +461,12 @@ def openai_to_anthropic(
         usage_block["input_tokens"] = usage["prompt_tokens"]
     if "completion_tokens" in usage:
         usage_block["output_tokens"] = usage["completion_tokens"]
+    details = usage.get("prompt_tokens_details")
+    cached = details.get("cached_tokens") if isinstance(details, dict) else None
+    if isinstance(cached, int) and cached > 0:
+        usage_block["cache_read_input_tokens"] = cached
+        if isinstance(usage_block.get("input_tokens"), int):
+            usage_block["input_tokens"] = max(0, usage_block["input_tokens"] - cached)
     if not usage_block:
         usage_block["output_tokens"] = _estimate_tokens_from_chars(output_chars)
         if original_request:
@@ -495,3 +515,23 @@ def build_poe_params(body: Dict[str, Any]) -> Dict[str, Any]:
             break
 
     return params
+
+
+CONTINUATION_PROMPT = "Continue exactly where your previous message stopped. Do not repeat any of it."
+
+
+def continuation_payload(payload: Dict[str, Any], partial_text: str, prefill: bool = True) -> Dict[str, Any]:
+    """
+    OpenAI chat payload asking the model to continue an interrupted answer.
+
+    With `prefill` the partial answer becomes a trailing assistant message the
+    model extends; otherwise an explicit user instruction follows it.
+    """
+    messages = list(payload.get("messages") or [])
+    if partial_text:
+        messages.append({"role": "assistant", "content": partial_text})
+        if not prefill:
+            messages.append({"role": "user", "content": CONTINUATION_PROMPT})
+    continued = dict(payload)
+    continued["messages"] = messages
+    return continued
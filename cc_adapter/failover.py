@@ -0,0 +1,46 @@
+import logging
+import re
+from typing import Any, Dict, List, Tuple
+
+from .model_registry import SUPPORTED_PROVIDERS, canonicalize_model
+from .models import normalize_model_spec
+
+logger = logging.getLogger(__name__)
+
+Hop = Tuple[str, str]
+
+
+def parse_chains(spec: str) -> Dict[str, List[Hop]]:
+    """
+    Parse FAILOVER_CHAINS into {"provider:model": [hop, ...]}.
+
+    Chains are separated by ";" or newlines, hops by "->", e.g.
+    "poe:claude-opus-4.5 -> openrouter:claude-opus-4.5 -> lmstudio:gpt-oss-120b".
+    The first hop is the model the chain applies to.
+    """
+    chains: Dict[str, List[Hop]] = {}
+    for raw_chain in re.split(r"[;\n]", spec or ""):
+        hops: List[Hop] = []
+        for raw_hop in raw_chain.split("->"):
+            spec_text = normalize_model_spec(raw_hop.strip()) or ""
+            if not spec_text:
+                continue
+            provider, sep, name = spec_text.partition(":")
+            provider = provider.strip().lower()
+            if not sep or provider not in SUPPORTED_PROVIDERS or not name.strip():
+                logger.warning("Ignoring invalid failover hop: %s", raw_hop.strip())
+                continue
+            hop = (provider, canonicalize_model(provider, name.strip()))
+            if hop not in hops:
+                hops.append(hop)
+        if len(hops) > 1:
+            chains[f"{hops[0][0]}:{hops[0][1]}"] = hops
+    return chains
+
+
+def chain_for(provider: str, model: str, settings: Any) -> List[Hop]:
+    """Ordered hops to try for a resolved provider/model; the resolved hop always comes first."""
+    chain = parse_chains(getattr(settings, "failover_chains", "")).get(f"{provider}:{model}")
+    if not chain:
+        return [(provider, model)]
+    return [(provider, model)] + [hop for hop in chain[1:] if hop != (provider, model)]
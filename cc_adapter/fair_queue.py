@@ -0,0 +1,312 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from . import metrics
+from .key_pool import fingerprint
+from .scheduler import QueueAbandoned, wait_turn
+
+logger = logging.getLogger(__name__)
+
+IDENTITY_SOURCES = ("user", "token", "address")
+TPM_WINDOW = 60.0
+# Idle clients whose counters stay in /health before the oldest are dropped.
+MAX_RETIRED = 1024
+TOTALS = ("requests", "rejected", "wait_total", "wait_max")
+
+
+class OverQuota(RuntimeError):
+    """Raised when a client has spent its tokens-per-minute budget."""
+
+    def __init__(self, client: str, retry_after: float):
+        super().__init__(f"Client {client} is over its tokens-per-minute limit; retry in {retry_after:.0f}s")
+        self.client = client
+        self.retry_after = retry_after
+
+
+def _header(headers: Any, name: str) -> str:
+    if not headers:
+        return ""
+    value = headers.get(name)
+    if value is None and isinstance(headers, dict):
+        value = {str(key).lower(): item for key, item in headers.items()}.get(name)
+    return str(value or "").strip()
+
+
+def client_id(incoming: Dict[str, Any], headers: Any, address: Any, settings: Any) -> str:
+    """
+    Identify the client behind a request by the first FAIR_QUEUE_IDENTITY source present:
+    "user" (metadata.user_id without its session suffix), "token" (fingerprint of the
+    x-api-key/Authorization header) or "address" (source IP).
+    """
+    sources = [item.strip().lower() for item in str(getattr(settings, "fair_queue_identity", "") or "").split(",")]
+    for source in [item for item in sources if item in IDENTITY_SOURCES] or list(IDENTITY_SOURCES):
+        if source == "user":
+            metadata = incoming.get("metadata") if isinstance(incoming.get("metadata"), dict) else {}
+            user = str(metadata.get("user_id") or "").strip()
+            if user:
+                return f"user:{user.split('_session_', 1)[0]}"
+        elif source == "token":
+            token = _header(headers, "x-api-key") or _header(headers, "authorization")
+            if token.lower().startswith("bearer "):
+                token = token[7:].strip()
+            if token:
+                return f"token:{fingerprint(token)}"
+        elif source == "address":
+            host = str((address or ("",))[0] or "").strip()
+            if host:
+                return f"addr:{host}"
+    return "anonymous"
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse FAIR_QUEUE_WEIGHTS ("addr:10.0.0.5=2, user:alice=3") into {client: weight}."""
+    weights: Dict[str, float] = {}
+    for item in (spec or "").split(","):
+        name, sep, raw = item.strip().rpartition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            weight = float(raw)
+        except ValueError:
+            logger.warning("Ignoring fair-queue weight %r", item.strip())
+            continue
+        if weight > 0:
+            weights[name.strip()] = weight
+    return weights
+
+
+class _Waiter:
+    def __init__(self) -> None:
+        self.enqueued = time.monotonic()
+        self.granted = threading.Event()
+
+
+class ClientState:
+    def __init__(self, name: str):
+        self.name = name
+        self.weight = 1.0
+        self.active = 0
+        self.requests = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.waiters: Deque[_Waiter] = deque()
+        self.spent: Deque[Tuple[float, int]] = deque()
+
+    def tokens_in_window(self, now: float) -> int:
+        while self.spent and now - self.spent[0][0] >= TPM_WINDOW:
+            self.spent.popleft()
+        return sum(tokens for _, tokens in self.spent)
+
+    def idle(self, now: float) -> bool:
+        return not self.active and not self.waiters and not self.tokens_in_window(now)
+
+    def totals(self) -> Dict[str, float]:
+        return {name: getattr(self, name) for name in TOTALS}
+
+    def restore(self, totals: Dict[str, float]) -> None:
+        for name, value in totals.items():
+            setattr(self, name, value)
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        return {
+            "weight": self.weight,
+            "active": self.active,
+            "queued": len(self.waiters),
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "tokens_last_minute": self.tokens_in_window(now),
+            "wait_total": round(self.wait_total, 3),
+            "wait_max": round(self.wait_max, 3),
+        }
+
+
+class FairQueue:
+    """
+    Weighted fair admission of client requests to the upstreams.
+
+    At most `limit` requests (0 = unlimited) are dispatched at once across all
+    clients, and at most `per_client` per client. A freed slot goes to the
+    waiting client with the fewest active requests per unit of weight, so a
+    client with weight 2 holds twice the slots of one with weight 1 when both
+    are busy. Clients over `tpm` estimated input tokens in the last minute are
+    refused with OverQuota instead of queueing. A client's queue state is
+    dropped once it has nothing running, queued or counted against its TPM
+    window; its counters are kept for the last MAX_RETIRED such clients.
+    """
+
+    def __init__(self) -> None:
+        self.limit = 0
+        self.per_client = 0
+        self.tpm = 0
+        self.weights: Dict[str, float] = {}
+        self.active = 0
+        self._clients: Dict[str, ClientState] = {}
+        self._retired: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, settings: Any) -> "FairQueue":
+        with self._lock:
+            self.limit = max(0, int(getattr(settings, "fair_queue_concurrency", 0) or 0))
+            self.per_client = max(0, int(getattr(settings, "fair_client_concurrency", 0) or 0))
+            self.tpm = max(0, int(getattr(settings, "fair_client_tpm", 0) or 0))
+            self.weights = parse_weights(getattr(settings, "fair_queue_weights", ""))
+            self._grant()
+        return self
+
+    def _client(self, name: str) -> ClientState:
+        client = self._clients.get(name)
+        if client is None:
+            client = self._clients[name] = ClientState(name)
+            client.restore(self._retired.pop(name, {}))
+        client.weight = self._weight(name)
+        return client
+
+    def _weight(self, name: str) -> float:
+        return self.weights.get(name) or self.weights.get(name.partition(":")[2]) or 1.0
+
+    def _can_run(self, client: ClientState) -> bool:
+        if self.limit and self.active >= self.limit:
+            return False
+        return not self.per_client or client.active < self.per_client
+
+    def _grant(self) -> None:
+        # Caller holds the lock.
+        while True:
+            ready: List[ClientState] = [client for client in self._clients.values() if client.waiters]
+            ready = [client for client in ready if self._can_run(client)]
+            if not ready:
+                return
+            client = min(ready, key=lambda item: (item.active / item.weight, item.waiters[0].enqueued))
+            waiter = client.waiters.popleft()
+            client.active += 1
+            self.active += 1
+            waiter.granted.set()
+
+    def _evict_idle(self) -> None:
+        # Caller holds the lock.
+        now = time.monotonic()
+        for name in [name for name, client in self._clients.items() if client.idle(now)]:
+            self._retired[name] = self._clients.pop(name).totals()
+        while len(self._retired) > MAX_RETIRED:
+            self._retired.popitem(last=False)
+
+    def _abandon(self, client: ClientState, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter in client.waiters:
+                client.waiters.remove(waiter)
+                self._evict_idle()
+                return
+        if waiter.granted.is_set():
+            # Granted while giving up: hand the slot on.
+            self.release(client.name)
+
+    def admit(
+        self,
+        name: str,
+        tokens: int = 0,
+        deadline: float = 0.0,
+        cancelled: Optional[Callable[[], bool]] = None,
+        on_queue: Optional[Callable[[], None]] = None,
+    ) -> float:
+        """
+        Wait for the client's turn; return seconds queued. Raises OverQuota past the TPM cap.
+
+        `deadline`, `cancelled` and `on_queue` bound the wait as in
+        PriorityScheduler.acquire, raising QueueAbandoned when the caller gives up.
+        """
+        now = time.monotonic()
+        with self._lock:
+            client = self._client(name)
+            client.requests += 1
+            if self.tpm:
+                # The request's own estimate counts too, so one oversized request cannot blow the cap.
+                if client.tokens_in_window(now) + tokens > self.tpm:
+                    client.rejected += 1
+                    oldest = client.spent[0][0] if client.spent else now
+                    retry_after = max(1.0, TPM_WINDOW - (now - oldest))
+                    metrics.incr("fair_queue.rejected")
+                    self._evict_idle()
+                    raise OverQuota(name, retry_after)
+                client.spent.append((now, tokens))
+            if not client.waiters and self._can_run(client):
+                client.active += 1
+                self.active += 1
+                return 0.0
+            waiter = _Waiter()
+            client.waiters.append(waiter)
+        metrics.incr("fair_queue.queued")
+        try:
+            if on_queue is not None and not waiter.granted.is_set():
+                on_queue()
+            reason = wait_turn(waiter.granted, deadline, cancelled)
+        except BaseException:
+            self._abandon(client, waiter)
+            raise
+        waited = time.monotonic() - waiter.enqueued
+        if reason:
+            self._abandon(client, waiter)
+            metrics.incr(f"fair_queue.abandoned.{reason}")
+            raise QueueAbandoned(f"Client {name} gave up waiting {waited:.1f}s for its fair share ({reason})", reason)
+        with self._lock:
+            client.wait_total += waited
+            client.wait_max = max(client.wait_max, waited)
+        metrics.incr("fair_queue.wait_seconds", waited)
+        return waited
+
+    def release(self, name: str) -> None:
+        with self._lock:
+            client = self._client(name)
+            client.active = max(0, client.active - 1)
+            self.active = max(0, self.active - 1)
+            self._grant()
+            self._evict_idle()
+
+    @contextmanager
+    def slot(
+        self,
+        name: str,
+        tokens: int = 0,
+        deadline: float = 0.0,
+        cancelled: Optional[Callable[[], bool]] = None,
+        on_queue: Optional[Callable[[], None]] = None,
+    ) -> Iterator[float]:
+        waited = self.admit(name, tokens, deadline, cancelled, on_queue)
+        if waited >= 0.1:
+            logger.info("Client %s waited %.1fs for its fair share", name, waited)
+        try:
+            yield waited
+        finally:
+            self.release(name)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            clients = dict(self._clients)
+            for name, totals in self._retired.items():
+                retired = ClientState(name)
+                retired.restore(totals)
+                retired.weight = self._weight(name)
+                clients[name] = retired
+            return {name: client.snapshot(now) for name, client in clients.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._clients.clear()
+            self._retired.clear()
+            self.active = 0
+
+
+QUEUE = FairQueue()
+
+
+def for_settings(settings: Any) -> FairQueue:
+    return QUEUE.configure(settings)
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    return QUEUE.snapshot()
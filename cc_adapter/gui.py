@@ -30,6 +30,7 @@ from .codex_oauth import (
     start_local_callback_server,
     wait_for_callback_code,
 )
+from .key_pool import first_key
 from .model_registry import DEFAULT_PROVIDER_MODELS, provider_model_slugs
 from .server import build_server, port_available
 from .logging_utils import file_handler_from_env, resolve_log_level
@@ -955,7 +956,7 @@ class AdapterGUI:
         resp = requests.post(
             settings.poe_base_url,
             json=payload,
-            headers={"Authorization": f"Bearer {settings.poe_api_key}"},
+            headers={"Authorization": f"Bearer {first_key(settings.poe_api_key)}"},
             timeout=settings.lmstudio_timeout,
             proxies=settings.resolved_proxies(),
         )
@@ -981,7 +982,7 @@ class AdapterGUI:
         resp = requests.post(
             settings.openrouter_base,
             json=payload,
-            headers={"Authorization": f"Bearer {settings.openrouter_key}"},
+            headers={"Authorization": f"Bearer {first_key(settings.openrouter_key)}"},
             timeout=settings.lmstudio_timeout,
             proxies=settings.resolved_proxies(),
         )
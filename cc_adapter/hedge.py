@@ -0,0 +1,168 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, TypeVar
+
+from . import client_monitor, metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Successful latencies kept per upstream model, and how many are needed before hedging.
+WINDOW = 200
+MIN_SAMPLES = 20
+QUANTILE = 0.9
+
+
+class LatencyWindow:
+    """Recent successful non-streaming latencies for one provider:model."""
+
+    def __init__(self, size: int = WINDOW):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float = QUANTILE, min_samples: int = MIN_SAMPLES) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+
+class Hedger:
+    """
+    Races a duplicate request against a slow one.
+
+    The primary call runs on a worker thread; if it has not answered within the
+    model's observed p90 latency and the hedge budget (hedges per eligible
+    request) allows, `alternate` is started too and the first success wins.
+
+    The loser is aborted through its `client_monitor.UpstreamScope` and `run`
+    returns only once it has finished, so the caller's scheduler slot and any
+    LM Studio backend lease stay held for as long as either attempt runs.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._windows: Dict[str, LatencyWindow] = {}
+        self.requests = 0
+        self.hedges = 0
+
+    def window(self, key: str) -> LatencyWindow:
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = LatencyWindow()
+            return window
+
+    def _spend(self, budget: float) -> bool:
+        with self._lock:
+            if self.hedges + 1 > budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def run(
+        self,
+        key: str,
+        primary: Callable[[], T],
+        alternate: Callable[[], T],
+        budget: float,
+        alternate_key: str = "",
+    ) -> T:
+        """
+        Return the first successful answer of `primary` and, if it is slow, `alternate`.
+
+        `key`/`alternate_key` name the provider:model each call goes to; every
+        successful attempt records its latency under its own key, so a fast
+        alternate upstream does not drag the primary's p90 down.
+        """
+        window = self.window(key)
+        windows = {"primary": window, "hedge": self.window(alternate_key) if alternate_key else window}
+        delay = window.quantile()
+        with self._lock:
+            self.requests += 1
+        results: queue.Queue = queue.Queue()
+        scopes = {"primary": client_monitor.UpstreamScope(), "hedge": client_monitor.UpstreamScope()}
+
+        def _attempt(label: str, call: Callable[[], T]) -> None:
+            started = time.monotonic()
+            try:
+                with scopes[label].active():
+                    result = call()
+            except BaseException as exc:
+                results.put((label, None, exc))
+                return
+            # Losers still report their latency so the window is not biased towards fast answers.
+            windows[label].record(time.monotonic() - started)
+            results.put((label, result, None))
+
+        threading.Thread(target=_attempt, args=("primary", primary), daemon=True).start()
+        pending = 1
+        try:
+            first = results.get(timeout=delay)
+        except queue.Empty:
+            if not self._spend(budget):
+                metrics.incr("hedge.over_budget")
+                first = results.get()
+            else:
+                logger.info("No answer from %s after %.2fs (p90); sending a hedged request", key, delay)
+                metrics.incr("hedge.fired")
+                threading.Thread(target=_attempt, args=("hedge", alternate), daemon=True).start()
+                pending = 2
+                first = results.get()
+        errors = []
+        while True:
+            label, result, error = first
+            pending -= 1
+            if error is None:
+                if pending:
+                    self._cancel(scopes["hedge" if label == "primary" else "primary"], results)
+                if label == "hedge":
+                    metrics.incr("hedge.won")
+                return result
+            errors.append(error)
+            if not pending:
+                raise errors[0]
+            first = results.get()
+
+    @staticmethod
+    def _cancel(scope: client_monitor.UpstreamScope, results: queue.Queue) -> None:
+        # Wait for the loser even once aborted: until it returns it still holds its slot and lease.
+        scope.abort()
+        _, _, error = results.get()
+        if error is not None and scope.shut_down:
+            metrics.incr("hedge.cancelled")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            windows = dict(self._windows)
+            data: Dict[str, Any] = {"requests": self.requests, "hedges": self.hedges}
+        data["p90"] = {
+            key: round(p90, 3) for key, window in windows.items() if (p90 := window.quantile()) is not None
+        }
+        return data
+
+    def reset(self) -> None:
+        with self._lock:
+            self._windows.clear()
+            self.requests = 0
+            self.hedges = 0
+
+
+HEDGER = Hedger()
+
+
+def snapshot() -> Dict[str, Any]:
+    return HEDGER.snapshot()
@@ -0,0 +1,184 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import metrics
+from .retry import parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+# Conversations remembered for stickiness before the oldest are forgotten.
+MAX_STICKY = 1024
+
+SETTINGS_FIELDS = {"poe": "poe_api_key", "openrouter": "openrouter_key"}
+
+
+def parse_keys(raw: str) -> List[str]:
+    """Split a POE_API_KEY/OPENROUTER_API_KEY value holding one or more comma-separated keys."""
+    keys: List[str] = []
+    for item in (raw or "").split(","):
+        item = item.strip()
+        if item and item not in keys:
+            keys.append(item)
+    return keys
+
+
+def first_key(raw: str) -> str:
+    """The first key of a comma-separated key setting, or "" when none is set."""
+    keys = parse_keys(raw)
+    return keys[0] if keys else ""
+
+
+def fingerprint(api_key: str) -> str:
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:8]
+
+
+class KeyState:
+    def __init__(self, key: str):
+        self.key = key
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.unauthorized = 0
+        self.quarantined_until = 0.0
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "unauthorized": self.unauthorized,
+            "quarantined_for": round(max(0.0, self.quarantined_until - now), 1),
+        }
+
+
+class KeyPool:
+    """
+    Round-robin scheduler over one provider's API keys.
+
+    A conversation keeps the key that first served it (upstream prompt caches are
+    per account) until that key is quarantined: after a 429 for Retry-After or
+    `quarantine_seconds`, after a 401/403 for `auth_quarantine_seconds`. When every
+    key is quarantined the one released soonest is used.
+    """
+
+    def __init__(
+        self, provider: str, keys: List[str], quarantine_seconds: float = 60.0, auth_quarantine_seconds: float = 900.0
+    ):
+        self.provider = provider
+        self.states = [KeyState(key) for key in keys]
+        self.quarantine_seconds = quarantine_seconds
+        self.auth_quarantine_seconds = auth_quarantine_seconds
+        self._cursor = 0
+        self._sticky: "OrderedDict[str, KeyState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, settings: Any) -> "KeyPool":
+        self.quarantine_seconds = float(getattr(settings, "api_key_quarantine", self.quarantine_seconds))
+        self.auth_quarantine_seconds = float(
+            getattr(settings, "api_key_auth_quarantine", self.auth_quarantine_seconds)
+        )
+        return self
+
+    def _next(self, now: float) -> KeyState:
+        for offset in range(len(self.states)):
+            state = self.states[(self._cursor + offset) % len(self.states)]
+            if state.quarantined_until <= now:
+                self._cursor = (self._cursor + offset + 1) % len(self.states)
+                return state
+        return min(self.states, key=lambda item: item.quarantined_until)
+
+    def pick(self, conversation: str = "") -> str:
+        if not self.states:
+            return ""
+        now = time.monotonic()
+        with self._lock:
+            state = self._sticky.get(conversation) if conversation else None
+            if state is not None and state.quarantined_until <= now:
+                self._sticky.move_to_end(conversation)
+            else:
+                state = self._next(now)
+                if conversation:
+                    self._sticky[conversation] = state
+                    while len(self._sticky) > MAX_STICKY:
+                        self._sticky.popitem(last=False)
+            state.requests += 1
+            return state.key
+
+    def _state(self, key: str) -> Optional[KeyState]:
+        for state in self.states:
+            if state.key == key:
+                return state
+        return None
+
+    def observe(self, key: str, resp: Any) -> None:
+        """Count the outcome of a request made with `key`, quarantining it on 429/401/403."""
+        status = getattr(resp, "status_code", None)
+        if not isinstance(status, int) or status < 400:
+            return
+        headers = {str(name).lower(): value for name, value in (getattr(resp, "headers", None) or {}).items()}
+        with self._lock:
+            state = self._state(key)
+            if state is None:
+                return
+            state.errors += 1
+            if status == 429:
+                state.throttled += 1
+                pause = parse_retry_after(headers.get("retry-after")) or self.quarantine_seconds
+            elif status in (401, 403):
+                state.unauthorized += 1
+                pause = self.auth_quarantine_seconds
+            else:
+                return
+            if len(self.states) < 2 or pause <= 0:
+                return
+            state.quarantined_until = max(state.quarantined_until, time.monotonic() + pause)
+        metrics.incr(f"keypool.quarantined.{self.provider}")
+        logger.warning(
+            "Quarantining %s key:%s for %.0fs after HTTP %s", self.provider, fingerprint(key), pause, status
+        )
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return {f"{self.provider} key:{fingerprint(state.key)}": state.snapshot(now) for state in self.states}
+
+
+class KeyPoolRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pools: Dict[Tuple[str, Tuple[str, ...]], KeyPool] = {}
+
+    def get(self, settings: Any, provider: str) -> KeyPool:
+        keys = tuple(parse_keys(getattr(settings, SETTINGS_FIELDS.get(provider, ""), "")))
+        with self._lock:
+            pool = self._pools.get((provider, keys))
+            if pool is None:
+                pool = self._pools[(provider, keys)] = KeyPool(provider, list(keys))
+        return pool.configure(settings)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            pools = list(self._pools.values())
+        merged: Dict[str, Dict[str, Any]] = {}
+        for pool in pools:
+            merged.update(pool.snapshot())
+        return merged
+
+    def reset(self) -> None:
+        with self._lock:
+            self._pools.clear()
+
+
+REGISTRY = KeyPoolRegistry()
+
+
+def for_provider(settings: Any, provider: str) -> KeyPool:
+    return REGISTRY.get(settings, provider)
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    return REGISTRY.snapshot()
@@ -0,0 +1,39 @@
+import threading
+from typing import Dict, Union
+
+Number = Union[int, float]
+
+
+class MetricsRegistry:
+    """Thread-safe named counters, exposed on /health."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Number] = {}
+
+    def incr(self, name: str, amount: Number = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def get(self, name: str) -> Number:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, Number]:
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+
+def incr(name: str, amount: Number = 1) -> None:
+    REGISTRY.incr(name, amount)
+
+
+def snapshot() -> Dict[str, Number]:
+    return REGISTRY.snapshot()
@@ -2,6 +2,8 @@ import copy
 from dataclasses import dataclass, field
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+SUPPORTED_PROVIDERS = {"poe", "lmstudio", "openrouter", "codex"}
+
 
 @dataclass(frozen=True)
 class ModelInfo:
@@ -2,7 +2,8 @@ from typing import Optional, Tuple
 
 from .config import Settings
 from .codex_oauth import default_token_path
-from .model_registry import DEFAULT_PROVIDER_MODELS, canonicalize_model, find_model, provider_models
+from .model_registry import DEFAULT_PROVIDER_MODELS, find_model, provider_models
+from . import routing
 
 
 def normalize_model_spec(model: Optional[str]) -> Optional[str]:
@@ -98,27 +99,6 @@ def available_models(settings: Settings) -> list[str]:
 
 
 def resolve_provider_model(model: Optional[str], settings: Settings) -> Tuple[str, str]:
-    """Return (provider, upstream_model) while favoring the selected model by default."""
-    default_model = settings.model
-    if not default_model:
-        raise ValueError("Model is required and must include provider prefix (e.g., poe:claude-opus-4.5)")
-    if ":" not in default_model:
-        raise ValueError("Model must include provider prefix (e.g., poe:claude-opus-4.5)")
-
-    default_provider, default_name = default_model.split(":", 1)
-    default_provider = default_provider.lower()
-    if default_provider not in {"poe", "lmstudio", "openrouter", "codex"}:
-        raise ValueError(f"Unsupported provider prefix: {default_provider}")
-
-    requested = (model or "").strip()
-    if requested:
-        req_provider = default_provider
-        req_name = requested
-        if ":" in requested:
-            req_provider, req_name = requested.split(":", 1)
-            req_provider = req_provider.lower()
-
-        if req_provider in {"poe", "openrouter"} and "claude-haiku" in req_name.lower():
-            return req_provider, canonicalize_model(req_provider, req_name)
-
-    return default_provider, canonicalize_model(default_provider, default_name)
+    """Return (provider, upstream_model) for a requested model via the routing table (see routing.decide)."""
+    decision = routing.decide({"model": model or ""}, settings)
+    return decision.provider, decision.model
@@ -0,0 +1,326 @@
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from . import backend_pool, failover, metrics, routing, timeouts
+from .key_pool import first_key
+from .model_registry import canonicalize_model
+from .models import normalize_model_spec
+
+logger = logging.getLogger(__name__)
+
+Hop = Tuple[str, str]
+
+# Codex speaks the Responses API behind OAuth; only OpenAI-compatible upstreams are probed.
+PROBED_PROVIDERS = ("poe", "openrouter", "lmstudio")
+# Weight of the newest probe in the moving averages.
+ALPHA = 0.3
+PROBE_MAX_TOKENS = 16
+PROBE_MESSAGES = [{"role": "user", "content": "Reply with the single word: ok"}]
+
+
+class Score:
+    """
+    Exponentially weighted probe results for one model: connect (until response
+    headers), time to first token and output tokens/s.
+    """
+
+    def __init__(self) -> None:
+        self.connect = 0.0
+        self.ttft = 0.0
+        self.tokens_per_second = 0.0
+        self.samples = 0
+        self.failures = 0
+        self.last_error = ""
+        self.updated = 0.0
+
+    def observe(self, connect: float, ttft: float, tokens_per_second: float) -> None:
+        if self.samples:
+            self.connect = ALPHA * connect + (1 - ALPHA) * self.connect
+            self.ttft = ALPHA * ttft + (1 - ALPHA) * self.ttft
+            if tokens_per_second:
+                self.tokens_per_second = ALPHA * tokens_per_second + (1 - ALPHA) * self.tokens_per_second
+        else:
+            self.connect, self.ttft, self.tokens_per_second = connect, ttft, tokens_per_second
+        self.samples += 1
+        self.last_error = ""
+        self.updated = time.time()
+
+    def fail(self, reason: str) -> None:
+        self.failures += 1
+        self.last_error = reason
+        self.updated = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "connect": round(self.connect, 3),
+            "ttft": round(self.ttft, 3),
+            "tokens_per_second": round(self.tokens_per_second, 1),
+            "samples": self.samples,
+            "failures": self.failures,
+            "age": round(time.time() - self.updated, 1) if self.updated else None,
+        }
+        if self.last_error:
+            data["last_error"] = self.last_error
+        return data
+
+
+class ScoreBoard:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._scores: Dict[str, Score] = {}
+
+    def get(self, provider: str, model: str) -> Optional[Score]:
+        with self._lock:
+            return self._scores.get(f"{provider}:{model}")
+
+    def _score(self, provider: str, model: str) -> Score:
+        with self._lock:
+            score = self._scores.get(f"{provider}:{model}")
+            if score is None:
+                score = self._scores[f"{provider}:{model}"] = Score()
+            return score
+
+    def observe(self, provider: str, model: str, connect: float, ttft: float, tokens_per_second: float) -> None:
+        score = self._score(provider, model)
+        with self._lock:
+            score.observe(connect, ttft, tokens_per_second)
+
+    def fail(self, provider: str, model: str, reason: str) -> None:
+        score = self._score(provider, model)
+        with self._lock:
+            score.fail(reason)
+
+    def rank(self, hops: List[Hop], max_age: float = 0.0) -> List[Hop]:
+        """
+        Order equivalent hops (a failover chain) by measured time to first token,
+        breaking ties by output tokens/s.
+
+        Hops whose last probe failed go last. The configured order is kept unless
+        every hop has a fresh score (younger than `max_age` seconds when set).
+        """
+        if len(hops) < 2:
+            return list(hops)
+        now = time.time()
+        with self._lock:
+            scores = [self._scores.get(f"{provider}:{model}") for provider, model in hops]
+            if any(score is None or (max_age and now - score.updated > max_age) for score in scores):
+                return list(hops)
+            # Failed hops last, then by time to first token, then by throughput.
+            keys = [
+                (bool(score.last_error) or not score.samples, score.ttft, -score.tokens_per_second)
+                for score in scores
+            ]
+        return [hop for _, hop in sorted(zip(keys, hops), key=lambda item: item[0])]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {key: score.snapshot() for key, score in self._scores.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._scores.clear()
+
+
+SCORES = ScoreBoard()
+
+
+def _spec(raw: str) -> Optional[Hop]:
+    provider, sep, name = (normalize_model_spec(raw.strip()) or "").partition(":")
+    provider = provider.strip().lower()
+    if not sep or not name.strip():
+        return None
+    return provider, canonicalize_model(provider, name.strip())
+
+
+def probe_targets(settings: Any) -> List[Hop]:
+    """The default model, every failover hop and PROBE_MODELS, for providers with credentials."""
+    targets: List[Hop] = []
+    candidates: List[Optional[Hop]] = []
+    try:
+        provider, name = routing.default_target(settings)
+        candidates.append((provider, canonicalize_model(provider, name)))
+    except ValueError:
+        pass
+    for chain in failover.parse_chains(getattr(settings, "failover_chains", "")).values():
+        candidates.extend(chain)
+    candidates.extend(_spec(raw) for raw in str(getattr(settings, "probe_models", "") or "").split(","))
+    for hop in candidates:
+        if hop is None or hop in targets or hop[0] not in PROBED_PROVIDERS:
+            continue
+        if hop[0] == "poe" and not first_key(getattr(settings, "poe_api_key", "")):
+            continue
+        if hop[0] == "openrouter" and not first_key(getattr(settings, "openrouter_key", "")):
+            continue
+        targets.append(hop)
+    return targets
+
+
+def _endpoints(provider: str, settings: Any) -> List[Tuple[str, Dict[str, str]]]:
+    """(url, headers) to probe for a provider: one per pooled backend for LM Studio."""
+    if provider == "poe":
+        return [(settings.poe_base_url, {"Authorization": f"Bearer {first_key(settings.poe_api_key)}"})]
+    if provider == "openrouter":
+        return [(settings.openrouter_base, {"Authorization": f"Bearer {first_key(settings.openrouter_key)}"})]
+    return [(url, {}) for url, _ in backend_pool.parse_backends(settings.lmstudio_backends, settings.lmstudio_base)]
+
+
+def _delta_text(event: Dict[str, Any]) -> str:
+    choices = event.get("choices") or []
+    delta = (choices[0].get("delta") or {}) if choices and isinstance(choices[0], dict) else {}
+    for key in ("content", "reasoning", "reasoning_content"):
+        value = delta.get(key)
+        if isinstance(value, str) and value:
+            return value
+    return ""
+
+
+def probe(provider: str, model: str, settings: Any, url: str = "") -> Tuple[float, float, float]:
+    """
+    Send one tiny streaming request; return (connect, time to first token, output tokens/s).
+
+    `url` picks one LM Studio backend; by default the provider's first endpoint is used.
+    """
+    endpoints = _endpoints(provider, settings)
+    url, headers = next(((item, hdrs) for item, hdrs in endpoints if item == url), endpoints[0])
+    payload = {
+        "model": model,
+        "messages": PROBE_MESSAGES,
+        "max_tokens": PROBE_MAX_TOKENS,
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
+    phase_timeouts = timeouts.for_provider(settings, provider)
+    started = time.monotonic()
+    resp = requests.post(
+        url,
+        json=payload,
+        headers=headers,
+        timeout=(phase_timeouts.connect, min(phase_timeouts.first_byte, 60.0)),
+        proxies=settings.resolved_proxies(),
+        stream=True,
+    )
+    try:
+        connect = time.monotonic() - started
+        resp.raise_for_status()
+        first_token: Optional[float] = None
+        chunks = 0
+        completion_tokens = 0
+        for line in resp.iter_lines(decode_unicode=False):
+            if not line or not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+            try:
+                event = json.loads(data)
+            except ValueError:
+                continue
+            if _delta_text(event):
+                first_token = first_token or time.monotonic()
+                chunks += 1
+            usage = event.get("usage") or {}
+            completion_tokens = int(usage.get("completion_tokens") or completion_tokens)
+        finished = time.monotonic()
+    finally:
+        resp.close()
+    ttft = (first_token or finished) - started
+    generating = finished - first_token if first_token else 0.0
+    tokens = completion_tokens or chunks
+    return connect, ttft, tokens / generating if generating > 0 and tokens else 0.0
+
+
+class Prober:
+    """Background thread probing every target each PROBE_INTERVAL seconds."""
+
+    def __init__(self, settings: Any, scores: ScoreBoard = SCORES):
+        self.settings = settings
+        self.scores = scores
+        self.interval = float(getattr(settings, "probe_interval", 0) or 0)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> None:
+        for provider, model in probe_targets(self.settings):
+            if self._stop.is_set():
+                return
+            if provider == "lmstudio":
+                self._probe_backends(model)
+                continue
+            try:
+                connect, ttft, tokens_per_second = probe(provider, model, self.settings)
+            except Exception as exc:
+                metrics.incr(f"probe.failed.{provider}")
+                logger.info("Latency probe of %s:%s failed: %s", provider, model, exc)
+                self.scores.fail(provider, model, str(exc)[:200])
+                continue
+            metrics.incr(f"probe.ok.{provider}")
+            logger.debug(
+                "Probed %s:%s connect=%.2fs ttft=%.2fs %.1f tok/s", provider, model, connect, ttft, tokens_per_second
+            )
+            self.scores.observe(provider, model, connect, ttft, tokens_per_second)
+
+    def _probe_backends(self, model: str) -> None:
+        """
+        Probe every pooled LM Studio backend, scored as "lmstudio:<model>@<url>".
+
+        The pool learns each backend's latency; the hop itself is scored by its
+        fastest backend, since requests go to the healthy ones.
+        """
+        pool = backend_pool.for_settings(self.settings)
+        results: List[Tuple[float, float, float]] = []
+        error = ""
+        for url, _ in _endpoints("lmstudio", self.settings):
+            if self._stop.is_set():
+                return
+            try:
+                result = probe("lmstudio", model, self.settings, url)
+            except Exception as exc:
+                metrics.incr("probe.failed.lmstudio")
+                logger.info("Latency probe of lmstudio:%s at %s failed: %s", model, url, exc)
+                error = str(exc)[:200]
+                self.scores.fail("lmstudio", f"{model}@{url}", error)
+                continue
+            metrics.incr("probe.ok.lmstudio")
+            self.scores.observe("lmstudio", f"{model}@{url}", *result)
+            pool.record_latency(url, result[0])
+            results.append(result)
+        if results:
+            self.scores.observe("lmstudio", model, *min(results, key=lambda item: item[1]))
+        elif error:
+            self.scores.fail("lmstudio", model, error)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def start(self) -> "Prober":
+        self._thread = threading.Thread(target=self._loop, name="cc-adapter-prober", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def start(settings: Any) -> Optional[Prober]:
+    """Start the background prober when PROBE_INTERVAL is set."""
+    if float(getattr(settings, "probe_interval", 0) or 0) <= 0:
+        return None
+    return Prober(settings).start()
+
+
+def rank(hops: List[Hop], settings: Any) -> List[Hop]:
+    interval = float(getattr(settings, "probe_interval", 0) or 0)
+    if interval <= 0:
+        return list(hops)
+    return SCORES.rank(hops, max_age=3 * interval)
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    return SCORES.snapshot()
@@ -1,7 +1,10 @@
 import copy
+import hashlib
 import logging
 import json
+import re
 import threading
+from collections import OrderedDict
 from http.server import BaseHTTPRequestHandler
 from typing import Any, Dict, List, Optional, Tuple
 
@@ -21,11 +24,13 @@ from ..codex_oauth import (
     refresh_access_token,
     save_tokens,
 )
+from ..codex_reasoning import encode_reasoning_signature
 from ..config import Settings
 from ..context_limits import enforce_context_limits
 from ..logging_utils import log_payload
 from ..model_registry import default_extra_body_for
-from ..streaming import stream_responses_response
+from ..streaming import start_sse_response, stream_responses_response
+from .. import client_monitor, metrics, timeouts
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +39,9 @@ OPENAI_BETA_VALUE = "responses=experimental"
 CHATGPT_ACCOUNT_HEADER = "chatgpt-account-id"
 ORIGINATOR_HEADER = "originator"
 ORIGINATOR_VALUE = "codex_cli_rs"
+SESSION_ID_HEADER = "session_id"
+# Converted conversation prefixes kept for incremental Responses input conversion.
+MAX_INPUT_PREFIXES = 64
 
 _CODEX_GLOBAL_DEFAULTS: Dict[str, Any] = {
     "reasoning": {"effort": "medium", "summary": "auto"},
@@ -43,6 +51,9 @@ _CODEX_GLOBAL_DEFAULTS: Dict[str, Any] = {
 
 _SESSION_LOCAL = threading.local()
 
+# Claude Code sends metadata.user_id as "user_<hash>_account_<uuid>_session_<uuid>".
+_CLAUDE_CODE_SESSION_RE = re.compile(r"session_([0-9A-Za-z-]+)")
+
 
 def _truthy(value: Any) -> bool:
     return str(value or "").strip().lower() in {"1", "true", "yes", "on", "always"}
@@ -127,14 +138,59 @@ def _resolve_codex_auth(settings: Settings) -> Tuple[CodexOAuthTokens, str]:
     return tokens, account_id
 
 
-def _headers(account_id: str, access_token: str) -> Dict[str, str]:
-    return {
+def _headers(account_id: str, access_token: str, session_id: Optional[str] = None) -> Dict[str, str]:
+    headers = {
         "Authorization": f"Bearer {access_token}",
         CHATGPT_ACCOUNT_HEADER: account_id,
         OPENAI_BETA_HEADER: OPENAI_BETA_VALUE,
         ORIGINATOR_HEADER: ORIGINATOR_VALUE,
         "accept": "text/event-stream",
     }
+    if session_id:
+        headers[SESSION_ID_HEADER] = session_id
+    return headers
+
+
+def _claude_code_session_id(incoming: Optional[Dict[str, Any]]) -> str:
+    if not isinstance(incoming, dict):
+        return ""
+    metadata = incoming.get("metadata")
+    if not isinstance(metadata, dict):
+        return ""
+    user_id = str(metadata.get("user_id") or "").strip()
+    if not user_id:
+        return ""
+    match = _CLAUDE_CODE_SESSION_RE.search(user_id)
+    return match.group(1) if match else ""
+
+
+def _first_user_text(incoming: Dict[str, Any]) -> str:
+    for msg in incoming.get("messages") or []:
+        if isinstance(msg, dict) and msg.get("role") == "user":
+            return _flatten_text(msg.get("content"))
+    return ""
+
+
+def _prompt_cache_key(incoming: Optional[Dict[str, Any]]) -> str:
+    """
+    Derive a stable per-conversation key for Responses API prompt caching.
+
+    Prefers the Claude Code session id; otherwise falls back to the user id plus
+    the first user message, which stays fixed for the lifetime of a conversation.
+    """
+    if not isinstance(incoming, dict):
+        return ""
+    session_id = _claude_code_session_id(incoming)
+    if session_id:
+        seed = f"session:{session_id}"
+    else:
+        first_user = _first_user_text(incoming)
+        if not first_user:
+            return ""
+        metadata = incoming.get("metadata") if isinstance(incoming.get("metadata"), dict) else {}
+        seed = f"conversation:{metadata.get('user_id') or ''}:{first_user}"
+    digest = hashlib.sha256(seed.encode("utf-8")).hexdigest()[:32]
+    return f"cc-adapter-{digest}"
 
 
 def _responses_tools(tools: Any) -> Optional[List[Dict[str, Any]]]:
@@ -247,69 +303,142 @@ def _flatten_text(content: Any) -> str:
 def _messages_to_responses_input(messages: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
     developer_parts: List[str] = []
     items: List[Dict[str, Any]] = []
-
     for msg in messages:
-        if not isinstance(msg, dict):
-            continue
-        role = (msg.get("role") or "").strip()
-        if role == "system":
-            text = _flatten_text(msg.get("content"))
-            if text:
-                developer_parts.append(text)
-            continue
+        _append_responses_input(msg, developer_parts, items)
+    developer_prompt = "\n\n".join([p for p in developer_parts if p]).strip()
+    return developer_prompt, items
 
-        if role == "tool":
-            call_id = msg.get("tool_call_id") or msg.get("id")
-            output = _flatten_text(msg.get("content"))
-            if call_id:
-                items.append(
-                    {
-                        "type": "function_call_output",
-                        "call_id": str(call_id),
-                        "output": output,
-                    }
-                )
-            else:
-                # Best-effort fallback: surface tool output as text context.
-                if output:
-                    items.append(
-                        {
-                            "type": "message",
-                            "role": "user",
-                            "content": [{"type": "input_text", "text": output}],
-                        }
-                    )
-            continue
 
-        content_parts = _responses_content_parts(
-            msg.get("content"),
-            text_part_type="output_text" if role == "assistant" else "input_text",
-            include_images=(role != "assistant"),
-        )
-        if content_parts:
-            items.append({"type": "message", "role": role or "user", "content": content_parts})
+def _append_responses_input(msg: Any, developer_parts: List[str], items: List[Dict[str, Any]]) -> None:
+    """Convert one chat message, adding system text to `developer_parts` and Responses items to `items`."""
+    if not isinstance(msg, dict):
+        return
+    role = (msg.get("role") or "").strip()
+    if role == "system":
+        text = _flatten_text(msg.get("content"))
+        if text:
+            developer_parts.append(text)
+        return
 
-        if role == "assistant":
-            for call in msg.get("tool_calls") or []:
-                if not isinstance(call, dict):
-                    continue
-                func = call.get("function") or {}
-                if not isinstance(func, dict):
-                    continue
-                call_id = call.get("id") or func.get("name") or "tool_call"
-                name = func.get("name") or "tool"
-                arguments = func.get("arguments") or ""
+    if role == "tool":
+        call_id = msg.get("tool_call_id") or msg.get("id")
+        output = _flatten_text(msg.get("content"))
+        if call_id:
+            items.append(
+                {
+                    "type": "function_call_output",
+                    "call_id": str(call_id),
+                    "output": output,
+                }
+            )
+        else:
+            # Best-effort fallback: surface tool output as text context.
+            if output:
                 items.append(
                     {
-                        "type": "function_call",
-                        "call_id": str(call_id),
-                        "name": str(name),
-                        "arguments": str(arguments),
+                        "type": "message",
+                        "role": "user",
+                        "content": [{"type": "input_text", "text": output}],
                     }
                 )
+        return
 
-    developer_prompt = "\n\n".join([p for p in developer_parts if p]).strip()
-    return developer_prompt, items
+    if role == "assistant":
+        for reasoning_item in msg.get("reasoning_items") or []:
+            if isinstance(reasoning_item, dict) and reasoning_item.get("encrypted_content"):
+                items.append(reasoning_item)
+
+    content_parts = _responses_content_parts(
+        msg.get("content"),
+        text_part_type="output_text" if role == "assistant" else "input_text",
+        include_images=(role != "assistant"),
+    )
+    if content_parts:
+        items.append({"type": "message", "role": role or "user", "content": content_parts})
+
+    if role == "assistant":
+        for call in msg.get("tool_calls") or []:
+            if not isinstance(call, dict):
+                continue
+            func = call.get("function") or {}
+            if not isinstance(func, dict):
+                continue
+            call_id = call.get("id") or func.get("name") or "tool_call"
+            name = func.get("name") or "tool"
+            arguments = func.get("arguments") or ""
+            items.append(
+                {
+                    "type": "function_call",
+                    "call_id": str(call_id),
+                    "name": str(name),
+                    "arguments": str(arguments),
+                }
+            )
+
+
+def _without_cache_control(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _without_cache_control(item) for key, item in value.items() if key != "cache_control"}
+    if isinstance(value, list):
+        return [_without_cache_control(item) for item in value]
+    return value
+
+
+def _message_digest(msg: Any) -> bytes:
+    # Claude Code moves its cache_control breakpoint to the newest message every turn.
+    raw = json.dumps(_without_cache_control(msg), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).digest()
+
+
+class InputPrefixCache:
+    """
+    Remembers the Responses input converted for recent conversation prefixes.
+
+    Prefixes are keyed by a rolling hash over their messages, so a follow-up
+    turn that appends to a known conversation reuses the converted history and
+    only runs `_append_responses_input` over the new messages.
+    """
+
+    def __init__(self, max_entries: int = MAX_INPUT_PREFIXES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[List[str], List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def convert(self, messages: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        rolling = hashlib.sha256()
+        keys: List[str] = []
+        for msg in messages:
+            rolling.update(_message_digest(msg))
+            keys.append(rolling.hexdigest())
+
+        start = 0
+        developer_parts: List[str] = []
+        items: List[Dict[str, Any]] = []
+        with self._lock:
+            for idx in range(len(keys), 0, -1):
+                cached = self._entries.get(keys[idx - 1])
+                if cached is not None:
+                    self._entries.move_to_end(keys[idx - 1])
+                    start, developer_parts, items = idx, list(cached[0]), list(cached[1])
+                    break
+        metrics.incr("codex.input_prefix.hit" if start else "codex.input_prefix.miss")
+
+        for msg in messages[start:]:
+            _append_responses_input(msg, developer_parts, items)
+        if keys and start < len(keys):
+            with self._lock:
+                self._entries[keys[-1]] = (list(developer_parts), list(items))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        developer_prompt = "\n\n".join([p for p in developer_parts if p]).strip()
+        return developer_prompt, items
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+INPUT_CACHE = InputPrefixCache()
 
 
 def _parse_final_response(resp: requests.Response) -> Dict[str, Any]:
@@ -337,6 +466,7 @@ def _responses_to_chat_completions(response_obj: Dict[str, Any]) -> Dict[str, An
     output_items = response_obj.get("output") or []
     tool_calls: List[Dict[str, Any]] = []
     text_bits: List[str] = []
+    reasoning: Optional[Dict[str, Any]] = None
 
     if isinstance(response_obj.get("output_text"), str) and response_obj.get("output_text"):
         text_bits.append(str(response_obj.get("output_text")))
@@ -357,6 +487,14 @@ def _responses_to_chat_completions(response_obj: Dict[str, Any]) -> Dict[str, An
                             maybe = str(part.get("text") or "")
                             if maybe:
                                 text_bits.append(maybe)
+            elif itype == "reasoning":
+                signature = encode_reasoning_signature(item)
+                summary = item.get("summary") if isinstance(item.get("summary"), list) else []
+                thinking = "\n\n".join(
+                    str(part.get("text") or "") for part in summary if isinstance(part, dict) and part.get("text")
+                )
+                if signature or thinking:
+                    reasoning = {"thinking": thinking, "signature": signature}
             elif itype == "function_call":
                 call_id = item.get("call_id") or item.get("id") or "tool_call"
                 name = item.get("name") or "tool"
@@ -371,6 +509,8 @@ def _responses_to_chat_completions(response_obj: Dict[str, Any]) -> Dict[str, An
 
     text = "\n".join([t for t in text_bits if t]).strip()
     message: Dict[str, Any] = {"role": "assistant", "content": [{"type": "text", "text": text}] if text else ""}
+    if reasoning:
+        message["reasoning"] = reasoning
     if tool_calls:
         message["tool_calls"] = tool_calls
 
@@ -386,6 +526,9 @@ def _responses_to_chat_completions(response_obj: Dict[str, Any]) -> Dict[str, An
             mapped["prompt_tokens"] = usage.get("input_tokens")
         if "output_tokens" in usage:
             mapped["completion_tokens"] = usage.get("output_tokens")
+        details = usage.get("input_tokens_details")
+        if isinstance(details, dict) and details.get("cached_tokens"):
+            mapped["prompt_tokens_details"] = {"cached_tokens": details.get("cached_tokens")}
         if mapped:
             chat["usage"] = mapped
     return chat
@@ -397,8 +540,9 @@ def _request_body(
     *,
     model_key: Optional[str] = None,
     force_refresh_instructions: bool = False,
+    incoming: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
-    developer_prompt, input_items = _messages_to_responses_input(payload.get("messages") or [])
+    developer_prompt, input_items = INPUT_CACHE.convert(payload.get("messages") or [])
     model_defaults = default_extra_body_for(model_key) if model_key else {}
 
     timeout = min(30.0, float(settings.lmstudio_timeout))
@@ -462,15 +606,20 @@ def _request_body(
     if isinstance(payload.get("include"), list):
         include = [str(v) for v in (payload.get("include") or []) if isinstance(v, str) and str(v).strip()]
 
-    if _truthy(getattr(settings, "codex_include_encrypted_reasoning", "")):
+    encrypted_reasoning = str(getattr(settings, "codex_include_encrypted_reasoning", "auto") or "auto").strip().lower()
+    if _truthy(encrypted_reasoning):
         if "reasoning.encrypted_content" not in include:
             include.append("reasoning.encrypted_content")
-    else:
+    elif encrypted_reasoning != "auto":
         include = [v for v in include if v != "reasoning.encrypted_content"]
 
     if include:
         body["include"] = include
 
+    prompt_cache_key = _prompt_cache_key(incoming)
+    if prompt_cache_key:
+        body["prompt_cache_key"] = prompt_cache_key
+
     # ChatGPT Codex backend rejects sampling parameters such as temperature/top_p.
 
     reasoning = copy.deepcopy(_CODEX_GLOBAL_DEFAULTS.get("reasoning") or {})
@@ -502,7 +651,12 @@ def _request_body(
     return body
 
 
-def send(payload: Dict[str, Any], settings: Settings, target_model: str) -> Dict[str, Any]:
+def send(
+    payload: Dict[str, Any],
+    settings: Settings,
+    target_model: str,
+    incoming: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
     tokens, account_id = _resolve_codex_auth(settings)
     model_key = _codex_model_key(settings, target_model)
     trimmed_payload, trim_meta = enforce_context_limits(payload, settings, model_key)
@@ -515,19 +669,22 @@ def send(payload: Dict[str, Any], settings: Settings, target_model: str) -> Dict
             trim_meta.get("budget", 0),
         )
 
+    session_id = _claude_code_session_id(incoming)
     req_payload = dict(trimmed_payload)
     req_payload["model"] = target_model
-    body = _request_body(req_payload, settings, model_key=model_key)
+    body = _request_body(req_payload, settings, model_key=model_key, incoming=incoming)
     log_payload(logger, f"Codex request -> {target_model}", body)
+    phase_timeouts = timeouts.for_provider(settings, "codex")
 
     resp = _session().post(
         settings.codex_base_url,
         json=body,
-        headers=_headers(account_id, tokens.access),
-        timeout=float(settings.lmstudio_timeout),
+        headers=_headers(account_id, tokens.access, session_id),
+        timeout=phase_timeouts.request_timeout(stream=True),
         proxies=settings.resolved_proxies(),
         stream=True,
     )
+    client_monitor.track(resp)
     try:
         resp.raise_for_status()
     except requests.HTTPError as exc:
@@ -538,15 +695,18 @@ def send(payload: Dict[str, Any], settings: Settings, target_model: str) -> Dict
             except Exception:
                 pass
             logger.warning("Codex backend rejected instructions; refreshing and retrying once.")
-            body = _request_body(req_payload, settings, model_key=model_key, force_refresh_instructions=True)
+            body = _request_body(
+                req_payload, settings, model_key=model_key, force_refresh_instructions=True, incoming=incoming
+            )
             resp = _session().post(
                 settings.codex_base_url,
                 json=body,
-                headers=_headers(account_id, tokens.access),
-                timeout=float(settings.lmstudio_timeout),
+                headers=_headers(account_id, tokens.access, session_id),
+                timeout=phase_timeouts.request_timeout(stream=True),
                 proxies=settings.resolved_proxies(),
                 stream=True,
             )
+            client_monitor.track(resp)
             try:
                 resp.raise_for_status()
             except requests.HTTPError as exc2:
@@ -586,16 +746,18 @@ def stream(
             trim_meta.get("budget", 0),
         )
 
+    session_id = _claude_code_session_id(incoming)
     req_payload = dict(trimmed_payload)
     req_payload["model"] = requested_model
-    body = _request_body(req_payload, settings, model_key=model_key)
+    body = _request_body(req_payload, settings, model_key=model_key, incoming=incoming)
     log_payload(logger, f"Codex stream request -> {requested_model}", body)
+    phase_timeouts = timeouts.for_provider(settings, "codex")
 
     resp = _session().post(
         settings.codex_base_url,
         json=body,
-        headers=_headers(account_id, tokens.access),
-        timeout=float(settings.lmstudio_timeout),
+        headers=_headers(account_id, tokens.access, session_id),
+        timeout=phase_timeouts.request_timeout(stream=True),
         proxies=settings.resolved_proxies(),
         stream=True,
     )
@@ -609,12 +771,14 @@ def stream(
             except Exception:
                 pass
             logger.warning("Codex backend rejected instructions; refreshing and retrying once.")
-            body = _request_body(req_payload, settings, model_key=model_key, force_refresh_instructions=True)
+            body = _request_body(
+                req_payload, settings, model_key=model_key, force_refresh_instructions=True, incoming=incoming
+            )
             resp = _session().post(
                 settings.codex_base_url,
                 json=body,
-                headers=_headers(account_id, tokens.access),
-                timeout=float(settings.lmstudio_timeout),
+                headers=_headers(account_id, tokens.access, session_id),
+                timeout=phase_timeouts.request_timeout(stream=True),
                 proxies=settings.resolved_proxies(),
                 stream=True,
             )
@@ -625,10 +789,6 @@ def stream(
         else:
             raise requests.HTTPError(f"{exc} | body={body_text}") from exc
 
-    handler.send_response(200)
-    handler.send_header("Content-Type", "text/event-stream")
-    handler.send_header("Cache-Control", "no-cache")
-    handler.send_header("Connection", "keep-alive")
-    handler.end_headers()
+    start_sse_response(handler)
 
-    stream_responses_response(resp, requested_model, incoming, handler, logger)
+    stream_responses_response(resp, requested_model, incoming, handler, logger, settings, phase_timeouts)
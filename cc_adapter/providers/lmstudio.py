@@ -5,9 +5,11 @@ from http.server import BaseHTTPRequestHandler
 
 from ..config import Settings
 from ..context_limits import enforce_context_limits
-from ..streaming import stream_openai_response
+from ..streaming import start_sse_response, stream_openai_response
 import copy
 from ..logging_utils import log_payload
+from .. import backend_pool, client_monitor, timeouts
+from ..affinity import conversation_key
 
 
 logger = logging.getLogger(__name__)
@@ -57,18 +59,23 @@ def send(payload: Dict[str, Any], settings: Settings) -> Dict[str, Any]:
         # LM Studio server returns 400 on over-length prompts; prune to avoid.
         pass
     log_payload(logger, f"LM Studio request -> {clean_payload.get('model') or settings.lmstudio_model}", clean_payload)
-    resp = requests.post(
-        settings.lmstudio_base,
-        json=clean_payload,
-        timeout=settings.lmstudio_timeout,
-        proxies=settings.resolved_proxies(),
-        stream=False,
-    )
-    try:
-        resp.raise_for_status()
-    except requests.HTTPError as exc:
-        raise requests.HTTPError(f"{exc} | body={resp.text}") from exc
-    data = resp.json()
+    pool = backend_pool.for_settings(settings)
+    with pool.lease(conversation_key(clean_payload)) as lease:
+        resp = requests.post(
+            lease.url,
+            json=clean_payload,
+            timeout=timeouts.for_provider(settings, "lmstudio").request_timeout(),
+            proxies=settings.resolved_proxies(),
+            # Read the body after tracking the response, so a hedged loser can be aborted mid-answer.
+            stream=True,
+        )
+        client_monitor.track(resp)
+        lease.responded()
+        try:
+            resp.raise_for_status()
+        except requests.HTTPError as exc:
+            raise requests.HTTPError(f"{exc} | body={resp.text}") from exc
+        data = resp.json()
     log_payload(logger, "LM Studio raw response", data)
     return data
 
@@ -92,22 +99,23 @@ def stream(
         )
 
     log_payload(logger, f"LM Studio stream request -> {requested_model}", clean_payload)
-    resp = requests.post(
-        settings.lmstudio_base,
-        json=clean_payload,
-        timeout=settings.lmstudio_timeout,
-        proxies=settings.resolved_proxies(),
-        stream=True,
-    )
-    try:
-        resp.raise_for_status()
-    except requests.HTTPError as exc:
-        raise requests.HTTPError(f"{exc} | body={resp.text}") from exc
+    phase_timeouts = timeouts.for_provider(settings, "lmstudio")
+    pool = backend_pool.for_settings(settings)
+    # The backend stays leased (counted in flight) until the stream has been relayed.
+    with pool.lease(conversation_key(clean_payload)) as lease:
+        resp = requests.post(
+            lease.url,
+            json=clean_payload,
+            timeout=phase_timeouts.request_timeout(stream=True),
+            proxies=settings.resolved_proxies(),
+            stream=True,
+        )
+        lease.responded()
+        try:
+            resp.raise_for_status()
+        except requests.HTTPError as exc:
+            raise requests.HTTPError(f"{exc} | body={resp.text}") from exc
 
-    handler.send_response(200)
-    handler.send_header("Content-Type", "text/event-stream")
-    handler.send_header("Cache-Control", "no-cache")
-    handler.send_header("Connection", "keep-alive")
-    handler.end_headers()
+        start_sse_response(handler)
 
-    stream_openai_response(resp, requested_model, incoming, handler, logger)
+        stream_openai_response(resp, requested_model, incoming, handler, logger, settings, phase_timeouts)
@@ -4,9 +4,12 @@ from typing import Dict, Any, Optional
 from http.server import BaseHTTPRequestHandler
 
 from ..config import Settings
-from ..streaming import stream_openai_response
+from ..converters import continuation_payload
+from ..streaming import start_sse_response, stream_openai_response
 from ..context_limits import enforce_context_limits
 from ..logging_utils import log_payload
+from .. import client_monitor, key_pool, ratelimit, timeouts
+from ..affinity import conversation_key
 
 logger = logging.getLogger(__name__)
 
@@ -24,15 +27,23 @@ def send(payload: Dict[str, Any], settings: Settings, target_model: str) -> Dict
             trim_meta.get("budget", 0),
         )
     log_payload(logger, f"OpenRouter request -> {target_model}", payload)
-    headers = {"Authorization": f"Bearer {settings.openrouter_key}"}
+    keys = key_pool.for_provider(settings, "openrouter")
+    api_key = keys.pick(conversation_key(payload))
+    headers = {"Authorization": f"Bearer {api_key}"}
+    governor = ratelimit.for_key("openrouter", api_key)
+    governor.acquire(settings.rate_limit_max_wait)
     resp = requests.post(
         settings.openrouter_base,
         json=payload,
         headers=headers,
-        timeout=settings.lmstudio_timeout,
+        timeout=timeouts.for_provider(settings, "openrouter").request_timeout(),
         proxies=settings.resolved_proxies(),
-        stream=False,
+        # Read the body after tracking the response, so a hedged loser can be aborted mid-answer.
+        stream=True,
     )
+    client_monitor.track(resp)
+    governor.observe(resp)
+    keys.observe(api_key, resp)
     try:
         resp.raise_for_status()
     except requests.HTTPError as exc:
@@ -60,6 +71,30 @@ def send(payload: Dict[str, Any], settings: Settings, target_model: str) -> Dict
     return data
 
 
+def _open_stream(payload: Dict[str, Any], settings: Settings, phase_timeouts: timeouts.PhaseTimeouts):
+    keys = key_pool.for_provider(settings, "openrouter")
+    # Continuations share the conversation prefix, so a resumed stream keeps its key.
+    api_key = keys.pick(conversation_key(payload))
+    headers = {"Authorization": f"Bearer {api_key}"}
+    governor = ratelimit.for_key("openrouter", api_key)
+    governor.acquire(settings.rate_limit_max_wait)
+    resp = requests.post(
+        settings.openrouter_base,
+        json=payload,
+        headers=headers,
+        timeout=phase_timeouts.request_timeout(stream=True),
+        proxies=settings.resolved_proxies(),
+        stream=True,
+    )
+    governor.observe(resp)
+    keys.observe(api_key, resp)
+    try:
+        resp.raise_for_status()
+    except requests.HTTPError as exc:
+        raise requests.HTTPError(f"{exc} | body={resp.text}") from exc
+    return resp
+
+
 def stream(
     payload: Dict[str, Any],
     settings: Settings,
@@ -80,24 +115,15 @@ def stream(
             trim_meta.get("budget", 0),
         )
     log_payload(logger, f"OpenRouter request -> {requested_model}", payload)
-    headers = {"Authorization": f"Bearer {settings.openrouter_key}"}
-    resp = requests.post(
-        settings.openrouter_base,
-        json=payload,
-        headers=headers,
-        timeout=settings.lmstudio_timeout,
-        proxies=settings.resolved_proxies(),
-        stream=True,
-    )
-    try:
-        resp.raise_for_status()
-    except requests.HTTPError as exc:
-        raise requests.HTTPError(f"{exc} | body={resp.text}") from exc
+    phase_timeouts = timeouts.for_provider(settings, "openrouter")
+    resp = _open_stream(payload, settings, phase_timeouts)
+
+    def _resume(partial_text: str):
+        # OpenRouter treats a trailing assistant message as a prefill to extend.
+        return _open_stream(continuation_payload(payload, partial_text), settings, phase_timeouts)
 
-    handler.send_response(200)
-    handler.send_header("Content-Type", "text/event-stream")
-    handler.send_header("Cache-Control", "no-cache")
-    handler.send_header("Connection", "keep-alive")
-    handler.end_headers()
+    start_sse_response(handler)
 
-    stream_openai_response(resp, requested_model, incoming, handler, logger)
+    stream_openai_response(
+        resp, requested_model, incoming, handler, logger, settings, phase_timeouts, resume=_resume
+    )
@@ -8,11 +8,13 @@ from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 
 from ..config import Settings
-from ..converters import openai_to_anthropic, build_poe_params
+from ..converters import continuation_payload, openai_to_anthropic, build_poe_params
 from ..model_registry import default_extra_body_for
-from ..streaming import stream_openai_response
+from ..streaming import start_sse_response, stream_openai_response
 from ..context_limits import enforce_context_limits
 from ..logging_utils import log_payload
+from .. import client_monitor, key_pool, ratelimit, timeouts
+from ..affinity import conversation_key
 
 # Poe supports an OpenAI-compatible /v1/chat/completions endpoint. We forward
 # cleaned OpenAI payloads and bridge the streaming response into Anthropic SSE.
@@ -100,12 +102,13 @@ def _prepare_payload(
     return enforce_context_limits(clean_payload, settings, target_model)
 
 
-def _build_retry_session(settings: Settings) -> requests.Session:
+def _build_retry_session(settings: Settings, retry_throttled: bool = True) -> requests.Session:
     session = requests.Session()
+    statuses = RETRYABLE_STATUS_CODES if retry_throttled else tuple(c for c in RETRYABLE_STATUS_CODES if c != 429)
     retries = Retry(
         total=settings.poe_max_retries,
         backoff_factor=settings.poe_retry_backoff,
-        status_forcelist=RETRYABLE_STATUS_CODES,
+        status_forcelist=statuses,
         allowed_methods={"POST"},
         raise_on_status=False,
         respect_retry_after_header=True,
@@ -137,18 +140,36 @@ def _response_body_snippet(resp: Optional[requests.Response], limit: int = 600)
 def _post_with_retries(
     payload: Dict[str, Any], settings: Settings, stream: bool = False
 ) -> Tuple[requests.Session, requests.Response]:
-    session = _build_retry_session(settings)
+    keys = key_pool.for_provider(settings, "poe")
+    # With several keys a 429 moves on to the next key instead of backing off on the throttled one.
+    rotate = len(keys.states) > 1
+    session = _build_retry_session(settings, retry_throttled=not rotate)
     resp: Optional[requests.Response] = None
+    attempts = 0
     try:
-        resp = session.post(
-            settings.poe_base_url,
-            json=payload,
-            headers={"Authorization": f"Bearer {settings.poe_api_key}"},
-            timeout=settings.lmstudio_timeout,
-            stream=stream,
-        )
-        resp.raise_for_status()
-        return session, resp
+        while True:
+            api_key = keys.pick(conversation_key(payload))
+            attempts += 1
+            governor = ratelimit.for_key("poe", api_key)
+            governor.acquire(settings.rate_limit_max_wait)
+            resp = session.post(
+                settings.poe_base_url,
+                json=payload,
+                headers={"Authorization": f"Bearer {api_key}"},
+                timeout=timeouts.for_provider(settings, "poe").request_timeout(stream),
+                # Non-streaming bodies are read later too, so a hedged loser can be aborted mid-answer.
+                stream=True,
+            )
+            client_monitor.track(resp)
+            governor.observe(resp)
+            keys.observe(api_key, resp)
+            if rotate and resp.status_code == 429 and attempts < len(keys.states):
+                logger.warning("Poe key:%s throttled; trying the next key", key_pool.fingerprint(api_key))
+                resp.close()
+                resp = None
+                continue
+            resp.raise_for_status()
+            return session, resp
     except requests.HTTPError as exc:
         snippet = _response_body_snippet(resp or getattr(exc, "response", None))
         if resp:
@@ -211,16 +232,32 @@ def stream(
 
     log_payload(logger, f"Poe stream request -> {requested_model}", clean_payload)
     session, resp = _post_with_retries(clean_payload, settings, stream=True)
-    handler.send_response(200)
-    handler.send_header("Content-Type", "text/event-stream")
-    handler.send_header("Cache-Control", "no-cache")
-    handler.send_header("Connection", "keep-alive")
-    handler.end_headers()
+    sessions = [session]
+
+    def _resume(partial_text: str):
+        # Poe bots do not reliably honor assistant prefill; ask explicitly to continue.
+        resumed_session, resumed = _post_with_retries(
+            continuation_payload(clean_payload, partial_text, prefill=False), settings, stream=True
+        )
+        sessions.append(resumed_session)
+        return resumed
+
+    start_sse_response(handler)
 
     try:
-        stream_openai_response(resp, requested_model, incoming, handler, logger)
+        stream_openai_response(
+            resp,
+            requested_model,
+            incoming,
+            handler,
+            logger,
+            settings,
+            timeouts.for_provider(settings, "poe"),
+            resume=_resume,
+        )
     finally:
         try:
             resp.close()
         finally:
-            session.close()
+            for opened in sessions:
+                opened.close()
@@ -0,0 +1,187 @@
+import logging
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from . import metrics
+from .key_pool import fingerprint
+from .retry import parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+LIMIT_HEADERS = ("x-ratelimit-limit-requests", "x-ratelimit-limit")
+REMAINING_HEADERS = ("x-ratelimit-remaining-requests", "x-ratelimit-remaining")
+RESET_HEADERS = ("x-ratelimit-reset-requests", "x-ratelimit-reset")
+
+# Window assumed when an upstream reports a limit without a reset time.
+DEFAULT_WINDOW = 60.0
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _header(headers: Mapping[str, Any], names: Tuple[str, ...]) -> Optional[str]:
+    lowered = {str(key).lower(): value for key, value in (headers or {}).items()}
+    for name in names:
+        value = lowered.get(name)
+        if value not in (None, ""):
+            return str(value).strip()
+    return None
+
+
+def _number(raw: Optional[str]) -> Optional[float]:
+    try:
+        return float(raw) if raw is not None else None
+    except ValueError:
+        return None
+
+
+def parse_reset(raw: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds until a rate-limit window resets.
+
+    Accepts OpenAI-style durations ("6m0s", "20ms"), epoch timestamps in
+    seconds or milliseconds (OpenRouter), and plain delta-seconds.
+    """
+    if not raw:
+        return None
+    parts = _DURATION_RE.findall(raw)
+    if parts and "".join(num + unit for num, unit in parts) == raw.replace(" ", ""):
+        return sum(float(num) * _DURATION_UNITS[unit] for num, unit in parts)
+    value = _number(raw)
+    if value is None:
+        return None
+    current = now if now is not None else time.time()
+    if value > 1e12:
+        return max(0.0, value / 1000.0 - current)
+    if value > 1e9:
+        return max(0.0, value - current)
+    return max(0.0, value)
+
+
+class RateGovernor:
+    """
+    Token bucket for one provider/API key, sized from upstream rate-limit headers.
+
+    Until a limit has been learned the bucket does not pace. Tokens may go
+    negative: each concurrent caller reserves the next slot and waits for it.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.provider = key.split(" ", 1)[0]
+        self.capacity = 0.0
+        self.tokens = 0.0
+        self.rate = 0.0
+        self.window = 0.0
+        self.blocked_until = 0.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        if self.capacity and self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take a token and return how many seconds the caller must wait for it."""
+        now = time.monotonic()
+        with self._lock:
+            wait = max(0.0, self.blocked_until - now)
+            if not self.capacity:
+                return wait
+            self._refill(now)
+            self.tokens -= 1
+            if self.tokens < 0 and self.rate:
+                wait = max(wait, -self.tokens / self.rate)
+            return wait
+
+    def acquire(self, max_wait: float, sleep: Callable[[float], None] = time.sleep) -> float:
+        """Pace an outgoing request, waiting at most `max_wait` seconds (0 disables pacing)."""
+        if max_wait <= 0:
+            return 0.0
+        wait = self.reserve()
+        if wait <= 0:
+            return 0.0
+        if wait > max_wait:
+            logger.info("Rate limit for %s needs %.1fs; capping wait at %.1fs", self.key, wait, max_wait)
+            wait = max_wait
+        metrics.incr(f"ratelimit.waits.{self.provider}")
+        metrics.incr("ratelimit.wait_seconds", wait)
+        sleep(wait)
+        return wait
+
+    def observe(self, resp: Any) -> None:
+        """Learn limits from an upstream response's headers (and Retry-After on 429)."""
+        headers = getattr(resp, "headers", None) or {}
+        status = getattr(resp, "status_code", None)
+        limit = _number(_header(headers, LIMIT_HEADERS))
+        remaining = _number(_header(headers, REMAINING_HEADERS))
+        reset = parse_reset(_header(headers, RESET_HEADERS))
+        now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            if reset:
+                # The longest time-to-reset seen is the best guess at the window length.
+                self.window = max(self.window, reset)
+            if limit and limit > 0:
+                self.capacity = limit
+                self.rate = limit / (self.window or DEFAULT_WINDOW)
+                if remaining is not None and reset:
+                    # Late in a window only `remaining` requests are left until it resets.
+                    self.rate = min(self.rate, max(remaining, 1.0) / reset)
+            if remaining is not None and self.capacity:
+                self.tokens = min(self.capacity, remaining)
+                if remaining <= 0 and reset:
+                    self.blocked_until = max(self.blocked_until, now + reset)
+            if status == 429:
+                metrics.incr(f"ratelimit.throttled.{self.provider}")
+                pause = parse_retry_after(_header(headers, ("retry-after",))) or reset or 1.0
+                self.blocked_until = max(self.blocked_until, now + pause)
+                self.tokens = min(self.tokens, 0.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            return {
+                "limit": self.capacity,
+                "tokens": round(self.tokens, 2),
+                "rate_per_second": round(self.rate, 3),
+                "blocked_for": round(max(0.0, self.blocked_until - now), 1),
+            }
+
+
+class GovernorRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._governors: Dict[Tuple[str, str], RateGovernor] = {}
+
+    def get(self, provider: str, api_key: str) -> RateGovernor:
+        key = (provider, fingerprint(api_key))
+        with self._lock:
+            governor = self._governors.get(key)
+            if governor is None:
+                governor = self._governors[key] = RateGovernor(f"{provider} key:{key[1]}")
+            return governor
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            governors = list(self._governors.values())
+        return {governor.key: governor.snapshot() for governor in governors}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._governors.clear()
+
+
+REGISTRY = GovernorRegistry()
+
+
+def for_key(provider: str, api_key: str) -> RateGovernor:
+    return REGISTRY.get(provider, api_key)
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    return REGISTRY.snapshot()
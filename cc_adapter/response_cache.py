@@ -0,0 +1,291 @@
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import platformdirs
+
+from . import metrics
+from .singleflight import flight_key
+from .sse import SSEWriter
+
+logger = logging.getLogger(__name__)
+
+OPT_IN_HEADER = "x-cc-adapter-cache"
+# Seconds between sweeps of expired on-disk entries.
+PRUNE_INTERVAL = 60.0
+
+
+def _config_dir() -> Path:
+    override = os.getenv("CC_ADAPTER_CONFIG_DIR", "").strip()
+    if override:
+        return Path(override)
+    return Path(platformdirs.user_config_dir("cc-adapter"))
+
+
+def _disk_dir() -> Path:
+    return _config_dir() / "cache" / "responses"
+
+
+def _allowlist(settings: Any) -> List[str]:
+    raw = getattr(settings, "response_cache_models", "") or ""
+    return [item.strip().lower() for item in raw.split(",") if item.strip()]
+
+
+def is_cacheable(
+    incoming: Dict[str, Any], headers: Mapping[str, str], provider: str, model: str, settings: Any
+) -> bool:
+    """
+    Only tool-free requests are cached, and only while RESPONSE_CACHE is on.
+    Of those, deterministic requests (temperature 0), models on
+    RESPONSE_CACHE_MODELS and requests sending `x-cc-adapter-cache: on` are
+    cached; `x-cc-adapter-cache: off` opts a request out.
+    """
+    opt_in = str(headers.get(OPT_IN_HEADER) or "").strip().lower()
+    if opt_in in {"0", "off", "false", "no"}:
+        return False
+    if str(getattr(settings, "response_cache", "off")).strip().lower() not in {"1", "on", "true", "yes"}:
+        return False
+    if incoming.get("tools"):
+        return False
+    if opt_in in {"1", "on", "true", "yes"} or incoming.get("temperature") == 0:
+        return True
+    allowed = _allowlist(settings)
+    return model.lower() in allowed or f"{provider}:{model}".lower() in allowed
+
+
+def cache_key(provider: str, target_model: str, payload: Dict[str, Any]) -> str:
+    """Key on the upstream payload with transport-only fields removed, so streams and non-streams share entries."""
+    normalized = {k: v for k, v in payload.items() if k not in {"stream", "stream_options"}}
+    return flight_key(provider, target_model, normalized)
+
+
+class ResponseCache:
+    """
+    In-memory LRU of Anthropic messages with TTLs, optionally backed by JSON files.
+
+    Writes prune the disk store: expired files every PRUNE_INTERVAL seconds, and
+    the oldest files whenever it holds more than `max_disk_entries`.
+    """
+
+    def __init__(self, max_entries: int = 256, disk_dir: Optional[Path] = None, max_disk_entries: int = 4096):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._disk_count: Optional[int] = None
+        self._pruned_at = 0.0
+
+    def configure(self, settings: Any) -> "ResponseCache":
+        self.max_entries = max(1, int(getattr(settings, "response_cache_size", 256) or 1))
+        self.max_disk_entries = max(1, int(getattr(settings, "response_cache_disk_size", 4096) or 1))
+        disk = str(getattr(settings, "response_cache_disk", "off")).strip().lower() in {"1", "on", "true", "yes"}
+        disk_dir = _disk_dir() if disk else None
+        if disk_dir != self.disk_dir:
+            self.disk_dir, self._disk_count = disk_dir, None
+        return self
+
+    def _path(self, key: str) -> Optional[Path]:
+        return self.disk_dir / f"{key}.json" if self.disk_dir is not None else None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    metrics.incr("response_cache.hits")
+                    return copy.deepcopy(entry[1])
+                del self._entries[key]
+        entry = self._read_disk(key, now)
+        if entry is None:
+            metrics.incr("response_cache.misses")
+            return None
+        self._remember(key, entry)
+        metrics.incr("response_cache.hits")
+        metrics.incr("response_cache.disk_hits")
+        return copy.deepcopy(entry[1])
+
+    def put(self, key: str, message: Dict[str, Any], ttl: float) -> None:
+        if ttl <= 0:
+            return
+        now = time.time()
+        entry = (now + ttl, copy.deepcopy(message))
+        self._remember(key, entry)
+        metrics.incr("response_cache.stores")
+        path = self._path(key)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps({"expires_at": entry[0], "message": entry[1]}), encoding="utf-8")
+            tmp_path.replace(path)
+        except OSError as exc:
+            logger.warning("Failed to persist cached response %s: %s", key[:12], exc)
+            return
+        self._prune_disk(path.parent, now)
+
+    def _prune_disk(self, directory: Path, now: float) -> None:
+        with self._lock:
+            if self._disk_count is not None:
+                self._disk_count += 1
+            due = now - self._pruned_at >= PRUNE_INTERVAL
+            if not due and self._disk_count is not None and self._disk_count <= self.max_disk_entries:
+                return
+            self._pruned_at = now
+        files = []
+        for path in directory.glob("*.json"):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except OSError:
+                continue
+        expired = {path for _, path in files if self._expired(path, now)} if due else set()
+        live = sorted(item for item in files if item[1] not in expired)
+        stale = list(expired) + [path for _, path in live[: max(0, len(live) - self.max_disk_entries)]]
+        for path in stale:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        if stale:
+            metrics.incr("response_cache.disk_pruned", len(stale))
+        with self._lock:
+            self._disk_count = len(files) - len(stale)
+
+    @staticmethod
+    def _expired(path: Path, now: float) -> bool:
+        try:
+            return float(json.loads(path.read_text(encoding="utf-8"))["expires_at"]) <= now
+        except (OSError, ValueError, KeyError, TypeError):
+            return True
+
+    def _remember(self, key: str, entry: Tuple[float, Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _read_disk(self, key: str, now: float) -> Optional[Tuple[float, Dict[str, Any]]]:
+        path = self._path(key)
+        if path is None or not path.exists():
+            return None
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            expires_at = float(data["expires_at"])
+            message = data["message"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if expires_at <= now:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+        return expires_at, message
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+CACHE = ResponseCache()
+
+
+def message_from_sse(raw: bytes) -> Optional[Dict[str, Any]]:
+    """Rebuild the Anthropic message a bridge streamed; None unless it completed without error."""
+    message: Optional[Dict[str, Any]] = None
+    blocks: Dict[int, Dict[str, Any]] = {}
+    partial_json: Dict[int, List[str]] = {}
+    finished = False
+    for frame in raw.decode("utf-8", errors="replace").split("\n\n"):
+        data_lines = [line[5:].strip() for line in frame.splitlines() if line.startswith("data:")]
+        if not data_lines:
+            continue
+        try:
+            event = json.loads("\n".join(data_lines))
+        except ValueError:
+            return None
+        kind = event.get("type")
+        if kind == "message_start":
+            message = dict(event.get("message") or {})
+        elif kind == "content_block_start":
+            blocks[event["index"]] = dict(event.get("content_block") or {})
+        elif kind == "content_block_delta":
+            block = blocks.setdefault(event["index"], {})
+            delta = event.get("delta") or {}
+            if delta.get("type") == "text_delta":
+                block["text"] = block.get("text", "") + delta.get("text", "")
+            elif delta.get("type") == "thinking_delta":
+                block["thinking"] = block.get("thinking", "") + delta.get("thinking", "")
+            elif delta.get("type") == "signature_delta":
+                block["signature"] = block.get("signature", "") + delta.get("signature", "")
+            elif delta.get("type") == "input_json_delta":
+                partial_json.setdefault(event["index"], []).append(delta.get("partial_json", ""))
+        elif kind == "message_delta" and message is not None:
+            delta = event.get("delta") or {}
+            message["stop_reason"] = delta.get("stop_reason")
+            message["stop_sequence"] = delta.get("stop_sequence")
+            message["usage"] = dict(message.get("usage") or {}, **(event.get("usage") or {}))
+        elif kind == "error":
+            return None
+        elif kind == "message_stop":
+            finished = True
+    if message is None or not finished or message.get("stop_reason") in (None, "error"):
+        return None
+    for index, parts in partial_json.items():
+        try:
+            blocks[index]["input"] = json.loads("".join(parts) or "{}")
+        except ValueError:
+            return None
+    message["content"] = [blocks[index] for index in sorted(blocks)]
+    return message
+
+
+def replay(writer: SSEWriter, message: Dict[str, Any]) -> None:
+    """Send a complete Anthropic message as the SSE event sequence a live stream would produce."""
+    usage = dict(message.get("usage") or {})
+    start = {key: value for key, value in message.items() if key not in {"content", "stop_reason", "stop_sequence"}}
+    start.update(content=[], stop_reason=None, stop_sequence=None, usage=dict(usage, output_tokens=0))
+    writer.send("message_start", {"type": "message_start", "message": start})
+    for index, block in enumerate(message.get("content") or []):
+        kind = block.get("type")
+        if kind == "tool_use":
+            opening = {"type": "tool_use", "id": block.get("id"), "name": block.get("name"), "input": {}}
+            deltas = [{"type": "input_json_delta", "partial_json": json.dumps(block.get("input") or {})}]
+        elif kind == "thinking":
+            opening = {"type": "thinking", "thinking": ""}
+            deltas = [{"type": "thinking_delta", "thinking": block.get("thinking", "")}]
+            if block.get("signature"):
+                deltas.append({"type": "signature_delta", "signature": block["signature"]})
+        elif kind == "text":
+            opening = {"type": "text", "text": ""}
+            deltas = [{"type": "text_delta", "text": block.get("text", "")}]
+        else:
+            opening, deltas = dict(block), []
+        writer.send("content_block_start", {"type": "content_block_start", "index": index, "content_block": opening})
+        for delta in deltas:
+            writer.send("content_block_delta", {"type": "content_block_delta", "index": index, "delta": delta})
+        writer.send("content_block_stop", {"type": "content_block_stop", "index": index})
+    writer.send(
+        "message_delta",
+        {
+            "type": "message_delta",
+            "delta": {"stop_reason": message.get("stop_reason"), "stop_sequence": message.get("stop_sequence")},
+            "usage": usage,
+        },
+    )
+    writer.send("message_stop", {"type": "message_stop"})
+    writer.flush()
@@ -0,0 +1,157 @@
+import email.utils
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, TypeVar
+
+import requests
+
+from . import metrics
+from .timeouts import UpstreamStalled
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+# Providers whose HTTP session already retries statuses and connection errors
+# (see poe._build_retry_session); only failures after the response arrived are
+# retried here for them.
+TRANSPORT_RETRY_PROVIDERS = {"poe"}
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    provider: str
+    max_retries: int
+    backoff: float
+    max_backoff: float
+
+    @classmethod
+    def for_provider(cls, settings: Any, provider: str) -> "RetryPolicy":
+        return cls(
+            provider=provider,
+            max_retries=max(0, int(getattr(settings, "upstream_max_retries", 0) or 0)),
+            backoff=max(0.0, float(getattr(settings, "upstream_retry_backoff", 0.5) or 0.0)),
+            max_backoff=max(0.0, float(getattr(settings, "upstream_retry_max_backoff", 8.0) or 0.0)),
+        )
+
+
+def _response_of(exc: BaseException) -> Optional[requests.Response]:
+    # Providers re-raise HTTPError with the body appended; the original keeps the response.
+    seen = 0
+    current: Optional[BaseException] = exc
+    while current is not None and seen < 5:
+        resp = getattr(current, "response", None)
+        if resp is not None:
+            return resp
+        current = current.__cause__
+        seen += 1
+    return None
+
+
+def status_of(exc: BaseException) -> Optional[int]:
+    resp = _response_of(exc)
+    status = getattr(resp, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def parse_retry_after(raw: Any, now: Optional[float] = None) -> Optional[float]:
+    """Parse a Retry-After value (delta-seconds or HTTP-date) into seconds from now."""
+    if not raw:
+        return None
+    raw = str(raw).strip()
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(raw)
+    except (TypeError, ValueError):
+        return None
+    if parsed is None:
+        return None
+    current = now if now is not None else time.time()
+    return max(0.0, parsed.timestamp() - current)
+
+
+def retry_after_seconds(exc: BaseException, now: Optional[float] = None) -> Optional[float]:
+    """Parse Retry-After from the error's response."""
+    resp = _response_of(exc)
+    headers = getattr(resp, "headers", None) or {}
+    return parse_retry_after(headers.get("Retry-After") or headers.get("retry-after"), now)
+
+
+def is_retryable(exc: BaseException, policy: RetryPolicy) -> bool:
+    if isinstance(exc, (UpstreamStalled, requests.exceptions.ChunkedEncodingError)):
+        return True
+    if policy.provider in TRANSPORT_RETRY_PROVIDERS:
+        return False
+    if isinstance(exc, requests.HTTPError):
+        return status_of(exc) in RETRYABLE_STATUS_CODES
+    return isinstance(exc, (requests.Timeout, requests.ConnectionError))
+
+
+def backoff_delay(
+    policy: RetryPolicy,
+    attempt: int,
+    exc: BaseException,
+    rand: Callable[[], float] = random.random,
+) -> Optional[float]:
+    """
+    Seconds to wait before retry number `attempt` (1-based), or None to give up.
+
+    Uses full-jitter exponential backoff; a Retry-After header replaces the
+    computed delay, and one longer than `max_backoff` is not waited out.
+    """
+    retry_after = retry_after_seconds(exc)
+    if retry_after is not None:
+        if policy.max_backoff and retry_after > policy.max_backoff:
+            return None
+        return retry_after
+    ceiling = policy.backoff * (2 ** (attempt - 1))
+    if policy.max_backoff:
+        ceiling = min(ceiling, policy.max_backoff)
+    return ceiling * rand()
+
+
+def call_with_retries(
+    call: Callable[[], T],
+    policy: RetryPolicy,
+    *,
+    can_retry: Callable[[], bool] = lambda: True,
+    deadline: float = 0.0,
+    sleep: Callable[[float], None] = time.sleep,
+) -> T:
+    """
+    Run `call`, retrying transient upstream failures.
+
+    `can_retry` is consulted after every failure; streams pass a check that
+    nothing beyond message_start has reached the client yet.
+    """
+    attempt = 0
+    while True:
+        try:
+            return call()
+        except Exception as exc:
+            if attempt >= policy.max_retries or not is_retryable(exc, policy) or not can_retry():
+                raise
+            attempt += 1
+            delay = backoff_delay(policy, attempt, exc)
+            if delay is None or (deadline and time.monotonic() + delay >= deadline):
+                raise
+            metrics.incr("upstream.retries")
+            metrics.incr(f"upstream.retries.{policy.provider}")
+            metrics.incr("upstream.retry_backoff_seconds", round(delay, 3))
+            logger.warning(
+                "%s upstream failed (%s); retry %s/%s in %.2fs",
+                policy.provider,
+                exc,
+                attempt,
+                policy.max_retries,
+                delay,
+            )
+            if delay > 0:
+                sleep(delay)
@@ -0,0 +1,126 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from . import rules
+from .model_registry import SUPPORTED_PROVIDERS, canonicalize_model
+from .rules import system_fingerprint
+
+logger = logging.getLogger(__name__)
+
+REASONING_EFFORTS = {"", "minimal", "low", "medium", "high"}
+
+# Target that keeps the requested provider/model instead of the configured default.
+REQUESTED = "requested"
+
+
+@dataclass(frozen=True)
+class Route:
+    """
+    One routing-table entry.
+
+    Every condition in `match` must hold (see rules.MATCH_KEYS). `target` is
+    "provider:model" or "requested"; `reasoning_effort` is forwarded to
+    providers that accept an effort hint (Codex, OpenRouter).
+    """
+
+    name: str
+    match: Dict[str, Any] = field(default_factory=dict)
+    target: str = ""
+    reasoning_effort: str = ""
+
+
+@dataclass(frozen=True)
+class Decision:
+    provider: str
+    model: str
+    reasoning_effort: str = ""
+    # Name of the matching route; empty when the configured default model is used.
+    rule: str = ""
+
+
+# The built-in table only restates the historical Haiku special cases. Nothing is
+# routed for latency unless ROUTING_TABLE adds routes (see rules.MATCH_KEYS).
+DEFAULT_ROUTES: Tuple[Route, ...] = (
+    # Haiku background work runs on the requested Poe/OpenRouter Haiku rather than the (slower) default.
+    Route(
+        "haiku-requested",
+        {"model_contains": "claude-haiku", "requested_provider": ["poe", "openrouter"]},
+        REQUESTED,
+    ),
+    # Codex has no Haiku; its mini model is the fastest fit for background requests.
+    Route(
+        "haiku-codex-mini",
+        {"model_contains": "claude-haiku", "default_provider": "codex"},
+        "codex:gpt-5.1-codex-mini",
+    ),
+)
+
+
+def _route_from_dict(raw: Dict[str, Any]) -> Route:
+    match = rules.validate(raw.get("match"))
+    effort = str(raw.get("reasoning_effort") or "").strip().lower()
+    if effort not in REASONING_EFFORTS:
+        raise ValueError(f"unknown reasoning_effort: {effort}")
+    target = str(raw.get("target") or "").strip()
+    if target != REQUESTED and target.partition(":")[0].lower() not in SUPPORTED_PROVIDERS:
+        raise ValueError(f"invalid target: {target!r}")
+    return Route(name=str(raw.get("name") or "custom"), match=match, target=target, reasoning_effort=effort)
+
+
+ROUTES = rules.RuleTable("ROUTING_TABLE", _route_from_dict, DEFAULT_ROUTES)
+
+
+def parse_routes(spec: str) -> List[Route]:
+    """
+    Parse ROUTING_TABLE: a JSON list of routes, or a path to a file holding one.
+
+    Custom routes are checked before DEFAULT_ROUTES; invalid entries are skipped.
+    """
+    return ROUTES.load(spec)
+
+
+def matches(route: Route, incoming: Dict[str, Any], default_provider: str) -> bool:
+    return rules.matches(route.match, incoming, default_provider)
+
+
+def default_target(settings: Any) -> Tuple[str, str]:
+    default_model = getattr(settings, "model", "") or ""
+    if not default_model:
+        raise ValueError("Model is required and must include provider prefix (e.g., poe:claude-opus-4.5)")
+    if ":" not in default_model:
+        raise ValueError("Model must include provider prefix (e.g., poe:claude-opus-4.5)")
+    provider, name = default_model.split(":", 1)
+    provider = provider.lower()
+    if provider not in SUPPORTED_PROVIDERS:
+        raise ValueError(f"Unsupported provider prefix: {provider}")
+    return provider, name
+
+
+def decide(incoming: Dict[str, Any], settings: Any) -> Decision:
+    """Route a request to provider/model/effort: the first matching route wins, else the configured default."""
+    default_provider, default_name = default_target(settings)
+    model = str(incoming.get("model") or "").strip()
+    for route in parse_routes(getattr(settings, "routing_table", "")):
+        if not matches(route, incoming, default_provider):
+            continue
+        if route.target == REQUESTED:
+            provider, name = rules.requested_provider(model, default_provider)
+        else:
+            provider, _, name = route.target.partition(":")
+            provider, name = provider.strip().lower(), name.strip() or default_name
+        if provider not in SUPPORTED_PROVIDERS or not name:
+            continue
+        decision = Decision(provider, canonicalize_model(provider, name), route.reasoning_effort, route.name)
+        logger.info(
+            "Routing %s via %s -> %s:%s%s",
+            model or "(no model)",
+            route.name,
+            decision.provider,
+            decision.model,
+            f" (effort={decision.reasoning_effort})" if decision.reasoning_effort else "",
+        )
+        return decision
+    decision = Decision(default_provider, canonicalize_model(default_provider, default_name))
+    logger.debug("Routing %s to default %s:%s", model or "(no model)", decision.provider, decision.model)
+    return decision
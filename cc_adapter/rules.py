@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# Conditions understood by `matches`; every condition in a rule must hold.
+MATCH_KEYS = {
+    "max_tokens_lte",
+    "max_messages",
+    "no_tools",
+    "stream",
+    "model_contains",
+    "system_contains",
+    "text_contains",
+    "tools",
+    "requested_provider",
+    "default_provider",
+    "system_fingerprint",
+}
+
+# Parsed tables remembered per spec; a spec is usually one env value, so this stays tiny.
+TABLE_CACHE_SIZE = 8
+
+T = TypeVar("T")
+
+
+def text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "\n".join(
+            str(block.get("text", "")) for block in content if isinstance(block, dict) and block.get("type") == "text"
+        )
+    return ""
+
+
+def last_user_text(incoming: Dict[str, Any]) -> str:
+    for message in reversed(incoming.get("messages") or []):
+        if isinstance(message, dict) and message.get("role") == "user":
+            return text(message.get("content"))
+    return ""
+
+
+def system_fingerprint(incoming: Dict[str, Any]) -> str:
+    """Short stable hash of the system prompt text, for `system_fingerprint` matches."""
+    prompt = " ".join(text(incoming.get("system")).split())
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12] if prompt else ""
+
+
+def requested_provider(model: str, default_provider: str) -> Tuple[str, str]:
+    """(provider, name) of a requested model; unprefixed names belong to the default provider."""
+    provider, sep, name = model.partition(":")
+    if not sep:
+        return default_provider, model
+    return provider.strip().lower(), name.strip()
+
+
+def _as_set(value: Any) -> set:
+    items = value if isinstance(value, (list, tuple, set)) else [value]
+    return {str(item).strip().lower() for item in items if str(item).strip()}
+
+
+def validate(conditions: Any) -> Dict[str, Any]:
+    """Return `conditions` as a dict, raising ValueError for keys outside MATCH_KEYS."""
+    match = dict(conditions or {})
+    unknown = set(match) - MATCH_KEYS
+    if unknown:
+        raise ValueError(f"unknown match keys: {', '.join(sorted(unknown))}")
+    return match
+
+
+def matches(conditions: Dict[str, Any], incoming: Dict[str, Any], default_provider: str = "") -> bool:
+    """
+    True when `incoming` satisfies every condition (an empty rule never matches).
+
+    `default_provider` is the provider of the configured default model, used by
+    `default_provider` and by `requested_provider` for unprefixed model names.
+    """
+    if not conditions:
+        return False
+    model = str(incoming.get("model") or "").strip()
+    if "requested_provider" in conditions:
+        if requested_provider(model, default_provider)[0] not in _as_set(conditions["requested_provider"]):
+            return False
+    if "default_provider" in conditions and default_provider not in _as_set(conditions["default_provider"]):
+        return False
+    if "max_tokens_lte" in conditions:
+        max_tokens = incoming.get("max_tokens")
+        if not isinstance(max_tokens, int) or max_tokens > int(conditions["max_tokens_lte"]):
+            return False
+    if "max_messages" in conditions and len(incoming.get("messages") or []) > int(conditions["max_messages"]):
+        return False
+    if conditions.get("no_tools") and incoming.get("tools"):
+        return False
+    if "tools" in conditions and bool(incoming.get("tools")) != bool(conditions["tools"]):
+        return False
+    if "stream" in conditions and bool(incoming.get("stream")) != bool(conditions["stream"]):
+        return False
+    checks = (
+        ("model_contains", lambda: model),
+        ("system_contains", lambda: text(incoming.get("system"))),
+        ("text_contains", lambda: last_user_text(incoming)),
+    )
+    for key, haystack in checks:
+        if key in conditions and str(conditions[key]).lower() not in haystack().lower():
+            return False
+    if "system_fingerprint" in conditions and system_fingerprint(incoming) != str(conditions["system_fingerprint"]):
+        return False
+    return True
+
+
+class RuleTable(Generic[T]):
+    """
+    Loader for a rule list given as JSON or as a path to a JSON file.
+
+    `build` turns one raw entry into a rule (raising ValueError/AttributeError
+    to skip it); custom rules come before `builtin`. Parsed tables are cached
+    by spec text, and by file mtime for paths, so a request costs a stat at most.
+    """
+
+    def __init__(self, label: str, build: Callable[[Dict[str, Any]], T], builtin: Sequence[T] = ()):
+        self.label = label
+        self.build = build
+        self.builtin = tuple(builtin)
+        self._cache: Dict[Tuple[str, Optional[float]], Tuple[T, ...]] = {}
+        self._lock = threading.Lock()
+
+    def _cache_key(self, spec: str) -> Tuple[str, Optional[float]]:
+        if spec.startswith("["):
+            return spec, None
+        try:
+            return spec, os.stat(Path(spec).expanduser()).st_mtime
+        except OSError:
+            return spec, -1.0
+
+    def _parse(self, spec: str) -> Tuple[T, ...]:
+        if not spec.startswith("["):
+            try:
+                spec = Path(spec).expanduser().read_text(encoding="utf-8")
+            except OSError as exc:
+                logger.warning("Cannot read %s %s: %s", self.label, spec, exc)
+                return self.builtin
+        try:
+            raw_rules = json.loads(spec)
+        except ValueError as exc:
+            logger.warning("Ignoring invalid %s: %s", self.label, exc)
+            return self.builtin
+        rules: List[T] = []
+        for raw in raw_rules if isinstance(raw_rules, list) else []:
+            try:
+                rules.append(self.build(raw))
+            except (AttributeError, ValueError) as exc:
+                logger.warning("Ignoring %s entry %r: %s", self.label, raw, exc)
+        return tuple(rules) + self.builtin
+
+    def load(self, spec: str) -> List[T]:
+        spec = (spec or "").strip()
+        if not spec:
+            return list(self.builtin)
+        key = self._cache_key(spec)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is None:
+            cached = self._parse(spec)
+            with self._lock:
+                if len(self._cache) >= TABLE_CACHE_SIZE:
+                    self._cache.clear()
+                self._cache[key] = cached
+        return list(cached)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,255 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HEADER = "x-cc-adapter-priority"
+
+MAIN = 0
+SUBAGENT = 1
+BACKGROUND = 2
+CLASS_NAMES = {MAIN: "main", SUBAGENT: "subagent", BACKGROUND: "background"}
+_ALIASES = {
+    "main": MAIN,
+    "high": MAIN,
+    "interactive": MAIN,
+    "subagent": SUBAGENT,
+    "normal": SUBAGENT,
+    "background": BACKGROUND,
+    "low": BACKGROUND,
+}
+# Only the main agent gets the tool that spawns subagents.
+_SPAWN_TOOLS = {"Task", "Agent"}
+# Seconds between deadline/disconnect checks while a caller is queued.
+POLL_INTERVAL = 0.5
+
+
+class QueueAbandoned(RuntimeError):
+    """A queued caller gave up: its client deadline passed or the client disconnected."""
+
+    def __init__(self, message: str, reason: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def wait_turn(
+    granted: threading.Event,
+    deadline: float = 0.0,
+    cancelled: Optional[Callable[[], bool]] = None,
+    poll: float = POLL_INTERVAL,
+) -> str:
+    """
+    Block until `granted` is set; return "" then, or why the caller stopped waiting.
+
+    `deadline` is a time.monotonic() value (0 = none); `cancelled` is polled
+    every `poll` seconds (e.g. a client-disconnect check).
+    """
+    while True:
+        timeout = poll
+        if deadline:
+            timeout = min(timeout, deadline - time.monotonic())
+        if granted.wait(max(0.0, timeout)):
+            return ""
+        if deadline and time.monotonic() >= deadline:
+            return "deadline"
+        if cancelled is not None and cancelled():
+            return "disconnected"
+
+
+def _header(headers: Any, name: str) -> str:
+    if not headers:
+        return ""
+    value = headers.get(name) if hasattr(headers, "get") else None
+    if value is None and isinstance(headers, Mapping):
+        value = {str(key).lower(): item for key, item in headers.items()}.get(name)
+    return str(value or "").strip().lower()
+
+
+def classify(incoming: Dict[str, Any], headers: Any = None) -> int:
+    """
+    Priority class of a request (lower is served first).
+
+    An `x-cc-adapter-priority` header (main/subagent/background or 0-2) wins.
+    Otherwise Haiku and tool-less requests are background work, requests whose
+    tools include Task/Agent come from the main agent, and the rest from subagents.
+    """
+    override = _header(headers, PRIORITY_HEADER)
+    if override in _ALIASES:
+        return _ALIASES[override]
+    if override.isdigit():
+        return min(BACKGROUND, int(override))
+    tools = incoming.get("tools") or []
+    if "haiku" in str(incoming.get("model") or "").lower() or not tools:
+        return BACKGROUND
+    names = {str(tool.get("name") or "") for tool in tools if isinstance(tool, dict)}
+    return MAIN if names & _SPAWN_TOOLS else SUBAGENT
+
+
+class _Waiter:
+    def __init__(self, priority: int, seq: int):
+        self.priority = priority
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.granted = threading.Event()
+
+
+class PriorityScheduler:
+    """
+    Bounds concurrent upstream calls for one provider.
+
+    When all `limit` slots are busy, callers queue and each freed slot goes to
+    the waiter with the best effective priority: its class minus one step per
+    `aging` seconds waited, so background work is promoted rather than starved.
+    Ties go to the longest waiter.
+    """
+
+    def __init__(self, name: str, limit: int = 0, aging: float = 10.0):
+        self.name = name
+        self.limit = limit
+        self.aging = aging
+        self.active = 0
+        self._seq = 0
+        self._waiters: List[_Waiter] = []
+        self._lock = threading.Lock()
+
+    def configure(self, settings: Any) -> "PriorityScheduler":
+        with self._lock:
+            self.limit = max(0, int(getattr(settings, "scheduler_concurrency", self.limit) or 0))
+            self.aging = float(getattr(settings, "scheduler_aging", self.aging) or 0)
+        return self
+
+    def _effective(self, waiter: _Waiter, now: float) -> float:
+        if self.aging <= 0:
+            return waiter.priority
+        return waiter.priority - (now - waiter.enqueued) / self.aging
+
+    def _grant_next(self) -> None:
+        # Caller holds the lock.
+        while self._waiters and (not self.limit or self.active < self.limit):
+            now = time.monotonic()
+            waiter = min(self._waiters, key=lambda item: (self._effective(item, now), item.seq))
+            self._waiters.remove(waiter)
+            self.active += 1
+            waiter.granted.set()
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free and nobody is queued for it."""
+        with self._lock:
+            if not self.limit or (self.active < self.limit and not self._waiters):
+                self.active += 1
+                return True
+            return False
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                return
+        if waiter.granted.is_set():
+            # Granted while giving up: hand the slot on.
+            self.release()
+
+    def acquire(
+        self,
+        priority: int,
+        deadline: float = 0.0,
+        cancelled: Optional[Callable[[], bool]] = None,
+        on_queue: Optional[Callable[[], None]] = None,
+    ) -> float:
+        """
+        Take a slot, queueing behind better-priority callers; return seconds waited.
+
+        `on_queue` runs once if the caller has to wait (e.g. to start a keepalive
+        stream). Raises QueueAbandoned when `deadline` passes or `cancelled()`
+        turns true first; the caller then leaves the queue.
+        """
+        if self.try_acquire():
+            return 0.0
+        with self._lock:
+            self._seq += 1
+            waiter = _Waiter(priority, self._seq)
+            self._waiters.append(waiter)
+            self._grant_next()
+        metrics.incr(f"scheduler.queued.{CLASS_NAMES[priority]}")
+        try:
+            if on_queue is not None and not waiter.granted.is_set():
+                on_queue()
+            reason = wait_turn(waiter.granted, deadline, cancelled)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        waited = time.monotonic() - waiter.enqueued
+        if reason:
+            self._abandon(waiter)
+            metrics.incr(f"scheduler.abandoned.{reason}")
+            raise QueueAbandoned(
+                f"Gave up waiting {waited:.1f}s for a {self.name} upstream slot ({reason})", reason
+            )
+        metrics.incr(f"scheduler.wait_seconds.{CLASS_NAMES[priority]}", waited)
+        return waited
+
+    def release(self) -> None:
+        with self._lock:
+            self.active = max(0, self.active - 1)
+            self._grant_next()
+
+    @contextmanager
+    def slot(
+        self,
+        priority: int,
+        deadline: float = 0.0,
+        cancelled: Optional[Callable[[], bool]] = None,
+        on_queue: Optional[Callable[[], None]] = None,
+    ) -> Iterator[float]:
+        waited = self.acquire(priority, deadline, cancelled, on_queue)
+        if waited >= 0.1:
+            logger.info("%s request (%s) waited %.1fs for an upstream slot", self.name, CLASS_NAMES[priority], waited)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = {name: 0 for name in CLASS_NAMES.values()}
+            for waiter in self._waiters:
+                queued[CLASS_NAMES[waiter.priority]] += 1
+            return {"limit": self.limit, "active": self.active, "queued": queued}
+
+
+class SchedulerRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._schedulers: Dict[str, PriorityScheduler] = {}
+
+    def get(self, settings: Any, provider: str) -> PriorityScheduler:
+        with self._lock:
+            scheduler = self._schedulers.get(provider)
+            if scheduler is None:
+                scheduler = self._schedulers[provider] = PriorityScheduler(provider)
+        return scheduler.configure(settings)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            schedulers = list(self._schedulers.values())
+        return {scheduler.name: scheduler.snapshot() for scheduler in schedulers}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._schedulers.clear()
+
+
+REGISTRY = SchedulerRegistry()
+
+
+def for_provider(settings: Any, provider: str) -> PriorityScheduler:
+    return REGISTRY.get(settings, provider)
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    return REGISTRY.snapshot()
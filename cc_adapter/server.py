@@ -6,38 +6,75 @@ Main adapter server entrypoint.
 import argparse
 import json
 import logging
+import math
 import os
 import sys
 import threading
+import uuid
+from contextlib import contextmanager
 from dataclasses import replace
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import socket
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Iterator, Optional
 from urllib.parse import urlparse
 from subprocess import Popen, DEVNULL
 
 from .config import Settings, load_settings, apply_overrides
-from .models import available_models, normalize_model_spec, resolve_provider_model
+from .models import available_models, normalize_model_spec
+from .model_registry import SUPPORTED_PROVIDERS, canonicalize_model
 from .converters import anthropic_to_openai, openai_to_anthropic
 from .providers import lmstudio, poe, openrouter, codex
-from . import streaming
+from . import (
+    backend_pool,
+    breaker,
+    client_monitor,
+    failover,
+    fair_queue,
+    hedge,
+    key_pool,
+    metrics,
+    prober,
+    ratelimit,
+    response_cache,
+    retry,
+    routing,
+    scheduler,
+    shortcircuit,
+    singleflight,
+    streaming,
+    timeouts,
+)
 from .logging_utils import configure_root_logging, log_payload
 
 logger = logging.getLogger("cc-adapter")
 
-CODEX_HAIKU_FALLBACK_MODEL = "gpt-5.1-codex-mini"
 
-def _effective_codex_settings(
-    settings: Settings,
-    requested_model: Any,
-    upstream_model: str,
-) -> tuple[Settings, str]:
-    requested_text = str(requested_model or "")
-    if not requested_text or "claude-haiku" not in requested_text.lower():
-        return settings, upstream_model
-    if not str(getattr(settings, "model", "") or "").lower().startswith("codex:"):
-        return settings, upstream_model
-    return replace(settings, model=f"codex:{CODEX_HAIKU_FALLBACK_MODEL}"), CODEX_HAIKU_FALLBACK_MODEL
+PROVIDER_LABELS = {"poe": "Poe", "openrouter": "OpenRouter", "codex": "Codex", "lmstudio": "LM Studio"}
+
+
+def _truthy(value: Any) -> bool:
+    return str(value or "").strip().lower() in {"1", "true", "yes", "on", "always"}
+
+
+def _tee(*taps):
+    active = [tap for tap in taps if tap is not None]
+    if len(active) < 2:
+        return active[0] if active else None
+
+    def _fan_out(data: bytes) -> None:
+        for tap in active:
+            tap(data)
+
+    return _fan_out
+
+
+def _model_entry(model: str) -> Dict[str, Any]:
+    entry: Dict[str, Any] = {"id": model, "object": "model"}
+    provider, _, name = model.partition(":")
+    score = prober.SCORES.get(provider, canonicalize_model(provider, name))
+    if score is not None:
+        entry["latency"] = score.snapshot()
+    return entry
 
 
 def port_available(host: str, port: int) -> bool:
@@ -56,12 +93,22 @@ def port_available(host: str, port: int) -> bool:
         sock.close()
 
 
+class _HopRejected(Exception):
+    """A provider hop cannot be attempted (missing credentials, untranslatable request)."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
 def _json_response(handler: BaseHTTPRequestHandler, status: int, payload: Dict[str, Any]):
     body = json.dumps(payload).encode("utf-8")
     try:
         handler.send_response(status)
         handler.send_header("Content-Type", "application/json")
         handler.send_header("Content-Length", str(len(body)))
+        for key, value in (getattr(handler, "adapter_headers", None) or {}).items():
+            handler.send_header(key, value)
         handler.end_headers()
         handler.wfile.write(body)
     except (BrokenPipeError, ConnectionResetError):
@@ -82,6 +129,12 @@ class AdapterHTTPServer(ThreadingHTTPServer):
             return
         return super().handle_error(request, client_address)
 
+    def server_close(self):
+        active_prober = getattr(self, "prober", None)
+        if active_prober is not None:
+            active_prober.stop()
+        super().server_close()
+
 
 class AdapterHandler(BaseHTTPRequestHandler):
     settings: Settings = load_settings()
@@ -96,13 +149,28 @@ class AdapterHandler(BaseHTTPRequestHandler):
     def do_GET(self):
         parsed = urlparse(self.path)
         if parsed.path == "/health":
-            return _json_response(self, 200, {"status": "ok"})
+            return _json_response(
+                self,
+                200,
+                {
+                    "status": "ok",
+                    "metrics": metrics.snapshot(),
+                    "breakers": breaker.snapshot(),
+                    "rate_limits": ratelimit.snapshot(),
+                    "lmstudio_backends": backend_pool.snapshot(),
+                    "api_keys": key_pool.snapshot(),
+                    "hedging": hedge.snapshot(),
+                    "probes": prober.snapshot(),
+                    "scheduler": scheduler.snapshot(),
+                    "clients": fair_queue.snapshot(),
+                },
+            )
         if parsed.path == "/v1/models":
             return _json_response(
                 self,
                 200,
                 {
-                    "data": [{"id": m, "object": "model"} for m in available_models(self.settings)],
+                    "data": [_model_entry(m) for m in available_models(self.settings)],
                 },
             )
         if parsed.path == "/v1/messages/count_tokens":
@@ -152,6 +220,12 @@ class AdapterHandler(BaseHTTPRequestHandler):
         if parsed.path != "/v1/messages":
             return _json_response(self, 404, {"error": "Not Found"})
 
+        # Handlers are reused across keep-alive requests; reset per-request stream state.
+        self.sse_headers_sent = False
+        self.sse_writer = None
+        self.sse_tap = None
+        self.adapter_headers = {}
+
         try:
             length = int(self.headers.get("Content-Length", "0"))
             raw_body = self.rfile.read(length) if length else b"{}"
@@ -162,171 +236,464 @@ class AdapterHandler(BaseHTTPRequestHandler):
 
         log_payload(logger, "Incoming /v1/messages payload", incoming)
 
+        rule = shortcircuit.match(incoming, self.settings)
+        if rule is not None and rule.reply is not None:
+            return self._reply_locally(rule, incoming)
+
         try:
             requested_model = incoming.get("model")
-            provider, target_model = resolve_provider_model(requested_model, self.settings)
-            normalized_model = False
+            decision = routing.decide(incoming, self.settings)
         except ValueError as exc:
             return _json_response(self, 400, {"error": str(exc)})
+        routed = shortcircuit.route_target(rule, self.settings) if rule is not None else None
+        if routed is not None:
+            logger.info("Short-circuit rule %s routes request to %s:%s", rule.name, *routed)
+            decision = routing.Decision(*routed, rule=f"short-circuit:{rule.name}")
 
+        stream = bool(incoming.get("stream"))
+
+        def _hold_stream():
+            self._open_early_stream(decision.model, incoming, force=True)
+
+        queue = fair_queue.for_settings(self.settings)
+        client = fair_queue.client_id(incoming, self.headers, self.client_address, self.settings)
+        deadline = timeouts.deadline_from_headers(self.headers)
+        tokens = streaming.estimate_prompt_tokens(incoming)
+        try:
+            with queue.slot(client, tokens, deadline, self._client_gone, _hold_stream if stream else None):
+                return self._dispatch(incoming, requested_model, decision, deadline)
+        except fair_queue.OverQuota as exc:
+            logger.warning("%s", exc)
+            self.adapter_headers["Retry-After"] = str(math.ceil(exc.retry_after))
+            return _json_response(self, 429, {"error": str(exc)})
+        except scheduler.QueueAbandoned as exc:
+            return self._queue_abandoned(exc, stream, decision.model, incoming)
+
+    def _dispatch(
+        self, incoming: Dict[str, Any], requested_model: Any, decision: routing.Decision, deadline: float = 0.0
+    ):
+        """Try the decided provider/model and its failover hops until one answers the client."""
+        provider, target_model = decision.provider, decision.model
+        hops = prober.rank(failover.chain_for(provider, target_model, self.settings), self.settings)
+        if hops[0] != (provider, target_model):
+            logger.info("Latency probes favour %s:%s over %s:%s", *hops[0], provider, target_model)
+            rule = f"{decision.rule}+latency" if decision.rule else "latency"
+            decision = replace(decision, provider=hops[0][0], model=hops[0][1], rule=rule)
+            provider, target_model = decision.provider, decision.model
+        for position, (hop_provider, hop_model) in enumerate(hops, start=1):
+            last_hop = position == len(hops)
+            try:
+                settings, upstream_model, openai_payload = self._prepare_hop(
+                    hop_provider,
+                    hop_model,
+                    requested_model,
+                    incoming,
+                    deadline,
+                    fallback=position > 1,
+                    decision=decision if position == 1 else None,
+                )
+            except _HopRejected as exc:
+                if last_hop:
+                    return _json_response(self, exc.status, {"error": str(exc)})
+                logger.warning("Skipping failover hop %s:%s: %s", hop_provider, hop_model, exc)
+                continue
+
+            label = PROVIDER_LABELS[hop_provider]
+            stream = bool(openai_payload.get("stream"))
+            self._mark_hop(hop_provider, upstream_model, position, len(hops))
+            try:
+                outgoing = self._cached(
+                    hop_provider,
+                    upstream_model,
+                    openai_payload,
+                    incoming,
+                    settings,
+                    lambda: self._coalesce(
+                        hop_provider,
+                        upstream_model,
+                        openai_payload,
+                        settings,
+                        lambda: self._run_hop(hop_provider, openai_payload, upstream_model, incoming, settings, stream),
+                        stream,
+                    ),
+                    stream,
+                )
+                if stream:
+                    return
+                log_payload(logger, "Responding to client", outgoing)
+                return _json_response(self, 200, outgoing)
+            except (BrokenPipeError, ConnectionResetError):
+                logger.info("Client disconnected during %s %s", label, "stream" if stream else "request")
+                self.close_connection = True
+                return
+            except scheduler.QueueAbandoned as exc:
+                return self._queue_abandoned(exc, stream, upstream_model, incoming)
+            except Exception as exc:
+                if not last_hop and self._nothing_committed():
+                    next_provider, next_model = hops[position]
+                    metrics.incr("failover.attempts")
+                    logger.warning(
+                        "%s failed (%s); failing over to %s:%s", label, exc, next_provider, next_model
+                    )
+                    continue
+                logger.exception("%s %s failed", label, "stream" if stream else "request")
+                if stream:
+                    return self._stream_failed(f"{label} error: {exc}", upstream_model, incoming)
+                status = 503 if isinstance(exc, breaker.CircuitOpen) else 502
+                return _json_response(self, status, {"error": f"{label} error: {exc}"})
+
+    # Provider dispatch helpers
+    def _prepare_hop(
+        self,
+        provider: str,
+        target_model: str,
+        requested_model: Any,
+        incoming: Dict[str, Any],
+        deadline: float,
+        fallback: bool = False,
+        decision: Optional[routing.Decision] = None,
+        hedge: bool = False,
+    ) -> tuple[Settings, str, Dict[str, Any]]:
         effective_settings = self.settings
-        codex_haiku_override = ""
-        if provider == "codex":
-            effective_settings, effective_model = _effective_codex_settings(
-                self.settings, requested_model, target_model
-            )
-            if effective_model != target_model:
-                codex_haiku_override = effective_model
-                target_model = effective_model
+        routed = decision is not None and bool(decision.rule)
+        if fallback or routed or hedge:
+            # Provider helpers derive context windows and model keys from settings.model.
+            effective_settings = replace(effective_settings, model=f"{provider}:{target_model}")
+        if provider == "poe" and not effective_settings.poe_api_key:
+            raise _HopRejected(400, "POE_API_KEY not set")
+        if provider == "openrouter" and not effective_settings.openrouter_key:
+            raise _HopRejected(400, "OPENROUTER_API_KEY not set")
+        if deadline:
+            effective_settings = replace(effective_settings, request_deadline=deadline)
 
         resolution_bits = []
         if requested_model and requested_model != target_model:
             resolution_bits.append(f"requested={requested_model}")
-        if normalized_model:
-            resolution_bits.append("alias->canonical")
-        if (
-            provider == "lmstudio"
-            and requested_model
-            and "claude-haiku" in requested_model.lower()
-            and target_model == self.settings.lmstudio_model
-        ):
-            resolution_bits.append("haiku->lmstudio_default")
-        if codex_haiku_override:
-            resolution_bits.append(f"haiku->{codex_haiku_override}")
+        if fallback:
+            resolution_bits.append("failover")
+        if hedge:
+            resolution_bits.append("hedge")
+        if routed:
+            resolution_bits.append(f"route={decision.rule}")
         suffix = f" ({'; '.join(resolution_bits)})" if resolution_bits else ""
         logger.info("Resolved model %s:%s%s", provider, target_model, suffix)
 
         try:
-            openai_payload = anthropic_to_openai(incoming, target_model)
+            openai_payload = anthropic_to_openai(
+                incoming, target_model, keep_reasoning_items=(provider == "codex")
+            )
         except Exception as exc:
             logger.exception("Failed to translate Anthropic request")
-            return _json_response(self, 400, {"error": f"Bad request: {exc}"})
+            raise _HopRejected(400, f"Bad request: {exc}") from exc
+        if decision is not None and decision.reasoning_effort:
+            openai_payload["reasoning"] = {"effort": decision.reasoning_effort}
 
         log_payload(
             logger,
             f"Sending payload to {provider}:{target_model}",
             openai_payload,
         )
+        return effective_settings, target_model, openai_payload
 
-        # Poe direct (OpenAI-compatible API)
-        if provider == "poe":
-            if not self.settings.poe_api_key:
-                return _json_response(self, 400, {"error": "POE_API_KEY not set"})
-            if openai_payload.get("stream"):
-                return self._handle_poe_stream(openai_payload, target_model, incoming)
-            return self._handle_poe(openai_payload, target_model, incoming)
+    def _mark_hop(self, provider: str, target_model: str, position: int, total: int):
+        self.adapter_headers = {"X-CC-Adapter-Served-By": f"{provider}:{target_model}"}
+        if total > 1:
+            self.adapter_headers["X-CC-Adapter-Failover-Hop"] = f"{position}/{total}"
+            if position > 1:
+                metrics.incr(f"failover.served.{provider}")
 
-        # OpenRouter
+    def _send_provider(
+        self,
+        provider: str,
+        payload: Dict[str, Any],
+        target_model: str,
+        incoming: Dict[str, Any],
+        settings: Settings,
+    ) -> Dict[str, Any]:
+        if provider == "poe":
+            return poe.send(payload, settings, target_model, incoming)
         if provider == "openrouter":
-            if not self.settings.openrouter_key:
-                return _json_response(self, 400, {"error": "OPENROUTER_API_KEY not set"})
-            if openai_payload.get("stream"):
-                return self._handle_openrouter_stream(
-                    openai_payload, target_model, incoming
-                )
-            try:
-                openrouter_response = openrouter.send(openai_payload, self.settings, target_model)
-                outgoing = openai_to_anthropic(openrouter_response, target_model, incoming)
-                log_payload(logger, "OpenRouter response", openrouter_response)
-                log_payload(logger, "Responding to client", outgoing)
-                return _json_response(self, 200, outgoing)
-            except Exception as exc:
-                logger.exception("OpenRouter request failed")
-                return _json_response(self, 502, {"error": f"OpenRouter error: {exc}"})
-
-        # OpenAI Codex (ChatGPT OAuth)
-        if provider == "codex":
-            if openai_payload.get("stream"):
-                return self._handle_codex_stream(openai_payload, target_model, incoming, effective_settings)
-            try:
-                codex_response = codex.send(openai_payload, effective_settings, target_model)
-                outgoing = openai_to_anthropic(codex_response, target_model, incoming)
-                log_payload(logger, "Codex response", codex_response)
-                log_payload(logger, "Responding to client", outgoing)
-                return _json_response(self, 200, outgoing)
-            except Exception as exc:
-                logger.exception("Codex request failed")
-                return _json_response(self, 502, {"error": f"Codex error: {exc}"})
+            response = openrouter.send(payload, settings, target_model)
+            log_payload(logger, "OpenRouter response", response)
+        elif provider == "codex":
+            response = codex.send(payload, settings, target_model, incoming)
+            log_payload(logger, "Codex response", response)
+        else:
+            response = lmstudio.send(payload, settings)
+            log_payload(logger, "LM Studio response", response)
+        return openai_to_anthropic(response, target_model, incoming)
 
-        # LM Studio
-        if openai_payload.get("stream"):
-            return self._handle_lm_stream(openai_payload, target_model, incoming)
+    def _stream_provider(
+        self,
+        provider: str,
+        payload: Dict[str, Any],
+        target_model: str,
+        incoming: Dict[str, Any],
+        settings: Settings,
+    ):
+        module = {"poe": poe, "openrouter": openrouter, "codex": codex}.get(provider, lmstudio)
+        return module.stream(payload, settings, target_model, incoming, self, logger)
+
+    def _reply_locally(self, rule: shortcircuit.Rule, incoming: Dict[str, Any]):
+        logger.info("Answering request locally (short-circuit rule %s)", rule.name)
+        message = shortcircuit.local_message(rule, incoming)
+        self.adapter_headers = {"X-CC-Adapter-Short-Circuit": rule.name}
+        if not incoming.get("stream"):
+            return _json_response(self, 200, message)
+        streaming.start_sse_response(self)
+        self.sse_writer = streaming.SSEWriter(self, logger)
+        response_cache.replay(self.sse_writer, message)
+
+    def _run_hop(
+        self,
+        provider: str,
+        payload: Dict[str, Any],
+        target_model: str,
+        incoming: Dict[str, Any],
+        settings: Settings,
+        stream: bool,
+    ) -> Optional[Dict[str, Any]]:
+        def _send():
+            return self._send_provider(provider, payload, target_model, incoming, settings)
+
+        def _send_hedged():
+            alternate_key, alternate = self._hedge_call(provider, payload, target_model, incoming, settings, priority)
+            return hedge.HEDGER.run(
+                f"{provider}:{target_model}",
+                _send,
+                alternate,
+                float(getattr(settings, "hedge_budget", 0) or 0),
+                alternate_key=alternate_key,
+            )
 
-        try:
-            lmstudio_response = lmstudio.send(openai_payload, self.settings)
-            outgoing = openai_to_anthropic(lmstudio_response, target_model, incoming)
-            log_payload(logger, "LM Studio response", lmstudio_response)
-            log_payload(logger, "Responding to client", outgoing)
-            return _json_response(self, 200, outgoing)
-        except Exception as exc:
-            logger.exception("LM Studio request failed")
-            return _json_response(self, 502, {"error": f"LM Studio error: {exc}"})
+        def _hold_stream():
+            # Give a queued streaming client message_start and keepalive pings while it waits.
+            self._open_early_stream(target_model, incoming, settings, force=True)
 
-    # Provider dispatch helpers
-    def _handle_poe(self, payload: Dict[str, Any], bot_name: str, incoming: Dict[str, Any]):
-        try:
-            poe_response = poe.send(payload, self.settings, bot_name, incoming)
-            log_payload(logger, "Responding to client", poe_response)
-            return _json_response(self, 200, poe_response)
-        except Exception as exc:
-            logger.exception("Poe request failed")
-            return _json_response(self, 502, {"error": f"Poe error: {exc}"})
+        priority = scheduler.classify(incoming, self.headers)
+        with scheduler.for_provider(settings, provider).slot(
+            priority, settings.request_deadline, self._client_gone, _hold_stream if stream else None
+        ):
+            if stream:
+                self._open_early_stream(target_model, incoming, settings)
+                self._call_upstream(
+                    provider,
+                    lambda: self._stream_provider(provider, payload, target_model, incoming, settings),
+                    settings,
+                    can_retry=self._nothing_committed,
+                )
+                return None
+            # A hedged call returns once its loser is aborted, so this slot covers both attempts.
+            hedged = _truthy(getattr(settings, "hedge", ""))
+            return self._call_upstream(provider, _send_hedged if hedged else _send, settings)
 
-    def _handle_poe_stream(
-        self, payload: Dict[str, Any], bot_name: str, incoming: Dict[str, Any]
-    ):
+    def _hedge_call(
+        self,
+        provider: str,
+        payload: Dict[str, Any],
+        target_model: str,
+        incoming: Dict[str, Any],
+        settings: Settings,
+        priority: int = scheduler.SUBAGENT,
+    ) -> tuple[str, Callable[[], Dict[str, Any]]]:
+        """
+        ("provider:model", call) for the duplicate of a non-streaming hop.
+
+        The duplicate goes to HEDGE_TARGET when set. Otherwise it repeats the
+        primary upstream call, so it also uses the same API key and rate-limit
+        governor as the slow primary (the conversation pins the key). Either way
+        it needs a free scheduler slot on its provider and is skipped without one.
+        """
+        spec = str(getattr(settings, "hedge_target", "") or "").strip()
+        if not spec:
+
+            def _send_again():
+                with self._hedge_slot(provider, settings, priority):
+                    return self._send_provider(provider, payload, target_model, incoming, settings)
+
+            return f"{provider}:{target_model}", _send_again
+        hedge_provider, _, hedge_model = spec.partition(":")
+        hedge_provider = hedge_provider.strip().lower()
+        hedge_model = canonicalize_model(hedge_provider, hedge_model.strip() or target_model)
+
+        def _send_alternate():
+            alt_settings, alt_model, alt_payload = self._prepare_hop(
+                hedge_provider,
+                hedge_model,
+                incoming.get("model"),
+                incoming,
+                settings.request_deadline,
+                hedge=True,
+            )
+            with self._hedge_slot(hedge_provider, alt_settings, priority):
+                return self._send_provider(hedge_provider, alt_payload, alt_model, incoming, alt_settings)
+
+        return f"{hedge_provider}:{hedge_model}", _send_alternate
+
+    @contextmanager
+    def _hedge_slot(self, provider: str, settings: Settings, priority: int) -> Iterator[None]:
+        # A hedge never queues: waiting behind other callers would only add load once it got through.
+        pool = scheduler.for_provider(settings, provider)
+        if not pool.try_acquire():
+            metrics.incr("hedge.no_slot")
+            raise scheduler.QueueAbandoned(
+                f"No free {provider} slot for a hedged {scheduler.CLASS_NAMES[priority]} request", "busy"
+            )
         try:
-            return poe.stream(payload, self.settings, bot_name, incoming, self, logger)
-        except (BrokenPipeError, ConnectionResetError):
-            logger.info("Client disconnected during Poe stream")
-            self.close_connection = True
-            return
-        except Exception as exc:
-            logger.exception("Poe stream failed")
-            return _json_response(self, 502, {"error": f"Poe error: {exc}"})
+            yield
+        finally:
+            pool.release()
 
-    def _handle_openrouter_stream(
-        self, payload: Dict[str, Any], target_model: str, incoming: Dict[str, Any]
-    ):
+    def _coalesce(
+        self,
+        provider: str,
+        target_model: str,
+        payload: Dict[str, Any],
+        settings: Settings,
+        run,
+        stream: bool,
+    ) -> Optional[Dict[str, Any]]:
+        """Run `run` once for identical concurrent payloads when SINGLE_FLIGHT is on."""
+        if not _truthy(getattr(settings, "single_flight", "")):
+            return run()
+        if stream and getattr(self, "sse_writer", None) is not None:
+            # A failed-over stream already wrote to this client; followers could not replay it.
+            return run()
+        flight, leader = singleflight.GROUP.join(singleflight.flight_key(provider, target_model, payload))
+        if not leader:
+            logger.info("Coalesced with in-flight %s:%s request", provider, target_model)
+            if stream:
+                return self._follow_stream(flight, target_model)
+            return flight.wait()
+        outer_tap = self.sse_tap
+        if stream:
+            self.sse_tap = _tee(outer_tap, flight.feed)
         try:
-            return openrouter.stream(payload, self.settings, target_model, incoming, self, logger)
-        except (BrokenPipeError, ConnectionResetError):
-            logger.info("Client disconnected during OpenRouter stream")
-            self.close_connection = True
-            return
-        except Exception as exc:
-            logger.exception("OpenRouter stream failed")
-            return _json_response(self, 502, {"error": f"OpenRouter error: {exc}"})
+            result = run()
+        except BaseException as exc:
+            flight.finish(error=exc, started=not self._nothing_started(), committed=not self._nothing_committed())
+            raise
+        else:
+            flight.finish(result=result, started=not self._nothing_started(), committed=not self._nothing_committed())
+        finally:
+            self.sse_tap = outer_tap
+            singleflight.GROUP.land(flight)
+        return result
 
-    def _handle_codex_stream(
+    def _cached(
         self,
-        payload: Dict[str, Any],
+        provider: str,
         target_model: str,
+        payload: Dict[str, Any],
         incoming: Dict[str, Any],
-        settings: Optional[Settings] = None,
-    ):
+        settings: Settings,
+        run,
+        stream: bool,
+    ) -> Optional[Dict[str, Any]]:
+        """Serve an exact-match cached response, or run `run` and cache its complete answer."""
+        if stream and getattr(self, "sse_writer", None) is not None:
+            return run()
+        if not response_cache.is_cacheable(incoming, self.headers, provider, target_model, settings):
+            return run()
+        key = response_cache.cache_key(provider, target_model, payload)
+        cache = response_cache.CACHE.configure(settings)
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info("Serving %s:%s from the response cache", provider, target_model)
+            cached["id"] = f"msg_{uuid.uuid4().hex[:24]}"
+            self.adapter_headers["X-CC-Adapter-Cache"] = "hit"
+            if not stream:
+                return cached
+            streaming.start_sse_response(self)
+            self.sse_writer = streaming.SSEWriter(self, logger)
+            response_cache.replay(self.sse_writer, cached)
+            return None
+        recorded: list = []
+        if stream:
+            self.sse_tap = recorded.append
         try:
-            return codex.stream(payload, settings or self.settings, target_model, incoming, self, logger)
-        except (BrokenPipeError, ConnectionResetError):
-            logger.info("Client disconnected during Codex stream")
+            result = run()
+        finally:
+            self.sse_tap = None
+        message = response_cache.message_from_sse(b"".join(recorded)) if stream else result
+        if message and message.get("stop_reason") not in (None, "error"):
+            cache.put(key, message, float(getattr(settings, "response_cache_ttl", 0) or 0))
+        return result
+
+    def _follow_stream(self, flight: singleflight.Flight, target_model: str) -> None:
+        """Replay a leader's SSE output to this client, then tail it until the leader finishes."""
+        writer = streaming.SSEWriter(self, logger)
+        self.sse_writer = writer
+        replayed = b""
+        for batch in flight.tail():
+            streaming.start_sse_response(self)
+            for chunk in batch:
+                writer.write_raw(chunk)
+            writer.flush()
+            replayed = batch[-1]
+        writer.started = flight.started
+        writer.committed = flight.committed
+        if flight.error is not None and not flight.committed:
+            raise flight.error
+        if b"message_stop" not in replayed:
+            # The leader's client went away (or its stream failed) and took the shared upstream with it.
+            streaming.start_sse_response(self)
+            streaming.abort_stream(writer, "Shared upstream stream ended early", target_model)
             self.close_connection = True
+
+    def _open_early_stream(
+        self, target_model: str, incoming: Dict[str, Any], settings: Optional[Settings] = None, force: bool = False
+    ):
+        active = settings or self.settings
+        if getattr(self, "sse_writer", None) is not None:
             return
-        except Exception as exc:
-            logger.exception("Codex stream failed")
-            return _json_response(self, 502, {"error": f"Codex error: {exc}"})
+        if force or _truthy(getattr(active, "early_stream_start", "")):
+            streaming.open_early_stream(self, target_model, incoming, logger, active)
+
+    def _client_gone(self) -> bool:
+        return client_monitor.client_gone(self)
 
-    def _handle_lm_stream(
-        self, payload: Dict[str, Any], target_model: str, incoming: Dict[str, Any]
+    def _queue_abandoned(
+        self, exc: scheduler.QueueAbandoned, stream: bool, target_model: str, incoming: Dict[str, Any]
     ):
-        try:
-            return lmstudio.stream(payload, self.settings, target_model, incoming, self, logger)
-        except (BrokenPipeError, ConnectionResetError):
-            logger.info("Client disconnected during LM Studio stream")
+        """A request stopped waiting for a slot: drop a vanished client, tell a timed-out one."""
+        logger.warning("%s", exc)
+        if exc.reason == "disconnected":
             self.close_connection = True
-            return
-        except Exception as exc:
-            logger.exception("LM Studio stream failed")
-            return _json_response(self, 502, {"error": f"LM Studio error: {exc}"})
+            return None
+        if stream:
+            return self._stream_failed(str(exc), target_model, incoming)
+        return _json_response(self, 503, {"error": str(exc)})
+
+    def _stream_failed(self, message: str, target_model: str = "", incoming: Optional[Dict[str, Any]] = None):
+        writer = getattr(self, "sse_writer", None)
+        if writer is None and not getattr(self, "sse_headers_sent", False):
+            return _json_response(self, 502, {"error": message})
+        if writer is None:
+            writer = streaming.SSEWriter(self, logger)
+        streaming.abort_stream(writer, message, target_model, incoming)
+        self.close_connection = True
+
+    def _nothing_started(self) -> bool:
+        writer = getattr(self, "sse_writer", None)
+        return writer is None or not writer.started
+
+    def _nothing_committed(self) -> bool:
+        writer = getattr(self, "sse_writer", None)
+        return writer is None or not writer.committed
+
+    def _first_output_at(self) -> Optional[float]:
+        writer = getattr(self, "sse_writer", None)
+        return writer.committed_at if writer is not None else None
+
+    def _call_upstream(self, provider: str, call, settings: Settings, can_retry=None):
+        circuit = breaker.for_provider(settings, provider)
+        return retry.call_with_retries(
+            lambda: circuit.call(call, first_byte=self._first_output_at),
+            retry.RetryPolicy.for_provider(settings, provider),
+            can_retry=can_retry or (lambda: True),
+            deadline=settings.request_deadline,
+        )
 
 
 def run_server(settings: Settings):
@@ -350,6 +717,7 @@ def build_server(settings: Settings) -> AdapterHTTPServer:
     settings.apply_no_proxy_env()
     server = AdapterHTTPServer((settings.host, settings.port), AdapterHandler)
     AdapterHandler.settings = settings  # type: ignore
+    server.prober = prober.start(settings)
     return server
 
 
@@ -446,7 +814,7 @@ def main():
     provider_arg = str(getattr(args, "provider", "") or "").strip()
     if provider_arg:
         provider = provider_arg.rstrip(":").lower()
-        if provider not in {"poe", "lmstudio", "openrouter", "codex"}:
+        if provider not in SUPPORTED_PROVIDERS:
             parser.error(f"Unsupported provider: {provider_arg}")
         if model_arg:
             if ":" in model_arg:
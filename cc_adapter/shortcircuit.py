@@ -0,0 +1,105 @@
+import logging
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import metrics, rules
+from .model_registry import SUPPORTED_PROVIDERS, canonicalize_model
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    A declarative short-circuit rule.
+
+    `match` holds conditions that must all hold (see rules.MATCH_KEYS); a matching
+    request is answered with `reply` or sent to `route` ("provider[:model]")
+    instead of the resolved upstream.
+    """
+
+    name: str
+    match: Dict[str, Any] = field(default_factory=dict)
+    reply: Optional[str] = None
+    stop_reason: str = "end_turn"
+    route: str = ""
+
+
+BUILTIN_RULES: Tuple[Rule, ...] = (
+    # Quota/connectivity probes only need a well-formed answer.
+    Rule("quota-probe", {"max_tokens_lte": 1, "no_tools": True}, reply=".", stop_reason="max_tokens"),
+    # Claude Code's "is this a new topic" classifier; never starting a new topic keeps the title stable.
+    Rule(
+        "topic-classifier",
+        {"no_tools": True, "system_contains": "new conversation topic"},
+        reply='{"isNewTopic": false, "title": null}',
+    ),
+)
+
+
+def _rule_from_dict(raw: Dict[str, Any]) -> Rule:
+    match = rules.validate(raw.get("match"))
+    if raw.get("reply") is None and not raw.get("route"):
+        raise ValueError("rule needs a reply or a route")
+    return Rule(
+        name=str(raw.get("name") or "custom"),
+        match=match,
+        reply=None if raw.get("reply") is None else str(raw["reply"]),
+        stop_reason=str(raw.get("stop_reason") or "end_turn"),
+        route=str(raw.get("route") or ""),
+    )
+
+
+RULES = rules.RuleTable("SHORT_CIRCUIT_RULES", _rule_from_dict, BUILTIN_RULES)
+
+
+def parse_rules(spec: str) -> List[Rule]:
+    """
+    Parse SHORT_CIRCUIT_RULES: a JSON list of rule objects, or a path to a file holding one.
+
+    Custom rules are checked before the built-in ones; invalid entries are skipped.
+    """
+    return RULES.load(spec)
+
+
+def matches(rule: Rule, incoming: Dict[str, Any]) -> bool:
+    return rules.matches(rule.match, incoming)
+
+
+def match(incoming: Dict[str, Any], settings: Any) -> Optional[Rule]:
+    """Return the first rule matching `incoming` (counting the hit), or None when disabled."""
+    if str(getattr(settings, "short_circuit", "off")).strip().lower() not in {"1", "on", "true", "yes"}:
+        return None
+    for rule in parse_rules(getattr(settings, "short_circuit_rules", "")):
+        if matches(rule, incoming):
+            metrics.incr(f"shortcircuit.{rule.name}")
+            return rule
+    return None
+
+
+def route_target(rule: Rule, settings: Any) -> Optional[Tuple[str, str]]:
+    provider, _, name = rule.route.partition(":")
+    provider = provider.strip().lower()
+    if provider not in SUPPORTED_PROVIDERS:
+        logger.warning("Short-circuit rule %s routes to unsupported provider %r", rule.name, provider)
+        return None
+    name = name.strip() or (getattr(settings, "lmstudio_model", "") if provider == "lmstudio" else "")
+    if not name:
+        return None
+    return provider, canonicalize_model(provider, name)
+
+
+def local_message(rule: Rule, incoming: Dict[str, Any]) -> Dict[str, Any]:
+    """Anthropic message answering `incoming` with the rule's canned reply."""
+    text = rule.reply or ""
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": incoming.get("model") or "",
+        "content": [{"type": "text", "text": text}] if text else [],
+        "stop_reason": rule.stop_reason,
+        "stop_sequence": None,
+        "usage": {"input_tokens": 0, "output_tokens": 0},
+    }
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from . import metrics
+
+
+def flight_key(provider: str, target_model: str, payload: Dict[str, Any]) -> str:
+    """Canonical hash of a translated upstream request."""
+    canonical = json.dumps(
+        {"provider": provider, "model": target_model, "payload": payload},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Flight:
+    """
+    One upstream call shared by identical concurrent requests.
+
+    The leader feeds every SSE byte chunk it writes to its own client; followers
+    replay what was already recorded and then tail new chunks until `finish`.
+    Non-streaming followers wait for the leader's result instead.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.chunks: List[bytes] = []
+        self.done = False
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        # The leader's stream state when it finished (see SSEWriter.started/committed).
+        self.started = False
+        self.committed = False
+        self._cond = threading.Condition()
+
+    def feed(self, data: bytes) -> None:
+        with self._cond:
+            self.chunks.append(data)
+            self._cond.notify_all()
+
+    def finish(
+        self,
+        result: Any = None,
+        error: Optional[BaseException] = None,
+        started: bool = False,
+        committed: bool = False,
+    ) -> None:
+        with self._cond:
+            self.result = result
+            self.error = error
+            self.started = started
+            self.committed = committed
+            self.done = True
+            self._cond.notify_all()
+
+    def wait(self) -> Any:
+        """Block until the leader finished; re-raise its error or return its result."""
+        with self._cond:
+            while not self.done:
+                self._cond.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def tail(self) -> Iterator[List[bytes]]:
+        """Yield batches of recorded chunks, from the first one, until the flight is done."""
+        sent = 0
+        while True:
+            with self._cond:
+                while sent == len(self.chunks) and not self.done:
+                    self._cond.wait()
+                batch = self.chunks[sent:]
+                sent = len(self.chunks)
+                finished = self.done
+            if batch:
+                yield batch
+            if finished:
+                return
+
+
+class FlightGroup:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flights: Dict[str, Flight] = {}
+
+    def join(self, key: str) -> Tuple[Flight, bool]:
+        """Return the in-flight call for `key` and whether the caller leads it."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                metrics.incr("singleflight.coalesced")
+                return flight, False
+            flight = self._flights[key] = Flight(key)
+        metrics.incr("singleflight.flights")
+        return flight, True
+
+    def land(self, flight: Flight) -> None:
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+
+GROUP = FlightGroup()
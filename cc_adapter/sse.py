@@ -0,0 +1,229 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from . import metrics
+from .client_monitor import ClientDisconnected
+from .logging_utils import log_payload
+
+RELAY_POLICIES = ("block", "disconnect")
+# Default seconds a "block" relay waits for a stalled client before dropping it.
+RELAY_STALL_TIMEOUT = 60.0
+
+
+def encode_event(event: str, payload: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode("utf-8")
+
+
+class ClientTooSlow(ClientDisconnected):
+    """The client fell further behind than the relay high-water mark allows."""
+
+
+class _Relay:
+    """
+    Bounded byte queue between the upstream reader and a client writer thread.
+
+    The reader never touches the client socket, so a slow client does not stop
+    the upstream from being drained until `high_water` bytes are pending. Past
+    that, `policy` either blocks the reader ("block") or drops the client
+    ("disconnect"). A blocked reader gives up after `stall_timeout` seconds
+    without room, so a stalled client is eventually dropped either way.
+    """
+
+    def __init__(self, wfile: Any, high_water: int, policy: str, stall_timeout: float = RELAY_STALL_TIMEOUT):
+        self.wfile = wfile
+        self.high_water = high_water
+        self.policy = policy if policy in RELAY_POLICIES else "block"
+        self.stall_timeout = float(stall_timeout) if stall_timeout and stall_timeout > 0 else RELAY_STALL_TIMEOUT
+        self.error: Optional[BaseException] = None
+        self.peak_bytes = 0
+        self._pending: Deque[bytes] = deque()
+        self._pending_bytes = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="cc-adapter-sse-relay", daemon=True)
+        self._thread.start()
+
+    def _raise_error(self) -> None:
+        if self.error is not None:
+            raise self.error
+
+    def _drop(self, reason: str) -> None:
+        # Caller holds the condition.
+        metrics.incr("relay.slow_client_dropped")
+        self.error = ClientTooSlow(reason)
+        self._cond.notify_all()
+        raise self.error
+
+    def _full(self, size: int) -> bool:
+        return bool(self._pending_bytes) and self._pending_bytes + size > self.high_water
+
+    def put(self, data: bytes) -> None:
+        with self._cond:
+            self._raise_error()
+            if self._full(len(data)):
+                if self.policy == "disconnect":
+                    self._drop(f"Client fell {self._pending_bytes} bytes behind (high-water {self.high_water})")
+                metrics.incr("relay.backpressure_waits")
+                if not self._cond.wait_for(
+                    lambda: not self._full(len(data)) or self.error is not None, self.stall_timeout
+                ):
+                    self._drop(f"Client read nothing for {self.stall_timeout:g}s with the relay full")
+                self._raise_error()
+            self._pending.append(data)
+            self._pending_bytes += len(data)
+            self.peak_bytes = max(self.peak_bytes, self._pending_bytes)
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed and self.error is None:
+                    self._cond.wait()
+                if self.error is not None or (not self._pending and self._closed):
+                    return
+                # Coalesce everything queued so far into one client write.
+                data = b"".join(self._pending)
+                self._pending.clear()
+            try:
+                self.wfile.write(data)
+                self.wfile.flush()
+            except Exception as exc:
+                with self._cond:
+                    self.error = exc
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._pending_bytes -= len(data)
+                self._cond.notify_all()
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Stop accepting data and wait (at most `timeout`, default `stall_timeout`) for pending bytes to drain."""
+        if timeout is None:
+            timeout = self.stall_timeout
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            if self.error is not None:
+                # A dropped or broken client may block the writer thread in
+                # write(); it unwinds once the server closes the connection.
+                timeout = 0
+        self._thread.join(timeout)
+        metrics.incr("relay.streams")
+
+
+class SSEWriter:
+    """
+    Serialize Anthropic SSE writes to a client.
+
+    All writes go through one lock so a background keepalive timer can emit
+    `ping` events while the bridge's read loop is blocked on the upstream.
+    """
+
+    def __init__(self, handler: Any, logger: Optional[logging.Logger] = None):
+        self.handler = handler
+        self.logger = logger
+        self.debug_enabled = bool(logger) and logger.isEnabledFor(logging.DEBUG)
+        self.started = False
+        # True once anything beyond message_start reached the client; until then
+        # the upstream request can still be retried transparently.
+        self.committed = False
+        self.committed_at: Optional[float] = None
+        self.last_write = time.monotonic()
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._pinger: Optional[threading.Thread] = None
+        self._relay: Optional[_Relay] = None
+
+    def write_raw(self, data: bytes) -> None:
+        with self._lock:
+            # A coalesced request's leader mirrors its stream to followers (see singleflight).
+            tap = getattr(self.handler, "sse_tap", None)
+            if tap is not None:
+                tap(data)
+            if self._relay is not None:
+                self._relay.put(data)
+            else:
+                self.handler.wfile.write(data)
+            self.last_write = time.monotonic()
+
+    def send(self, event: str, payload: Dict[str, Any]) -> None:
+        if self.debug_enabled:
+            log_payload(self.logger, f"SSE -> {event}", payload)
+        with self._lock:
+            self.write_raw(encode_event(event, payload))
+            if event == "message_start":
+                self.started = True
+            elif event != "ping":
+                if not self.committed:
+                    self.committed_at = time.monotonic()
+                self.committed = True
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._relay is not None:
+                # The relay thread flushes after every batch it writes.
+                return
+            self.handler.wfile.flush()
+
+    def start_relay(
+        self, high_water: int, policy: str = "block", stall_timeout: float = RELAY_STALL_TIMEOUT
+    ) -> "SSEWriter":
+        """Hand client writes to a relay thread buffering up to `high_water` bytes (0 disables)."""
+        high_water = int(high_water or 0)
+        with self._lock:
+            if high_water <= 0 or self._relay is not None:
+                return self
+            self._relay = _Relay(self.handler.wfile, high_water, policy, stall_timeout)
+        return self
+
+    def close_relay(self, timeout: Optional[float] = None) -> None:
+        """Wait (bounded by the relay's stall timeout) for relayed bytes to reach the client."""
+        with self._lock:
+            relay, self._relay = self._relay, None
+        if relay is not None:
+            relay.close(timeout)
+
+    def ping(self) -> None:
+        with self._lock:
+            if self._stop.is_set():
+                return
+            if self.started:
+                self.write_raw(encode_event("ping", {"type": "ping"}))
+            else:
+                # Anthropic clients expect message_start first; an SSE comment
+                # keeps proxies and idle timers warm without breaking that order.
+                self.write_raw(b": keepalive\n\n")
+            self.flush()
+
+    def start_keepalive(self, interval: float) -> "SSEWriter":
+        """Emit pings whenever nothing was written for `interval` seconds (0 disables)."""
+        interval = float(interval or 0)
+        if interval <= 0 or (self._pinger is not None and not self._stop.is_set()):
+            return self
+        # A retried upstream restarts the keepalive on the same writer.
+        self._stop = threading.Event()
+        self._pinger = threading.Thread(
+            target=self._keepalive_loop, args=(interval, self._stop), name="cc-adapter-sse-ping", daemon=True
+        )
+        self._pinger.start()
+        return self
+
+    def _keepalive_loop(self, interval: float, stop: threading.Event) -> None:
+        while True:
+            idle = time.monotonic() - self.last_write
+            if stop.wait(max(0.0, interval - idle)):
+                return
+            if time.monotonic() - self.last_write < interval:
+                continue
+            try:
+                self.ping()
+            except Exception:
+                # The bridge notices a dead client on its own next write.
+                return
+
+    def stop(self) -> None:
+        self._stop.set()
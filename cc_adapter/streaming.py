@@ -1,9 +1,18 @@
 import json
 import logging
-from typing import Any, Dict, Optional, Tuple
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from http.server import BaseHTTPRequestHandler
-from .codex_tool_remap import remap_codex_tool_call
+
+import requests
+
+from . import metrics
+from .client_monitor import ClientDisconnected, ClientMonitor
+from .codex_reasoning import encode_reasoning_signature
+from .codex_tool_remap import FileContentCache, remap_codex_tool_call
 from .logging_utils import log_payload
+from .sse import SSEWriter
+from .timeouts import PhaseTimeouts, StallWatchdog
 
 
 def _estimate_tokens_from_chars(char_count: int) -> int:
@@ -44,24 +53,120 @@ def estimate_prompt_tokens(incoming: Optional[Dict[str, Any]]) -> int:
     return _estimate_tokens_from_chars(_collect_prompt_chars(incoming))
 
 
+def start_sse_response(handler: BaseHTTPRequestHandler) -> None:
+    """Send the 200 SSE response headers once per request."""
+    if getattr(handler, "sse_headers_sent", False):
+        return
+    handler.send_response(200)
+    handler.send_header("Content-Type", "text/event-stream")
+    handler.send_header("Cache-Control", "no-cache")
+    handler.send_header("Connection", "keep-alive")
+    for key, value in (getattr(handler, "adapter_headers", None) or {}).items():
+        handler.send_header(key, value)
+    handler.end_headers()
+    handler.sse_headers_sent = True
+
+
+def _message_start_payload(msg_id: str, requested_model: str, incoming: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "type": "message_start",
+        "message": {
+            "id": msg_id,
+            "type": "message",
+            "role": "assistant",
+            "model": requested_model or "",
+            "metadata": incoming.get("metadata") if incoming else None,
+            "cache_control": incoming.get("cache_control") if incoming else None,
+        },
+    }
+
+
+def open_early_stream(
+    handler: BaseHTTPRequestHandler,
+    requested_model: str,
+    incoming: Optional[Dict[str, Any]],
+    logger,
+    settings: Any = None,
+) -> SSEWriter:
+    """
+    Commit the SSE response and message_start before contacting the upstream.
+
+    The returned writer is attached to the handler so the stream bridge picks
+    it up; keepalive pings start immediately to cover upstream setup time.
+    """
+    start_sse_response(handler)
+    writer = SSEWriter(handler, logger)
+    writer.send("message_start", _message_start_payload(f"msg_{uuid.uuid4().hex[:24]}", requested_model, incoming))
+    writer.flush()
+    writer.start_keepalive(_setting(settings, "sse_ping_interval", 15.0))
+    handler.sse_writer = writer
+    return writer
+
+
+def abort_stream(
+    writer: SSEWriter,
+    message: str,
+    requested_model: str = "",
+    incoming: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Report a failure as in-stream events once the SSE response was committed."""
+    writer.stop()
+    try:
+        if not writer.started:
+            writer.send("message_start", _message_start_payload("stream-error", requested_model, incoming))
+        writer.send(
+            "message_delta",
+            {
+                "type": "message_delta",
+                "delta": {"stop_reason": "error", "stop_sequence": None},
+                "usage": {"input_tokens": 0, "output_tokens": 0},
+            },
+        )
+        writer.send("error", {"type": "error", "message": message})
+        writer.send("message_stop", {"type": "message_stop"})
+        writer.flush()
+    except Exception:
+        pass
+
+
+def _bridge_writer(handler: BaseHTTPRequestHandler, logger) -> SSEWriter:
+    existing = getattr(handler, "sse_writer", None)
+    if isinstance(existing, SSEWriter):
+        return existing
+    # Kept on the handler so a retried upstream continues the same client stream.
+    writer = SSEWriter(handler, logger)
+    handler.sse_writer = writer
+    return writer
+
+
+def _setting(settings: Any, name: str, default: Any) -> Any:
+    value = getattr(settings, name, None) if settings is not None else None
+    return default if value is None else value
+
+
 def stream_openai_response(
     resp,
     requested_model: str,
     incoming: Optional[Dict[str, Any]],
     handler: BaseHTTPRequestHandler,
     logger,
+    settings: Any = None,
+    timeouts: Optional[PhaseTimeouts] = None,
+    resume: Optional[Callable[[str], Any]] = None,
 ):
-    debug_enabled = bool(logger) and logger.isEnabledFor(logging.DEBUG)
-    encoder = lambda event, data: f"event: {event}\ndata: {json.dumps(data)}\n\n".encode(
-        "utf-8"
-    )
+    """
+    Bridge OpenAI chat-completions SSE -> Anthropic SSE events.
 
-    def _send(event: str, payload: Dict[str, Any]) -> None:
-        if debug_enabled:
-            log_payload(logger, f"SSE -> {event}", payload)
-        handler.wfile.write(encoder(event, payload))
+    `resume(partial_text)` re-opens the upstream with the text streamed so far
+    as a continuation; when given, an upstream that dies mid-answer is resumed
+    into the same content blocks (STREAM_RESUME_ATTEMPTS times at most).
+    """
+    debug_enabled = bool(logger) and logger.isEnabledFor(logging.DEBUG)
+    writer = _bridge_writer(handler, logger)
+    _send = writer.send
 
-    sent_start = False
+    sent_start = writer.started
+    text_parts: List[str] = []
     text_block_open = False
     thinking_block_open = False
     thinking_index = 0
@@ -158,8 +263,59 @@ def stream_openai_response(
             )
         return tool_blocks[tool_id]
 
+    monitor = ClientMonitor(handler, resp, _setting(settings, "client_watch_interval", 0.5)).start()
+    watchdog = StallWatchdog(resp, timeouts).start()
+    writer.start_keepalive(_setting(settings, "sse_ping_interval", 15.0))
+    writer.start_relay(
+        _setting(settings, "sse_relay_buffer", 0),
+        _setting(settings, "sse_relay_policy", "block"),
+        _setting(settings, "sse_relay_stall_timeout", 60.0),
+    )
+    resume_budget = int(_setting(settings, "stream_resume_attempts", 0) or 0) if resume else 0
+
+    def _can_resume(exc: Exception) -> bool:
+        # Partial tool-call JSON cannot be continued reliably; only text answers resume.
+        return (
+            resume_budget > 0
+            and writer.committed
+            and not tool_blocks
+            and not monitor.disconnected
+            and isinstance(exc, requests.RequestException)
+        )
+
+    def _upstream_lines():
+        nonlocal resp, watchdog, resume_budget, thinking_block_open
+        while True:
+            try:
+                for line in resp.iter_lines(decode_unicode=False):
+                    yield line
+                watchdog.check()
+                return
+            except Exception as exc:
+                failure = watchdog.stalled or exc
+                if not _can_resume(failure):
+                    raise
+                resume_budget -= 1
+                partial = "".join(text_parts)
+                logger.warning(
+                    "Upstream stream interrupted after %s chars (%s); resuming", len(partial), failure
+                )
+                metrics.incr("stream.resumed")
+                watchdog.stop()
+                try:
+                    resp.close()
+                except Exception:
+                    pass
+                # A resumed answer may start a fresh reasoning phase; end the old block first.
+                close_thinking_block()
+                resp = resume(partial)
+                monitor.resp = resp
+                watchdog = StallWatchdog(resp, timeouts).start()
+
     try:
-        for line in resp.iter_lines(decode_unicode=False):
+        for line in _upstream_lines():
+            monitor.check()
+            watchdog.touch()
             if not line:
                 continue
             if line.startswith(b"data:"):
@@ -185,20 +341,7 @@ def stream_openai_response(
 
                 if not sent_start:
                     msg_id = chunk.get("id", "stream-msg")
-                    _send(
-                        "message_start",
-                        {
-                            "type": "message_start",
-                            "message": {
-                                "id": msg_id,
-                                "type": "message",
-                                "role": "assistant",
-                                "model": requested_model or "",
-                                "metadata": incoming.get("metadata") if incoming else None,
-                                "cache_control": incoming.get("cache_control") if incoming else None,
-                            },
-                        },
-                    )
+                    _send("message_start", _message_start_payload(msg_id, requested_model, incoming))
                     sent_start = True
 
                 for part in delta.get("content") or []:
@@ -206,6 +349,7 @@ def stream_openai_response(
                         text = part
                         if text:
                             output_char_count += len(text)
+                            text_parts.append(text)
                             open_text_block()
                             _send(
                                 "content_block_delta",
@@ -221,6 +365,7 @@ def stream_openai_response(
                         text = part.get("text", "")
                         if text:
                             output_char_count += len(text)
+                            text_parts.append(text)
                             open_text_block()
                             _send(
                                 "content_block_delta",
@@ -327,7 +472,7 @@ def stream_openai_response(
                         },
                     )
                     _send("message_stop", {"type": "message_stop"})
-                    handler.wfile.flush()
+                    writer.flush()
                     if debug_enabled:
                         logger.debug(
                             "Finished streaming to client (stop_reason=%s, usage=%s, output_chars=%s)",
@@ -337,8 +482,10 @@ def stream_openai_response(
                         )
                     return
 
-                handler.wfile.flush()
+                writer.flush()
 
+        monitor.check()
+        watchdog.check()
         close_text_block()
         close_thinking_block()
         for tid, (idx, _) in tool_blocks.items():
@@ -358,28 +505,28 @@ def stream_openai_response(
             },
         )
         _send("message_stop", {"type": "message_stop"})
-        handler.wfile.flush()
+        writer.flush()
+    except ClientDisconnected:
+        logger.info("Client disconnected during stream; upstream closed")
+        handler.close_connection = True
     except (BrokenPipeError, ConnectionResetError):
         logger.info("Client disconnected during stream")
         handler.close_connection = True
     except Exception as exc:
+        if monitor.disconnected:
+            # Reading failed because the monitor shut the upstream down.
+            logger.info("Client disconnected during stream; upstream closed")
+            handler.close_connection = True
+            return
+        if watchdog.stalled is not None:
+            exc = watchdog.stalled
+        if not writer.committed and isinstance(exc, requests.RequestException):
+            # Nothing reached the client yet; let the caller retry the upstream.
+            raise exc
         logger.exception("Error while streaming to client: %s", exc)
         try:
             if not sent_start:
-                _send(
-                    "message_start",
-                    {
-                        "type": "message_start",
-                        "message": {
-                            "id": "stream-error",
-                            "type": "message",
-                            "role": "assistant",
-                            "model": requested_model or "",
-                            "metadata": incoming.get("metadata") if incoming else None,
-                            "cache_control": incoming.get("cache_control") if incoming else None,
-                        },
-                    },
-                )
+                _send("message_start", _message_start_payload("stream-error", requested_model, incoming))
                 sent_start = True
 
             close_text_block()
@@ -410,7 +557,7 @@ def stream_openai_response(
                 },
             )
             _send("message_stop", {"type": "message_stop"})
-            handler.wfile.flush()
+            writer.flush()
         except Exception:
             pass
         handler.close_connection = True
@@ -428,6 +575,10 @@ def stream_openai_response(
                 output_char_count,
             )
     finally:
+        writer.stop()
+        writer.close_relay()
+        monitor.stop()
+        watchdog.stop()
         try:
             resp.close()
         except Exception:
@@ -440,19 +591,15 @@ def stream_responses_response(
     incoming: Optional[Dict[str, Any]],
     handler: BaseHTTPRequestHandler,
     logger,
+    settings: Any = None,
+    timeouts: Optional[PhaseTimeouts] = None,
 ):
     """Bridge OpenAI Responses API SSE -> Anthropic SSE events."""
     debug_enabled = bool(logger) and logger.isEnabledFor(logging.DEBUG)
-    encoder = lambda event, data: f"event: {event}\ndata: {json.dumps(data)}\n\n".encode(
-        "utf-8"
-    )
-
-    def _send(event: str, payload: Dict[str, Any]) -> None:
-        if debug_enabled:
-            log_payload(logger, f"SSE -> {event}", payload)
-        handler.wfile.write(encoder(event, payload))
+    writer = _bridge_writer(handler, logger)
+    _send = writer.send
 
-    sent_start = False
+    sent_start = writer.started
     text_block_open = False
     thinking_block_open = False
     thinking_index = 0
@@ -463,6 +610,14 @@ def stream_responses_response(
     next_index = 0
     usage_state = {"input_tokens": 0, "output_tokens": 0, "cache_read_input_tokens": 0}
     output_char_count = 0
+    file_cache = FileContentCache()
+    # Tool names Claude Code declared verbatim need no remapping, so their
+    # argument deltas can be forwarded live instead of buffered until done.
+    passthrough_tool_names = {
+        str(tool.get("name"))
+        for tool in ((incoming or {}).get("tools") or [])
+        if isinstance(tool, dict) and tool.get("name")
+    }
 
     def _normalize_function_call_arguments(value: Any) -> Optional[str]:
         if value is None:
@@ -524,6 +679,23 @@ def stream_responses_response(
             )
             thinking_block_open = False
 
+    def _emit_reasoning_signature(item: Dict[str, Any]) -> None:
+        # Carry the encrypted reasoning item in the thinking signature so the next
+        # request can replay it (the backend runs with store=false).
+        signature = encode_reasoning_signature(item)
+        if not signature:
+            return
+        open_thinking_block()
+        _send(
+            "content_block_delta",
+            {
+                "type": "content_block_delta",
+                "index": thinking_index,
+                "delta": {"type": "signature_delta", "signature": signature},
+            },
+        )
+        close_thinking_block()
+
     def get_tool_block(call_id: str, name: str) -> Tuple[int, list]:
         nonlocal next_index
         if call_id not in tool_blocks:
@@ -545,11 +717,54 @@ def stream_responses_response(
             )
         return tool_blocks[call_id]
 
+    def _send_tool_delta(idx: int, partial_json: str) -> None:
+        _send(
+            "content_block_delta",
+            {
+                "type": "content_block_delta",
+                "index": idx,
+                "delta": {"type": "input_json_delta", "partial_json": partial_json},
+            },
+        )
+
+    def _start_live_tool_call(call_id: str) -> None:
+        info = pending_calls[call_id]
+        info["live"] = True
+        info["streamed"] = []
+        get_tool_block(call_id, str(info.get("name") or "tool"))
+
+    def _stream_live_delta(call_id: str, delta: str) -> None:
+        info = pending_calls[call_id]
+        idx, buffer = get_tool_block(call_id, str(info.get("name") or "tool"))
+        info["streamed"].append(delta)
+        buffer.append(delta)
+        _send_tool_delta(idx, delta)
+
+    def _finish_live_tool_call(call_id: str, info: Dict[str, Any]) -> None:
+        idx, buffer = get_tool_block(call_id, str(info.get("name") or "tool"))
+        streamed = "".join(info.get("streamed") or [])
+        final = info.get("arguments")
+        if final is None:
+            if not streamed:
+                buffer[:] = ["{}"]
+                _send_tool_delta(idx, "{}")
+            return
+        if final.startswith(streamed):
+            remainder = final[len(streamed) :]
+            if remainder:
+                buffer.append(remainder)
+                _send_tool_delta(idx, remainder)
+        else:
+            logger.warning("Final arguments for tool call %s diverged from streamed deltas", call_id)
+
     def _emit_pending_tool_call(call_id: str) -> None:
         info = pending_calls.get(call_id)
         if not isinstance(info, dict) or info.get("emitted"):
             return
         info["emitted"] = True
+        if info.get("live"):
+            _finish_live_tool_call(call_id, info)
+            return
 
         name = str(info.get("name") or "tool")
         arguments = info.get("arguments")
@@ -566,6 +781,7 @@ def stream_responses_response(
                 name=name,
                 arguments=arguments,
                 incoming=incoming,
+                file_cache=file_cache,
             )
         except Exception:
             remapped = None
@@ -603,20 +819,7 @@ def stream_responses_response(
         response_id = event_obj.get("response_id")
         response = event_obj.get("response") if isinstance(event_obj.get("response"), dict) else None
         msg_id = response_id or (response.get("id") if response else None) or "stream-msg"
-        _send(
-            "message_start",
-            {
-                "type": "message_start",
-                "message": {
-                    "id": msg_id,
-                    "type": "message",
-                    "role": "assistant",
-                    "model": requested_model or "",
-                    "metadata": incoming.get("metadata") if incoming else None,
-                    "cache_control": incoming.get("cache_control") if incoming else None,
-                },
-            },
-        )
+        _send("message_start", _message_start_payload(msg_id, requested_model, incoming))
         sent_start = True
 
     def _ingest_usage(event_obj: Dict[str, Any]) -> None:
@@ -634,9 +837,25 @@ def stream_responses_response(
             usage_state["output_tokens"] = usage.get("output_tokens") or 0
         if "cache_read_input_tokens" in usage:
             usage_state["cache_read_input_tokens"] = usage.get("cache_read_input_tokens") or 0
+        details = usage.get("input_tokens_details")
+        cached = details.get("cached_tokens") if isinstance(details, dict) else None
+        if isinstance(cached, int) and cached > 0:
+            # Responses input_tokens include cached tokens; Anthropic reports them separately.
+            usage_state["cache_read_input_tokens"] = cached
+            usage_state["input_tokens"] = max(0, int(usage_state.get("input_tokens") or 0) - cached)
 
+    monitor = ClientMonitor(handler, resp, _setting(settings, "client_watch_interval", 0.5)).start()
+    watchdog = StallWatchdog(resp, timeouts).start()
+    writer.start_keepalive(_setting(settings, "sse_ping_interval", 15.0))
+    writer.start_relay(
+        _setting(settings, "sse_relay_buffer", 0),
+        _setting(settings, "sse_relay_policy", "block"),
+        _setting(settings, "sse_relay_stall_timeout", 60.0),
+    )
     try:
         for line in resp.iter_lines(decode_unicode=False):
+            monitor.check()
+            watchdog.touch()
             if not line:
                 continue
             if not line.startswith(b"data:"):
@@ -694,6 +913,8 @@ def stream_responses_response(
                         "arguments": _normalize_function_call_arguments(item.get("arguments")),
                         "emitted": False,
                     }
+                    if str(name) in passthrough_tool_names:
+                        _start_live_tool_call(str(call_id))
                     if pending_calls[str(call_id)]["arguments"] is not None:
                         _emit_pending_tool_call(str(call_id))
             elif etype == "response.function_call_arguments.delta":
@@ -703,9 +924,13 @@ def stream_responses_response(
                     call_id = item_id_to_call_id.get(item_id) or item_id or "tool_call"
                     if call_id not in pending_calls:
                         pending_calls[call_id] = {"name": "tool", "args_parts": [], "arguments": None, "emitted": False}
-                    parts = pending_calls[call_id].setdefault("args_parts", [])
-                    if isinstance(parts, list):
-                        parts.append(str(delta))
+                    if pending_calls[call_id].get("live"):
+                        if not pending_calls[call_id].get("emitted"):
+                            _stream_live_delta(call_id, str(delta))
+                    else:
+                        parts = pending_calls[call_id].setdefault("args_parts", [])
+                        if isinstance(parts, list):
+                            parts.append(str(delta))
             elif etype == "response.function_call_arguments.done":
                 item_id = str(event_obj.get("item_id") or "")
                 call_id = item_id_to_call_id.get(item_id) or item_id or "tool_call"
@@ -715,7 +940,9 @@ def stream_responses_response(
                 _emit_pending_tool_call(call_id)
             elif etype == "response.output_item.done":
                 item = event_obj.get("item") or {}
-                if isinstance(item, dict) and item.get("type") == "function_call":
+                if isinstance(item, dict) and item.get("type") == "reasoning":
+                    _emit_reasoning_signature(item)
+                elif isinstance(item, dict) and item.get("type") == "function_call":
                     item_id = str(item.get("id") or "")
                     call_id = str(item.get("call_id") or item_id_to_call_id.get(item_id) or item_id or "tool_call")
                     item_id_to_call_id[item_id] = call_id
@@ -749,13 +976,15 @@ def stream_responses_response(
                     },
                 )
                 _send("message_stop", {"type": "message_stop"})
-                handler.wfile.flush()
+                writer.flush()
                 return
             elif etype == "error":
                 raise RuntimeError(str(event_obj.get("message") or event_obj.get("error") or "Unknown error"))
 
-            handler.wfile.flush()
+            writer.flush()
 
+        monitor.check()
+        watchdog.check()
         close_text_block()
         close_thinking_block()
         for _, (idx, _) in tool_blocks.items():
@@ -773,28 +1002,28 @@ def stream_responses_response(
             },
         )
         _send("message_stop", {"type": "message_stop"})
-        handler.wfile.flush()
+        writer.flush()
+    except ClientDisconnected:
+        logger.info("Client disconnected during stream; upstream closed")
+        handler.close_connection = True
     except (BrokenPipeError, ConnectionResetError):
         logger.info("Client disconnected during stream")
         handler.close_connection = True
     except Exception as exc:
+        if monitor.disconnected:
+            # Reading failed because the monitor shut the upstream down.
+            logger.info("Client disconnected during stream; upstream closed")
+            handler.close_connection = True
+            return
+        if watchdog.stalled is not None:
+            exc = watchdog.stalled
+        if not writer.committed and isinstance(exc, requests.RequestException):
+            # Nothing reached the client yet; let the caller retry the upstream.
+            raise exc
         logger.exception("Error while streaming to client: %s", exc)
         try:
             if not sent_start:
-                _send(
-                    "message_start",
-                    {
-                        "type": "message_start",
-                        "message": {
-                            "id": "stream-error",
-                            "type": "message",
-                            "role": "assistant",
-                            "model": requested_model or "",
-                            "metadata": incoming.get("metadata") if incoming else None,
-                            "cache_control": incoming.get("cache_control") if incoming else None,
-                        },
-                    },
-                )
+                _send("message_start", _message_start_payload("stream-error", requested_model, incoming))
                 sent_start = True
 
             close_text_block()
@@ -814,11 +1043,15 @@ def stream_responses_response(
             )
             _send("error", {"type": "error", "message": str(exc)})
             _send("message_stop", {"type": "message_stop"})
-            handler.wfile.flush()
+            writer.flush()
         except Exception:
             pass
         handler.close_connection = True
     finally:
+        writer.stop()
+        writer.close_relay()
+        monitor.stop()
+        watchdog.stop()
         try:
             resp.close()
         except Exception:
@@ -0,0 +1,179 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import requests
+
+from . import metrics
+from .client_monitor import shutdown_upstream
+
+logger = logging.getLogger(__name__)
+
+PHASES = ("connect", "first_byte", "idle", "response")
+
+# Relative deadlines (seconds) a client may send; the Anthropic SDKs send
+# X-Stainless-Timeout with the request timeout they will enforce themselves.
+DEADLINE_HEADERS = ("x-cc-adapter-timeout", "x-stainless-timeout")
+
+
+class UpstreamStalled(requests.Timeout):
+    """Raised when an upstream stream misses its first-byte, idle or deadline budget."""
+
+    def __init__(self, phase: str, seconds: float):
+        super().__init__(f"Upstream stalled: no data within {seconds:g}s ({phase} timeout)")
+        self.phase = phase
+        self.seconds = seconds
+
+
+@dataclass(frozen=True)
+class PhaseTimeouts:
+    connect: float
+    first_byte: float
+    idle: float
+    deadline: float = 0.0  # time.monotonic() value; 0 means no client deadline
+    response: float = 0.0  # whole-body budget for non-streaming calls
+
+    def remaining(self) -> Optional[float]:
+        if not self.deadline:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def _capped(self, value: float) -> float:
+        remaining = self.remaining()
+        if remaining is None:
+            return value
+        return max(0.001, min(value, remaining))
+
+    def request_timeout(self, stream: bool = False) -> Tuple[float, float]:
+        """
+        (connect, read) tuple for `requests`.
+
+        The read timeout applies to every socket read. Streams keep it at the
+        larger phase budget and leave the precise first-byte/idle split to
+        `StallWatchdog`. Non-streaming calls send nothing until the whole
+        answer is generated, so they also get the `response` budget.
+        """
+        read = max(self.first_byte, self.idle) if stream else max(self.first_byte, self.response)
+        return self._capped(self.connect), self._capped(read)
+
+
+def _parse_overrides(spec: str) -> Dict[Tuple[str, str], float]:
+    """
+    Parse "connect=5,lmstudio.first_byte=1800,poe.idle=120".
+
+    Keys without a provider prefix apply to every provider.
+    """
+    overrides: Dict[Tuple[str, str], float] = {}
+    for raw in (spec or "").split(","):
+        key, sep, value = raw.partition("=")
+        if not sep:
+            continue
+        provider, _, phase = key.strip().lower().rpartition(".")
+        if phase not in PHASES:
+            logger.warning("Ignoring unknown upstream timeout phase: %s", key.strip())
+            continue
+        try:
+            overrides[(provider, phase)] = float(value)
+        except ValueError:
+            logger.warning("Ignoring invalid upstream timeout value: %s", raw.strip())
+    return overrides
+
+
+def for_provider(settings: Any, provider: str) -> PhaseTimeouts:
+    values = {
+        "connect": float(settings.upstream_connect_timeout),
+        "first_byte": float(settings.upstream_first_byte_timeout),
+        "idle": float(settings.upstream_idle_timeout),
+        "response": float(settings.upstream_response_timeout or settings.lmstudio_timeout),
+    }
+    if provider == "lmstudio":
+        # Local prompt processing of long contexts can legitimately take a while.
+        values["first_byte"] = max(values["first_byte"], float(settings.lmstudio_timeout))
+    overrides = _parse_overrides(getattr(settings, "upstream_timeouts", ""))
+    for phase in PHASES:
+        for scope in ("", provider):
+            if (scope, phase) in overrides:
+                values[phase] = overrides[(scope, phase)]
+    return PhaseTimeouts(deadline=float(getattr(settings, "request_deadline", 0.0) or 0.0), **values)
+
+
+def deadline_from_headers(headers: Mapping[str, str], now: Optional[float] = None) -> float:
+    """Monotonic deadline from a client timeout header, or 0.0 when absent/invalid."""
+    for name in DEADLINE_HEADERS:
+        raw = headers.get(name)
+        if not raw:
+            continue
+        try:
+            seconds = float(raw)
+        except ValueError:
+            continue
+        if seconds > 0:
+            return (now if now is not None else time.monotonic()) + seconds
+    return 0.0
+
+
+class StallWatchdog:
+    """
+    Abort an upstream stream that misses its first-byte or inter-chunk budget.
+
+    The bridge calls `touch()` for every line it reads; when a budget expires
+    the upstream socket is shut down so the blocked read returns, and `check()`
+    raises `UpstreamStalled` in the bridge thread.
+    """
+
+    def __init__(self, resp: Any, timeouts: Optional[PhaseTimeouts]):
+        self.resp = resp
+        self.timeouts = timeouts
+        self.stalled: Optional[UpstreamStalled] = None
+        self._first_seen = False
+        self._last = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "StallWatchdog":
+        if self.timeouts is None:
+            return self
+        self._thread = threading.Thread(target=self._run, name="cc-adapter-stall-watchdog", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def touch(self) -> None:
+        self._first_seen = True
+        self._last = time.monotonic()
+
+    def check(self) -> None:
+        if self.stalled is not None:
+            raise self.stalled
+
+    def _budget(self) -> Tuple[str, float, float]:
+        assert self.timeouts is not None
+        phase, seconds = ("idle", self.timeouts.idle) if self._first_seen else ("first_byte", self.timeouts.first_byte)
+        expires = self._last + seconds if seconds > 0 else float("inf")
+        deadline = self.timeouts.deadline
+        if deadline and deadline < expires:
+            return "deadline", max(0.0, deadline - self._last), deadline
+        return phase, seconds, expires
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            phase, seconds, expires = self._budget()
+            wait = expires - time.monotonic()
+            if wait > 0:
+                # touch() may move the budget (or switch to the idle phase), so
+                # wake at least once per idle period to re-evaluate.
+                if self.timeouts.idle > 0:
+                    wait = min(wait, self.timeouts.idle)
+                self._stop.wait(None if wait == float("inf") else wait)
+                continue
+            if self._stop.is_set():
+                return
+            self.stalled = UpstreamStalled(phase, seconds)
+            metrics.incr(f"upstream.stalled.{phase}")
+            logger.warning("%s; aborting upstream read", self.stalled)
+            shutdown_upstream(self.resp)
+            return
@@ -0,0 +1,30 @@
+import io
+import json
+
+from cc_adapter import server
+from cc_adapter.config import Settings
+
+
+class RecordingHandler(server.AdapterHandler):
+    """AdapterHandler fed one /v1/messages body in memory; records status, headers and output."""
+
+    def __init__(self, settings: Settings, body: dict, address="127.0.0.1"):
+        raw = json.dumps(body).encode("utf-8")
+        self.settings = settings
+        self.path = "/v1/messages"
+        self.headers = {"Content-Length": str(len(raw))}
+        self.rfile = io.BytesIO(raw)
+        self.wfile = io.BytesIO()
+        self.client_address = (address, 0)
+        self.close_connection = False
+        self.status = None
+        self.sent_headers = {}
+
+    def send_response(self, status):
+        self.status = status
+
+    def send_header(self, key, value):
+        self.sent_headers[key] = value
+
+    def end_headers(self):
+        return
@@ -0,0 +1,85 @@
+import logging
+import os
+import time
+import unittest
+from typing import List, Optional
+
+from cc_adapter import codex_tool_remap
+
+FILE_LINES = 10_000
+HUNKS = 50
+RUN_BENCHMARKS = os.environ.get("RUN_BENCHMARKS") == "1"
+
+logger = logging.getLogger(__name__)
+
+
+def _legacy_find_subsequence(haystack: List[str], needle: List[str]) -> Optional[int]:
+    # Pre-index implementation kept here as the benchmark baseline.
+    if not needle:
+        return 0
+    for start in range(0, len(haystack) - len(needle) + 1):
+        if haystack[start : start + len(needle)] == needle:
+            return start
+    return None
+
+
+def _legacy_apply(original: str, hunks: List[List[str]]) -> str:
+    out_lines = original.splitlines()
+    for hunk in hunks:
+        old_seq = [ln[1:] for ln in hunk if ln[0] in (" ", "-")]
+        new_seq = [ln[1:] for ln in hunk if ln[0] in (" ", "+")]
+        pos = _legacy_find_subsequence(out_lines, old_seq)
+        if pos is None:
+            raise ValueError("legacy baseline could not place hunk")
+        out_lines = out_lines[:pos] + new_seq + out_lines[pos + len(old_seq) :]
+    return "\n".join(out_lines) + "\n"
+
+
+def _patch():
+    lines = [f"    value_{i} = compute({i % 97}, {i})" for i in range(FILE_LINES)]
+    hunks: List[List[str]] = []
+    step = FILE_LINES // HUNKS
+    for h in range(HUNKS):
+        at = h * step + step // 2
+        hunks.append(
+            [
+                " " + lines[at - 2],
+                " " + lines[at - 1],
+                "-" + lines[at],
+                "+" + lines[at].replace("compute", "compute_fast"),
+                " " + lines[at + 1],
+            ]
+        )
+    patch_lines: List[str] = []
+    for hunk in hunks:
+        patch_lines.append("@@")
+        patch_lines.extend(hunk)
+    return "\n".join(lines) + "\n", hunks, patch_lines
+
+
+@unittest.skipUnless(RUN_BENCHMARKS, "Set RUN_BENCHMARKS=1 to run apply_patch remap benchmarks")
+class ApplyPatchBenchmarkTestCase(unittest.TestCase):
+    def test_apply_patch_10k_lines(self):
+        original, hunks, patch_lines = _patch()
+
+        started = time.perf_counter()
+        legacy = _legacy_apply(original, hunks)
+        legacy_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        indexed = codex_tool_remap._apply_patch_lines_to_text(original, patch_lines)
+        indexed_elapsed = time.perf_counter() - started
+
+        logger.warning(
+            "apply_patch %d lines x %d hunks: legacy=%.1fms indexed=%.1fms speedup=%.1fx",
+            FILE_LINES,
+            HUNKS,
+            legacy_elapsed * 1000,
+            indexed_elapsed * 1000,
+            legacy_elapsed / max(indexed_elapsed, 1e-9),
+        )
+        self.assertEqual(indexed, legacy)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from cc_adapter import affinity, backend_pool, metrics
+from cc_adapter.config import Settings
+from cc_adapter.providers import lmstudio
+
+SPEC = "http://gpu1:1234/v1/chat/completions*3, http://gpu2:1234/v1/chat/completions"
+GPU1 = "http://gpu1:1234/v1/chat/completions"
+GPU2 = "http://gpu2:1234/v1/chat/completions"
+
+
+def _payload(first_user: str, *later: str):
+    messages = [{"role": "system", "content": "You are helpful."}, {"role": "user", "content": first_user}]
+    for text in later:
+        messages.append({"role": "assistant", "content": "ok"})
+        messages.append({"role": "user", "content": text})
+    return {"model": "qwen3", "messages": messages}
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+    text = ""
+
+    def raise_for_status(self):
+        return
+
+    def json(self):
+        return {"choices": [{"message": {"role": "assistant", "content": "hi"}, "finish_reason": "stop"}]}
+
+
+class BackendPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        backend_pool.REGISTRY.reset()
+
+    def test_parse_backends(self):
+        self.assertEqual(backend_pool.parse_backends(SPEC), [(GPU1, 3), (GPU2, 1)])
+        self.assertEqual(backend_pool.parse_backends("", "http://local/v1"), [("http://local/v1", 1)])
+        self.assertEqual(backend_pool.parse_backends("http://a/v1*x, http://b/v1*0"), [])
+
+    def test_least_outstanding_respects_weights(self):
+        pool = backend_pool.BackendPool(backend_pool.parse_backends(SPEC))
+        picked = [pool.acquire().url for _ in range(4)]
+        self.assertEqual(picked.count(GPU1), 3)
+        self.assertEqual(picked.count(GPU2), 1)
+
+    def test_conversation_sticks_to_its_backend(self):
+        pool = backend_pool.BackendPool(backend_pool.parse_backends(SPEC))
+        first = pool.acquire(affinity.conversation_key(_payload("fix the bug")))
+        for _ in range(5):
+            pool.acquire()
+        later = affinity.conversation_key(_payload("fix the bug", "now add a test"))
+        self.assertIs(pool.acquire(later), first)
+        self.assertEqual(metrics.REGISTRY.get("lmstudio_pool.sticky"), 1)
+
+    def test_failing_backend_is_ejected_then_readmitted(self):
+        pool = backend_pool.BackendPool(backend_pool.parse_backends(SPEC), eject_failures=2, eject_seconds=0.05)
+        gpu1 = pool.backends[0]
+        for _ in range(2):
+            with self.assertRaises(requests.ConnectionError):
+                with pool.lease() as lease:
+                    self.assertEqual(lease.url, GPU1)
+                    raise requests.ConnectionError("refused")
+        self.assertFalse(gpu1.healthy(time.monotonic()))
+        self.assertEqual(pool.acquire().url, GPU2)
+        self.assertEqual(metrics.REGISTRY.get("lmstudio_pool.ejected"), 1)
+        time.sleep(0.06)
+        self.assertEqual(pool.acquire().url, GPU1)
+
+    def test_ejected_backend_returns_only_after_a_health_check_passes(self):
+        pool = backend_pool.BackendPool(
+            backend_pool.parse_backends(SPEC), eject_failures=1, eject_seconds=0.05, health_interval=60
+        )
+        gpu1 = pool.backends[0]
+        with self.assertRaises(requests.ConnectionError):
+            with pool.lease():
+                raise requests.ConnectionError("refused")
+        time.sleep(0.06)
+        self.assertFalse(gpu1.healthy(time.monotonic()))
+
+        with mock.patch.object(backend_pool.requests, "get", side_effect=requests.ConnectionError("down")) as get:
+            self.assertFalse(pool.check(gpu1))
+        self.assertEqual(get.call_args[0][0], "http://gpu1:1234/v1/models")
+        self.assertGreater(gpu1.ejected_until, time.monotonic())
+        self.assertEqual(metrics.REGISTRY.get("lmstudio_pool.health_failed"), 1)
+
+        time.sleep(0.06)
+        with mock.patch.object(backend_pool.requests, "get", return_value=mock.Mock()) as get:
+            self.assertEqual(pool.acquire().url, GPU2)
+            deadline = time.monotonic() + 2
+            while not gpu1.healthy(time.monotonic()) and time.monotonic() < deadline:
+                time.sleep(0.005)
+        get.assert_called_once()
+        self.assertEqual(pool.acquire().url, GPU1)
+        self.assertEqual(metrics.REGISTRY.get("lmstudio_pool.readmitted"), 1)
+
+    def test_idle_backend_failing_its_health_check_is_ejected(self):
+        pool = backend_pool.BackendPool(backend_pool.parse_backends(SPEC), health_interval=60)
+        gpu2 = pool.backends[1]
+        gpu2.last_ok -= 120
+        with mock.patch.object(backend_pool.requests, "get", side_effect=requests.ConnectionError("down")):
+            pool.acquire()
+            deadline = time.monotonic() + 2
+            while gpu2.checking and time.monotonic() < deadline:
+                time.sleep(0.005)
+        self.assertFalse(gpu2.healthy(time.monotonic()))
+        self.assertEqual(pool.snapshot()[GPU2]["checks_failed"], 1)
+
+    def test_client_errors_do_not_eject(self):
+        pool = backend_pool.BackendPool([(GPU1, 1)], eject_failures=1)
+        bad_request = requests.HTTPError("400", response=mock.Mock(status_code=400))
+        with self.assertRaises(requests.HTTPError):
+            with pool.lease():
+                raise bad_request
+        self.assertEqual(pool.snapshot()[GPU1]["failures"], 0)
+
+    def test_send_dispatches_through_the_pool(self):
+        settings = Settings(lmstudio_backends=SPEC)
+        with mock.patch.object(lmstudio.requests, "post", return_value=FakeResponse()) as post:
+            lmstudio.send(_payload("hello"), settings)
+            lmstudio.send(_payload("another conversation"), settings)
+
+        self.assertEqual([call.args[0] for call in post.call_args_list], [GPU1, GPU1])
+        stats = backend_pool.snapshot()
+        self.assertEqual(stats[GPU1]["requests"], 2)
+        self.assertEqual(stats[GPU1]["inflight"], 0)
+        self.assertEqual(stats[GPU2]["requests"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from cc_adapter import breaker, metrics
+from cc_adapter.config import Settings
+
+
+def _settings(**overrides):
+    values = dict(
+        breaker_failure_threshold=2,
+        breaker_reset_timeout=60,
+        breaker_half_open_probes=2,
+    )
+    values.update(overrides)
+    return Settings(**values)
+
+
+def _fail():
+    raise requests.ConnectionError("refused")
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        breaker.REGISTRY.reset()
+
+    def _trip(self, circuit):
+        for _ in range(circuit.failure_threshold):
+            with self.assertRaises(requests.ConnectionError):
+                circuit.call(_fail)
+
+    def test_opens_after_consecutive_failures_and_fails_fast(self):
+        circuit = breaker.for_provider(_settings(), "openrouter")
+        self._trip(circuit)
+        self.assertEqual(circuit.state, breaker.OPEN)
+
+        called = []
+        with self.assertRaises(breaker.CircuitOpen):
+            circuit.call(lambda: called.append(1))
+        self.assertEqual(called, [])
+        self.assertEqual(metrics.REGISTRY.get("breaker.opened.openrouter"), 1)
+        self.assertEqual(metrics.REGISTRY.get("breaker.rejected.openrouter"), 1)
+
+    def test_client_errors_do_not_count(self):
+        circuit = breaker.for_provider(_settings(), "openrouter")
+        resp = requests.Response()
+        resp.status_code = 400
+        for _ in range(3):
+            with self.assertRaises(requests.HTTPError):
+                circuit.call(mock.Mock(side_effect=requests.HTTPError("bad", response=resp)))
+        self.assertEqual(circuit.state, breaker.CLOSED)
+
+    def test_half_open_probes_close_the_breaker(self):
+        circuit = breaker.for_provider(_settings(), "openrouter")
+        self._trip(circuit)
+        circuit.opened_at = time.monotonic() - 61
+
+        self.assertTrue(circuit.allow())
+        self.assertTrue(circuit.allow())
+        self.assertFalse(circuit.allow())
+        circuit.record_success(0.1)
+        self.assertEqual(circuit.state, breaker.HALF_OPEN)
+        circuit.record_success(0.1)
+        self.assertEqual(circuit.state, breaker.CLOSED)
+
+    def test_failed_probe_reopens(self):
+        circuit = breaker.for_provider(_settings(), "openrouter")
+        self._trip(circuit)
+        circuit.opened_at = time.monotonic() - 61
+        with self.assertRaises(requests.ConnectionError):
+            circuit.call(_fail)
+        self.assertEqual(circuit.state, breaker.OPEN)
+
+    def test_latency_spikes_trip(self):
+        circuit = breaker.for_provider(_settings(breaker_latency_threshold=1.0), "lmstudio")
+        start = time.monotonic()
+        for _ in range(2):
+            circuit.call(lambda: "ok", first_byte=lambda: start + 5)
+        self.assertEqual(circuit.state, breaker.OPEN)
+        self.assertEqual(metrics.REGISTRY.get("breaker.slow.lmstudio"), 2)
+
+    def test_breakers_are_keyed_by_base_url(self):
+        first = breaker.for_provider(_settings(lmstudio_base="http://a:1234/v1"), "lmstudio")
+        second = breaker.for_provider(_settings(lmstudio_base="http://b:1234/v1"), "lmstudio")
+        self.assertIsNot(first, second)
+        self.assertEqual(set(breaker.snapshot()), {"lmstudio http://a:1234/v1", "lmstudio http://b:1234/v1"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import logging
+import socket
+import threading
+import unittest
+from unittest import mock
+
+from cc_adapter import client_monitor, metrics, streaming
+from cc_adapter.config import Settings
+
+
+class BlockingResponse:
+    """Upstream that emits one chunk, then stalls until closed."""
+
+    def __init__(self):
+        self.headers = {}
+        self.closed = threading.Event()
+
+    def iter_lines(self, decode_unicode=False):
+        yield b'data: {"choices": [{"delta": {"content": "hello"}}]}'
+        self.closed.wait(5)
+
+    def close(self):
+        self.closed.set()
+
+
+class SocketHandler:
+    def __init__(self, connection):
+        self.connection = connection
+        self.buffer = b""
+        self.close_connection = False
+        self.wfile = self
+
+    def write(self, data: bytes):
+        self.buffer += data
+
+    def flush(self):
+        return
+
+
+class ClientMonitorTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        self.server_sock, self.client_sock = socket.socketpair()
+
+    def tearDown(self):
+        self.server_sock.close()
+        self.client_sock.close()
+
+    def test_client_eof_cancels_upstream_stream(self):
+        handler = SocketHandler(self.server_sock)
+        resp = BlockingResponse()
+        logger = logging.getLogger("client-monitor-test")
+        logger.setLevel(logging.CRITICAL)
+        threading.Timer(0.1, self.client_sock.close).start()
+
+        streaming.stream_openai_response(
+            resp, "poe:deepseek-v3.2", {}, handler, logger, Settings(client_watch_interval=0.05)
+        )
+
+        self.assertTrue(resp.closed.is_set())
+        self.assertTrue(handler.close_connection)
+        self.assertEqual(metrics.REGISTRY.get("stream.client_cancelled"), 1)
+        self.assertNotIn(b"event: error", handler.buffer)
+
+    def test_monitor_disabled_when_interval_zero(self):
+        handler = SocketHandler(self.server_sock)
+        resp = BlockingResponse()
+        resp.close()
+        logger = logging.getLogger("client-monitor-off-test")
+        logger.setLevel(logging.CRITICAL)
+
+        streaming.stream_openai_response(resp, "poe:deepseek-v3.2", {}, handler, logger, Settings(client_watch_interval=0))
+
+        self.assertIn(b"message_stop", handler.buffer)
+        self.assertEqual(metrics.REGISTRY.get("stream.client_cancelled"), 0)
+
+    def test_probe_errors_do_not_count_as_disconnects(self):
+        resp = BlockingResponse()
+        monitor = client_monitor.ClientMonitor(SocketHandler(self.server_sock), resp, interval=0.01)
+        selector = mock.Mock()
+        selector.select.side_effect = ValueError("filedescriptor out of range in select()")
+
+        self.assertFalse(monitor._client_gone(selector, self.server_sock))
+        self.assertFalse(monitor.disconnected)
+        self.assertFalse(resp.closed.is_set())
+
+
+if __name__ == "__main__":
+    unittest.main()
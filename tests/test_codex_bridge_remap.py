@@ -4,6 +4,7 @@ import unittest
 from pathlib import Path
 from unittest import mock
 
+from cc_adapter import codex_tool_remap
 from cc_adapter.config import Settings
 from cc_adapter.converters import openai_to_anthropic
 from cc_adapter.providers import codex
@@ -145,6 +146,89 @@ class CodexToolRemapTestCase(unittest.TestCase):
             self.assertEqual(tool_blocks[0]["input"]["content"], "hi\n")
 
 
+class ApplyPatchLocatorTestCase(unittest.TestCase):
+    def test_hunks_resolve_after_previous_hunk(self):
+        original = "x = 1\nreturn x\nx = 1\nreturn x\n"
+        patched = codex_tool_remap._apply_patch_lines_to_text(
+            original,
+            ["@@", "-x = 1", "+x = 2", "@@", " return x", "-x = 1", "+x = 3"],
+        )
+        self.assertEqual(patched, "x = 2\nreturn x\nx = 3\nreturn x\n")
+
+    def test_hunk_context_matches_with_whitespace_drift(self):
+        original = "def f():\n    a = 1   \n    return a\n"
+        patched = codex_tool_remap._apply_patch_lines_to_text(
+            original,
+            ["@@", " def f():", "-  a = 1", "+    a = 2", "     return a"],
+        )
+        self.assertEqual(patched, "def f():\n    a = 2\n    return a\n")
+
+    def test_hunk_context_may_include_lines_from_an_earlier_hunk(self):
+        original = "a\nb\nc\n"
+        patched = codex_tool_remap._apply_patch_lines_to_text(
+            original,
+            ["@@", " a", "+inserted", " b", "@@", " inserted", "-b", "+B"],
+        )
+        self.assertEqual(patched, "a\ninserted\nB\nc\n")
+
+    def test_missing_context_raises(self):
+        with self.assertRaises(ValueError):
+            codex_tool_remap._apply_patch_lines_to_text("a\n", ["@@", "-b", "+c"])
+
+    def test_file_cache_revalidates_on_change_and_remembers_patches(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            target = Path(tmp) / "f.txt"
+            target.write_text("one\n", encoding="utf-8")
+            cache = codex_tool_remap.FileContentCache()
+            self.assertEqual(cache.read_text(target), "one\n")
+
+            cache.remember(target, "patched\n")
+            self.assertEqual(cache.read_text(target), "patched\n")
+
+            target.write_text("changed on disk\n", encoding="utf-8")
+            self.assertEqual(cache.read_text(target), "changed on disk\n")
+
+    def test_sequential_apply_patch_calls_share_file_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            base = Path(tmp)
+            (base / "a.txt").write_text("alpha\nbeta\n", encoding="utf-8")
+            incoming = {
+                "system": f"Working directory: {base}",
+                "tools": [
+                    {
+                        "name": "Write",
+                        "input_schema": {
+                            "type": "object",
+                            "properties": {"file_path": {"type": "string"}, "content": {"type": "string"}},
+                        },
+                    }
+                ],
+            }
+            cache = codex_tool_remap.FileContentCache()
+
+            def patch(old: str, new: str) -> str:
+                return "\n".join(
+                    ["*** Begin Patch", "*** Update File: a.txt", "@@", f"-{old}", f"+{new}", "*** End Patch"]
+                )
+
+            first = codex_tool_remap.remap_codex_tool_call(
+                call_id="c1",
+                name="apply_patch",
+                arguments={"patch": patch("alpha", "ALPHA")},
+                incoming=incoming,
+                file_cache=cache,
+            )
+            second = codex_tool_remap.remap_codex_tool_call(
+                call_id="c2",
+                name="apply_patch",
+                arguments={"patch": patch("beta", "BETA")},
+                incoming=incoming,
+                file_cache=cache,
+            )
+        self.assertEqual(first[0][2]["content"], "ALPHA\nbeta\n")
+        self.assertEqual(second[0][2]["content"], "ALPHA\nBETA\n")
+
+
 if __name__ == "__main__":
     unittest.main()
 
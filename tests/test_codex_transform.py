@@ -146,6 +146,11 @@ class CodexTransformTestCase(unittest.TestCase):
         self.assertEqual(body["reasoning"]["summary"], "detailed")
         self.assertEqual(body["text"]["verbosity"], "medium")
         self.assertIs(body["store"], False)
+        self.assertIn("reasoning.encrypted_content", body.get("include", []))
+
+        settings = Settings(lmstudio_timeout=1, codex_include_encrypted_reasoning="off")
+        with mock.patch.object(codex, "get_codex_instructions", return_value="codex-cli-prompt"):
+            body = codex._request_body(payload, settings, model_key="codex:gpt-5.2-high")
         self.assertNotIn("reasoning.encrypted_content", body.get("include", []))
 
     def test_request_body_can_opt_in_to_encrypted_reasoning(self):
@@ -209,6 +214,137 @@ class CodexTransformTestCase(unittest.TestCase):
         self.assertEqual(body["reasoning"]["summary"], "auto")
         self.assertEqual(body["text"]["verbosity"], "medium")
 
+    def test_request_body_sets_prompt_cache_key_from_claude_code_session(self):
+        from cc_adapter.config import Settings
+
+        payload = {
+            "model": "gpt-5.2",
+            "messages": [{"role": "user", "content": "hi"}],
+            "stream": True,
+        }
+        incoming = {
+            "metadata": {"user_id": "user_abc_account_1234_session_5a1e-77"},
+            "messages": [{"role": "user", "content": "hi"}],
+        }
+        later = {
+            "metadata": {"user_id": "user_abc_account_1234_session_5a1e-77"},
+            "messages": [
+                {"role": "user", "content": "hi"},
+                {"role": "assistant", "content": "hello"},
+                {"role": "user", "content": "more"},
+            ],
+        }
+        other = {
+            "metadata": {"user_id": "user_abc_account_1234_session_9999"},
+            "messages": [{"role": "user", "content": "hi"}],
+        }
+        settings = Settings(lmstudio_timeout=1)
+        with mock.patch.object(codex, "get_codex_instructions", return_value="codex-cli-prompt"):
+            body = codex._request_body(payload, settings, model_key="codex:gpt-5.2", incoming=incoming)
+            body_later = codex._request_body(payload, settings, model_key="codex:gpt-5.2", incoming=later)
+            body_other = codex._request_body(payload, settings, model_key="codex:gpt-5.2", incoming=other)
+        self.assertTrue(body["prompt_cache_key"].startswith("cc-adapter-"))
+        self.assertEqual(body["prompt_cache_key"], body_later["prompt_cache_key"])
+        self.assertNotEqual(body["prompt_cache_key"], body_other["prompt_cache_key"])
+        self.assertEqual(codex._claude_code_session_id(incoming), "5a1e-77")
+
+    def test_prompt_cache_key_falls_back_to_first_user_message(self):
+        first = {"messages": [{"role": "user", "content": [{"type": "text", "text": "task"}]}]}
+        followup = {
+            "messages": [
+                {"role": "user", "content": [{"type": "text", "text": "task"}]},
+                {"role": "assistant", "content": "ok"},
+            ]
+        }
+        self.assertEqual(codex._prompt_cache_key(first), codex._prompt_cache_key(followup))
+        self.assertEqual(codex._prompt_cache_key({}), "")
+
+    def test_responses_to_chat_completions_maps_cached_tokens(self):
+        chat = codex._responses_to_chat_completions(
+            {
+                "id": "resp_1",
+                "output": [],
+                "usage": {"input_tokens": 100, "output_tokens": 5, "input_tokens_details": {"cached_tokens": 80}},
+            }
+        )
+        self.assertEqual(chat["usage"]["prompt_tokens_details"]["cached_tokens"], 80)
+
+    def test_responses_to_chat_completions_keeps_reasoning_signature(self):
+        from cc_adapter.codex_reasoning import decode_reasoning_signature
+        from cc_adapter.converters import openai_to_anthropic
+
+        reasoning = {
+            "type": "reasoning",
+            "id": "rs_1",
+            "summary": [{"type": "summary_text", "text": "Thinking it over."}],
+            "encrypted_content": "enc-1",
+        }
+        chat = codex._responses_to_chat_completions(
+            {
+                "id": "resp_1",
+                "output": [
+                    reasoning,
+                    {"type": "message", "content": [{"type": "output_text", "text": "hello"}]},
+                ],
+            }
+        )
+        result = openai_to_anthropic(chat, "gpt-5.2")
+        thinking = result["content"][0]
+        self.assertEqual(thinking["type"], "thinking")
+        self.assertEqual(thinking["thinking"], "Thinking it over.")
+        self.assertEqual(decode_reasoning_signature(thinking["signature"])["encrypted_content"], "enc-1")
+        self.assertEqual(result["content"][1]["text"], "hello")
+
+    def test_input_prefix_cache_converts_only_new_messages(self):
+        cache = codex.InputPrefixCache()
+        marker = {"type": "ephemeral"}
+        first = [
+            {"role": "system", "content": "be brief"},
+            {"role": "user", "content": [{"type": "text", "text": "hi", "cache_control": marker}]},
+        ]
+        second = [
+            {"role": "system", "content": "be brief"},
+            {"role": "user", "content": [{"type": "text", "text": "hi"}]},
+            {
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [{"id": "call_1", "type": "function", "function": {"name": "ls", "arguments": "{}"}}],
+            },
+            {"role": "tool", "tool_call_id": "call_1", "content": "a.txt", "cache_control": marker},
+        ]
+
+        edited = [{"role": "system", "content": "be verbose"}, *second[1:]]
+        expected = [codex._messages_to_responses_input(messages) for messages in (first, second, edited)]
+
+        self.assertEqual(cache.convert(first), expected[0])
+        with mock.patch.object(codex, "_append_responses_input", wraps=codex._append_responses_input) as convert:
+            self.assertEqual(cache.convert(second), expected[1])
+        # Only the assistant turn and the tool result were converted; the moved marker did not break the match.
+        self.assertEqual(convert.call_count, 2)
+
+        with mock.patch.object(codex, "_append_responses_input", wraps=codex._append_responses_input) as convert:
+            self.assertEqual(cache.convert(edited), expected[2])
+        self.assertEqual(convert.call_count, 4)
+
+    def test_messages_to_responses_input_replays_reasoning_items_first(self):
+        reasoning = {"type": "reasoning", "summary": [], "encrypted_content": "enc-1"}
+        messages = [
+            {"role": "user", "content": "hi"},
+            {
+                "role": "assistant",
+                "content": "working",
+                "reasoning_items": [reasoning],
+                "tool_calls": [
+                    {"id": "call_1", "type": "function", "function": {"name": "do_it", "arguments": "{}"}}
+                ],
+            },
+            {"role": "tool", "tool_call_id": "call_1", "content": "done"},
+        ]
+
+        _, items = codex._messages_to_responses_input(messages)
+        self.assertEqual([i["type"] for i in items], ["message", "reasoning", "message", "function_call", "function_call_output"])
+        self.assertEqual(items[1], reasoning)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -207,6 +207,48 @@ class ConvertersTestCase(unittest.TestCase):
         self.assertEqual(len(tool_messages), 1)
         self.assertEqual(tool_messages[0]["tool_call_id"], "call-1")
 
+    def test_anthropic_to_openai_keeps_codex_reasoning_items_when_requested(self):
+        from cc_adapter.codex_reasoning import encode_reasoning_signature
+
+        signature = encode_reasoning_signature(
+            {"type": "reasoning", "id": "rs_1", "summary": [], "encrypted_content": "enc-1"}
+        )
+        body = {
+            "messages": [
+                {"role": "user", "content": "hi"},
+                {
+                    "role": "assistant",
+                    "content": [
+                        {"type": "thinking", "thinking": "plan", "signature": signature},
+                        {"type": "thinking", "thinking": "other", "signature": "anthropic-sig"},
+                        {"type": "text", "text": "hello"},
+                    ],
+                },
+            ]
+        }
+
+        plain = converters.anthropic_to_openai(body, "gpt-5.2")
+        self.assertNotIn("reasoning_items", plain["messages"][1])
+
+        out = converters.anthropic_to_openai(body, "gpt-5.2", keep_reasoning_items=True)
+        self.assertEqual(
+            out["messages"][1]["reasoning_items"],
+            [{"type": "reasoning", "summary": [], "encrypted_content": "enc-1"}],
+        )
+
+    def test_continuation_payload_prefill_and_instruction(self):
+        payload = {"model": "m", "messages": [{"role": "user", "content": "write"}], "stream": True}
+
+        prefill = converters.continuation_payload(payload, "Once upon")
+        self.assertEqual(prefill["messages"][-1], {"role": "assistant", "content": "Once upon"})
+        self.assertEqual(len(payload["messages"]), 1)
+
+        explicit = converters.continuation_payload(payload, "Once upon", prefill=False)
+        self.assertEqual(explicit["messages"][-2]["content"], "Once upon")
+        self.assertEqual(explicit["messages"][-1]["role"], "user")
+
+        self.assertEqual(converters.continuation_payload(payload, "")["messages"], payload["messages"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,156 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+os.environ["CC_ADAPTER_CONFIG_DIR"] = tempfile.mkdtemp(prefix="cc-adapter-tests-")
+
+from cc_adapter import breaker, failover, metrics, server
+from cc_adapter.config import Settings
+from helpers import RecordingHandler
+
+
+def _rate_limited(*_args, **_kwargs):
+    resp = requests.Response()
+    resp.status_code = 429
+    raise requests.HTTPError("429 Too Many Requests", response=resp)
+
+
+OPENROUTER_REPLY = {
+    "id": "gen-1",
+    "choices": [{"message": {"role": "assistant", "content": "from openrouter"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 3, "completion_tokens": 2},
+}
+
+REQUEST = {"model": "claude-opus-4.5", "messages": [{"role": "user", "content": "hi"}]}
+
+CHAIN = "poe:claude-opus-4.5 -> openrouter:claude-opus-4.5 -> lmstudio:gpt-oss-120b"
+
+
+class FailoverChainParsingTestCase(unittest.TestCase):
+    def test_parse_chains(self):
+        chains = failover.parse_chains(f"{CHAIN}; bogus:model -> poe:gpt-5.2")
+        hops = chains["poe:claude-opus-4.5"]
+        self.assertEqual([provider for provider, _ in hops], ["poe", "openrouter", "lmstudio"])
+        self.assertEqual(len(chains), 1)
+
+    def test_chain_for_unconfigured_model_is_single_hop(self):
+        settings = Settings(failover_chains=CHAIN)
+        self.assertEqual(failover.chain_for("codex", "gpt-5.2", settings), [("codex", "gpt-5.2")])
+        self.assertEqual(len(failover.chain_for("poe", "claude-opus-4.5", settings)), 3)
+
+
+class FailoverDispatchTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        breaker.REGISTRY.reset()
+
+    def tearDown(self):
+        breaker.REGISTRY.reset()
+
+    def _settings(self, **overrides):
+        values = dict(
+            model="poe:claude-opus-4.5",
+            poe_api_key="poe-key",
+            openrouter_key="or-key",
+            failover_chains=CHAIN,
+            upstream_max_retries=0,
+        )
+        values.update(overrides)
+        return Settings(**values)
+
+    def test_rate_limited_hop_fails_over_before_first_byte(self):
+        handler = RecordingHandler(self._settings(), REQUEST)
+        with mock.patch.object(server.poe, "send", side_effect=_rate_limited), mock.patch.object(
+            server.openrouter, "send", return_value=OPENROUTER_REPLY
+        ) as openrouter_send:
+            handler.do_POST()
+
+        self.assertEqual(handler.status, 200)
+        self.assertEqual(openrouter_send.call_count, 1)
+        self.assertEqual(handler.sent_headers["X-CC-Adapter-Served-By"], "openrouter:anthropic/claude-opus-4.5")
+        self.assertEqual(handler.sent_headers["X-CC-Adapter-Failover-Hop"], "2/3")
+        body = json.loads(handler.wfile.getvalue())
+        self.assertEqual(body["content"][0]["text"], "from openrouter")
+        self.assertEqual(metrics.REGISTRY.get("failover.attempts"), 1)
+        self.assertEqual(metrics.REGISTRY.get("failover.served.openrouter"), 1)
+
+    def test_last_hop_failure_is_reported(self):
+        settings = self._settings(failover_chains="poe:claude-opus-4.5 -> openrouter:claude-opus-4.5")
+        handler = RecordingHandler(settings, REQUEST)
+        with mock.patch.object(server.poe, "send", side_effect=_rate_limited), mock.patch.object(
+            server.openrouter, "send", side_effect=_rate_limited
+        ):
+            handler.do_POST()
+
+        self.assertEqual(handler.status, 502)
+        self.assertIn("OpenRouter error", json.loads(handler.wfile.getvalue())["error"])
+
+    def test_hop_without_credentials_is_skipped(self):
+        handler = RecordingHandler(self._settings(openrouter_key=""), REQUEST)
+        lm_reply = dict(OPENROUTER_REPLY, choices=[{"message": {"role": "assistant", "content": "local"}}])
+        with mock.patch.object(server.poe, "send", side_effect=_rate_limited), mock.patch.object(
+            server.lmstudio, "send", return_value=lm_reply
+        ):
+            handler.do_POST()
+
+        self.assertEqual(handler.status, 200)
+        self.assertEqual(handler.sent_headers["X-CC-Adapter-Served-By"], "lmstudio:gpt-oss-120b")
+
+
+def _breaker_settings(**overrides):
+    values = dict(
+        breaker_failure_threshold=2,
+        breaker_reset_timeout=60,
+        poe_api_key="poe-key",
+        openrouter_key="or-key",
+        upstream_max_retries=0,
+    )
+    values.update(overrides)
+    return Settings(**values)
+
+
+class BreakerDispatchTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        breaker.REGISTRY.reset()
+
+    def tearDown(self):
+        breaker.REGISTRY.reset()
+
+    def test_open_breaker_skips_straight_to_next_hop(self):
+        settings = _breaker_settings(model="poe:claude-opus-4.5", failover_chains=CHAIN)
+        with mock.patch.object(server.poe, "send", side_effect=_rate_limited) as poe_send, mock.patch.object(
+            server.openrouter, "send", return_value=OPENROUTER_REPLY
+        ):
+            for _ in range(3):
+                handler = RecordingHandler(settings, REQUEST)
+                handler.do_POST()
+                self.assertEqual(handler.status, 200)
+
+        self.assertEqual(poe_send.call_count, 2)
+        self.assertEqual(breaker.for_provider(settings, "poe").state, breaker.OPEN)
+
+    def test_open_breaker_on_last_hop_returns_503(self):
+        settings = _breaker_settings(model="openrouter:claude-opus-4.5", breaker_failure_threshold=1)
+        with mock.patch.object(server.openrouter, "send", side_effect=_rate_limited):
+            RecordingHandler(settings, REQUEST).do_POST()
+            handler = RecordingHandler(settings, REQUEST)
+            handler.do_POST()
+        self.assertEqual(handler.status, 503)
+        self.assertIn("Circuit open", json.loads(handler.wfile.getvalue())["error"])
+
+    def test_health_reports_breaker_state(self):
+        breaker.for_provider(_breaker_settings(), "codex")
+        handler = RecordingHandler(_breaker_settings(), {})
+        handler.path = "/health"
+        handler.do_GET()
+        body = json.loads(handler.wfile.getvalue())
+        self.assertEqual(list(body["breakers"].values())[0]["state"], "closed")
+
+
+if __name__ == "__main__":
+    unittest.main()
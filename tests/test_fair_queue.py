@@ -0,0 +1,180 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+os.environ["CC_ADAPTER_CONFIG_DIR"] = tempfile.mkdtemp(prefix="cc-adapter-tests-")
+
+from cc_adapter import breaker, fair_queue, metrics, scheduler, server
+from cc_adapter.config import Settings
+from helpers import RecordingHandler
+
+REPLY = {"choices": [{"message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}]}
+
+
+class ClientIdentityTestCase(unittest.TestCase):
+    def test_sources_in_configured_order(self):
+        incoming = {"metadata": {"user_id": "user_abc_account_1_session_xyz"}}
+        headers = {"X-Api-Key": "sk-team-alice"}
+        settings = Settings()
+        self.assertEqual(fair_queue.client_id(incoming, headers, ("10.0.0.5", 1), settings), "user:user_abc_account_1")
+        self.assertTrue(fair_queue.client_id({}, headers, ("10.0.0.5", 1), settings).startswith("token:"))
+        self.assertNotIn("alice", fair_queue.client_id({}, headers, ("10.0.0.5", 1), settings))
+        self.assertEqual(fair_queue.client_id({}, {}, ("10.0.0.5", 1), settings), "addr:10.0.0.5")
+        by_address = Settings(fair_queue_identity="address")
+        self.assertEqual(fair_queue.client_id(incoming, headers, ("10.0.0.5", 1), by_address), "addr:10.0.0.5")
+
+    def test_parse_weights(self):
+        self.assertEqual(fair_queue.parse_weights("addr:10.0.0.5=2, alice=0.5, bad=x, zero=0"), {
+            "addr:10.0.0.5": 2.0,
+            "alice": 0.5,
+        })
+
+
+class FairQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        self.queue = fair_queue.FairQueue()
+
+    def _wait_queued(self, count):
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            if sum(client["queued"] for client in self.queue.snapshot().values()) >= count:
+                return
+            time.sleep(0.001)
+
+    def _queue(self, name, order):
+        def _run():
+            self.queue.admit(name)
+            order.append(name)
+
+        thread = threading.Thread(target=_run, daemon=True)
+        thread.start()
+        return thread
+
+    def test_freed_slots_follow_weighted_shares(self):
+        self.queue.configure(Settings(fair_queue_concurrency=3, fair_queue_weights="heavy=2"))
+        for name in ("addr:heavy", "addr:light", "addr:other"):
+            self.queue.admit(name)
+        order = []
+        light = self._queue("addr:light", order)
+        self._wait_queued(1)
+        heavy = self._queue("addr:heavy", order)
+        self._wait_queued(2)
+
+        # One active request per 2 weight (0.5) beats light's 1 per 1, despite queueing later.
+        self.queue.release("addr:other")
+        heavy.join(2)
+        self.assertEqual(order, ["addr:heavy"])
+        self.queue.release("addr:heavy")
+        light.join(2)
+        self.assertEqual(order, ["addr:heavy", "addr:light"])
+
+    def test_per_client_concurrency_does_not_block_others(self):
+        self.queue.configure(Settings(fair_client_concurrency=1))
+        self.queue.admit("addr:a")
+        order = []
+        blocked = self._queue("addr:a", order)
+        self._wait_queued(1)
+        self.assertEqual(self.queue.admit("addr:b"), 0.0)
+        self.assertEqual(order, [])
+        self.queue.release("addr:a")
+        blocked.join(2)
+        self.assertEqual(order, ["addr:a"])
+        stats = self.queue.snapshot()["addr:a"]
+        self.assertEqual((stats["active"], stats["requests"]), (1, 2))
+        self.assertEqual(metrics.REGISTRY.get("fair_queue.queued"), 1)
+
+    def test_tokens_per_minute_cap(self):
+        self.queue.configure(Settings(fair_client_tpm=1000))
+        with self.queue.slot("addr:a", 800):
+            pass
+        with self.assertRaises(fair_queue.OverQuota) as caught:
+            self.queue.admit("addr:a", 400)
+        self.assertGreater(caught.exception.retry_after, 50)
+        self.assertEqual(self.queue.admit("addr:b", 400), 0.0)
+        self.assertEqual(self.queue.snapshot()["addr:a"]["rejected"], 1)
+
+    def test_request_larger_than_the_cap_is_refused(self):
+        self.queue.configure(Settings(fair_client_tpm=1000))
+        with self.assertRaises(fair_queue.OverQuota):
+            self.queue.admit("addr:a", 1500)
+        self.assertEqual(self.queue.snapshot()["addr:a"]["rejected"], 1)
+
+    def test_idle_clients_keep_only_their_counters(self):
+        self.queue.configure(Settings())
+        with mock.patch.object(fair_queue, "MAX_RETIRED", 10):
+            for idx in range(50):
+                with self.queue.slot(f"addr:10.0.0.{idx}", 500):
+                    pass
+            with self.queue.slot("addr:10.0.0.49"):
+                pass
+        self.assertEqual(self.queue._clients, {})
+        stats = self.queue.snapshot()
+        self.assertEqual(len(stats), 10)
+        self.assertEqual(stats["addr:10.0.0.49"]["requests"], 2)
+        self.assertEqual(stats["addr:10.0.0.49"]["tokens_last_minute"], 0)
+
+    def test_waiter_leaves_the_queue_at_its_deadline(self):
+        self.queue.configure(Settings(fair_client_concurrency=1))
+        self.queue.admit("addr:a")
+        queued = []
+        with self.assertRaises(scheduler.QueueAbandoned) as caught:
+            self.queue.admit("addr:a", deadline=time.monotonic() + 0.05, on_queue=lambda: queued.append(1))
+        self.assertEqual(caught.exception.reason, "deadline")
+        self.assertEqual(queued, [1])
+        self.assertEqual(self.queue.snapshot()["addr:a"]["queued"], 0)
+        self.queue.release("addr:a")
+        self.assertEqual(self.queue._clients, {})
+        self.assertEqual(self.queue.snapshot()["addr:a"]["requests"], 2)
+
+
+class FairQueueDispatchTestCase(unittest.TestCase):
+    def setUp(self):
+        breaker.REGISTRY.reset()
+        fair_queue.QUEUE.reset()
+
+    def tearDown(self):
+        fair_queue.QUEUE.reset()
+
+    def test_over_quota_client_gets_429_before_translation(self):
+        settings = Settings(model="poe:claude-opus-4.5", poe_api_key="poe-key", fair_client_tpm=100)
+        body = {"model": "claude-opus-4.5", "max_tokens": 32, "messages": [{"role": "user", "content": "hello " * 50}]}
+        with mock.patch.object(server.poe, "send", return_value=REPLY) as poe_send, mock.patch.object(
+            server, "anthropic_to_openai", wraps=server.anthropic_to_openai
+        ) as translate:
+            first = RecordingHandler(settings, body)
+            first.do_POST()
+            second = RecordingHandler(settings, body)
+            second.do_POST()
+            other = RecordingHandler(settings, body, address="10.0.0.6")
+            other.do_POST()
+
+        self.assertEqual((first.status, second.status, other.status), (200, 429, 200))
+        self.assertEqual(poe_send.call_count, 2)
+        self.assertEqual(translate.call_count, 2)
+        self.assertGreater(int(second.sent_headers["Retry-After"]), 0)
+        self.assertEqual(fair_queue.snapshot()["addr:127.0.0.1"]["rejected"], 1)
+
+    def test_queued_stream_starts_before_its_deadline_runs_out(self):
+        settings = Settings(
+            model="poe:claude-opus-4.5", poe_api_key="poe-key", fair_client_concurrency=1, sse_ping_interval=0
+        )
+        body = {"model": "claude-opus-4.5", "stream": True, "messages": [{"role": "user", "content": "hi"}]}
+        fair_queue.for_settings(settings).admit("addr:127.0.0.1")
+        handler = RecordingHandler(settings, body)
+        handler.headers["x-cc-adapter-timeout"] = "0.1"
+        with mock.patch.object(server.poe, "send") as poe_send:
+            handler.do_POST()
+
+        output = handler.wfile.getvalue()
+        self.assertEqual(handler.status, 200)
+        self.assertLess(output.index(b"event: message_start"), output.index(b"event: error"))
+        self.assertIn(b"(deadline)", output)
+        poe_send.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import requests
+
+os.environ["CC_ADAPTER_CONFIG_DIR"] = tempfile.mkdtemp(prefix="cc-adapter-tests-")
+
+from cc_adapter import breaker, client_monitor, hedge, metrics, server
+from cc_adapter.config import Settings
+from helpers import RecordingHandler
+
+
+def _warm(hedger, key, seconds=0.01, count=hedge.MIN_SAMPLES):
+    window = hedger.window(key)
+    for _ in range(count):
+        window.record(seconds)
+
+
+class _Upstream:
+    """An in-flight upstream response; closing it (an abort) wakes the waiting call."""
+
+    def __init__(self, wake):
+        self.wake = wake
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+        self.wake.set()
+
+
+def _blocked_call(wake, value):
+    upstream = client_monitor.track(_Upstream(wake))
+    wake.wait(5)
+    if upstream.closed:
+        raise requests.ConnectionError("aborted")
+    return value
+
+
+def _reply(text):
+    return {"choices": [{"message": {"role": "assistant", "content": text}, "finish_reason": "stop"}]}
+
+
+class HedgerTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        self.hedger = hedge.Hedger()
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def _slow(self, value):
+        return lambda: _blocked_call(self.release, value)
+
+    def test_no_hedge_until_latency_is_known(self):
+        called = []
+        result = self.hedger.run("poe:m", lambda: "primary", lambda: called.append(1), budget=1.0)
+        self.assertEqual(result, "primary")
+        self.assertEqual(called, [])
+        self.assertEqual(len(self.hedger.window("poe:m")), 1)
+
+    def test_slow_primary_loses_to_hedge(self):
+        _warm(self.hedger, "poe:m")
+        self.hedger.requests = 100
+        result = self.hedger.run("poe:m", self._slow("primary"), lambda: "hedge", budget=0.1)
+        self.assertEqual(result, "hedge")
+        self.assertEqual(metrics.REGISTRY.get("hedge.fired"), 1)
+        self.assertEqual(metrics.REGISTRY.get("hedge.won"), 1)
+        self.assertEqual(metrics.REGISTRY.get("hedge.cancelled"), 1)
+
+    def test_loser_is_aborted_before_returning(self):
+        _warm(self.hedger, "poe:m")
+        self.hedger.requests = 100
+        finished = []
+
+        def _primary():
+            try:
+                return _blocked_call(threading.Event(), "primary")
+            finally:
+                finished.append("primary")
+
+        self.assertEqual(self.hedger.run("poe:m", _primary, lambda: "hedge", budget=1.0), "hedge")
+        self.assertEqual(finished, ["primary"])
+        self.assertEqual(metrics.REGISTRY.get("hedge.cancelled"), 1)
+
+    def test_loser_that_cannot_be_aborted_is_not_counted_cancelled(self):
+        _warm(self.hedger, "poe:m")
+        self.hedger.requests = 100
+
+        def _primary():
+            threading.Event().wait(0.1)
+            return "primary"
+
+        self.assertEqual(self.hedger.run("poe:m", _primary, lambda: "hedge", budget=1.0), "hedge")
+        self.assertEqual(metrics.REGISTRY.get("hedge.cancelled"), 0)
+
+    def test_budget_caps_hedges(self):
+        _warm(self.hedger, "poe:m", seconds=0.001, count=100)
+        hedges = []
+
+        def _primary():
+            threading.Event().wait(0.02)
+            return "primary"
+
+        def _hedge():
+            hedges.append(1)
+            return _blocked_call(threading.Event(), "hedge")
+
+        for _ in range(5):
+            self.hedger.run("poe:m", _primary, _hedge, budget=0.5)
+        self.assertEqual(len(hedges), 2)
+        self.assertEqual(metrics.REGISTRY.get("hedge.over_budget"), 3)
+
+    def test_alternate_latency_is_kept_apart(self):
+        _warm(self.hedger, "poe:a")
+        self.hedger.requests = 100
+        self.hedger.run("poe:a", self._slow("primary"), lambda: "hedge", budget=1.0, alternate_key="openrouter:b")
+        self.assertEqual(len(self.hedger.window("poe:a")), hedge.MIN_SAMPLES)
+        self.assertEqual(len(self.hedger.window("openrouter:b")), 1)
+
+    def test_failed_hedge_waits_for_primary(self):
+        _warm(self.hedger, "poe:m")
+        self.hedger.requests = 100
+
+        def _boom():
+            self.release.set()
+            raise RuntimeError("hedge failed")
+
+        self.assertEqual(self.hedger.run("poe:m", self._slow("primary"), _boom, budget=1.0), "primary")
+
+    def test_quantile(self):
+        window = hedge.LatencyWindow()
+        for value in range(1, 101):
+            window.record(value / 100)
+        self.assertAlmostEqual(window.quantile(0.9), 0.91)
+        self.assertIsNone(hedge.LatencyWindow().quantile())
+
+
+class HedgeDispatchTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        breaker.REGISTRY.reset()
+        hedge.HEDGER.reset()
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        hedge.HEDGER.reset()
+
+    def test_hedge_goes_to_alternate_provider(self):
+        settings = Settings(
+            model="poe:claude-haiku-4.5",
+            poe_api_key="poe-key",
+            openrouter_key="or-key",
+            hedge="on",
+            hedge_target="openrouter:anthropic/claude-haiku-4.5",
+            hedge_budget=1.0,
+        )
+        _warm(hedge.HEDGER, "poe:claude-haiku-4.5")
+        hedge.HEDGER.requests = 10
+
+        def _slow_poe(payload, settings, target_model, incoming):
+            return _blocked_call(self.release, {})
+
+        body = {"model": "claude-haiku-4.5", "max_tokens": 32, "messages": [{"role": "user", "content": "title"}]}
+        handler = RecordingHandler(settings, body)
+        with mock.patch.object(server.poe, "send", side_effect=_slow_poe), mock.patch.object(
+            server.openrouter, "send", return_value=_reply("Fast title")
+        ) as openrouter_send:
+            handler.do_POST()
+
+        self.assertEqual(handler.status, 200)
+        self.assertEqual(json.loads(handler.wfile.getvalue())["content"][0]["text"], "Fast title")
+        self.assertEqual(openrouter_send.call_args[0][2], "anthropic/claude-haiku-4.5")
+        self.assertEqual(metrics.REGISTRY.get("hedge.won"), 1)
+        # The fast alternate is timed under its own model; the primary's window is untouched.
+        self.assertEqual(len(hedge.HEDGER.window("poe:claude-haiku-4.5")), hedge.MIN_SAMPLES)
+        self.assertEqual(len(hedge.HEDGER.window("openrouter:anthropic/claude-haiku-4.5")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
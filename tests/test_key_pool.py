@@ -0,0 +1,105 @@
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from cc_adapter import key_pool, metrics, ratelimit
+from cc_adapter.config import Settings
+from cc_adapter.providers import openrouter, poe
+
+
+class DummyResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ""
+        self.closed = False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error", response=self)
+
+    def close(self):
+        self.closed = True
+
+    def json(self):
+        return {"choices": [{"message": {"content": "ok"}}], "usage": {"prompt_tokens": 1}}
+
+
+def _payload(first_user: str):
+    return {"model": "anthropic/claude-opus-4.5", "messages": [{"role": "user", "content": first_user}]}
+
+
+class KeyPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        key_pool.REGISTRY.reset()
+        ratelimit.REGISTRY.reset()
+
+    def test_parse_keys(self):
+        self.assertEqual(key_pool.parse_keys(" k1, k2,,k1 "), ["k1", "k2"])
+        self.assertEqual(key_pool.parse_keys(""), [])
+        self.assertEqual(key_pool.first_key(" k2, k1"), "k2")
+        self.assertEqual(key_pool.first_key(" , "), "")
+
+    def test_round_robin_and_conversation_stickiness(self):
+        pool = key_pool.KeyPool("poe", ["k1", "k2", "k3"])
+        self.assertEqual([pool.pick() for _ in range(4)], ["k1", "k2", "k3", "k1"])
+        first = pool.pick("conversation-a")
+        pool.pick()
+        self.assertEqual(pool.pick("conversation-a"), first)
+
+    def test_throttled_and_unauthorized_keys_are_quarantined(self):
+        pool = key_pool.KeyPool("openrouter", ["k1", "k2"], quarantine_seconds=60, auth_quarantine_seconds=600)
+        sticky = pool.pick("conversation-a")
+        pool.observe(sticky, DummyResponse(429, {"Retry-After": "5"}))
+        moved = pool.pick("conversation-a")
+        self.assertNotEqual(moved, sticky)
+        pool.observe(moved, DummyResponse(401))
+
+        stats = pool.snapshot()
+        self.assertGreater(stats[f"openrouter key:{key_pool.fingerprint(sticky)}"]["quarantined_for"], 4)
+        self.assertGreater(stats[f"openrouter key:{key_pool.fingerprint(moved)}"]["quarantined_for"], 500)
+        # Everything quarantined: fall back to the key released soonest.
+        self.assertEqual(pool.pick(), sticky)
+        self.assertEqual(metrics.REGISTRY.get("keypool.quarantined.openrouter"), 2)
+        self.assertNotIn("k1", " ".join(stats))
+
+    def test_single_key_is_never_quarantined(self):
+        pool = key_pool.KeyPool("poe", ["only"])
+        pool.observe("only", DummyResponse(429))
+        self.assertEqual(pool.snapshot()[f"poe key:{key_pool.fingerprint('only')}"]["quarantined_for"], 0)
+        self.assertEqual(pool.pick(), "only")
+
+    def test_openrouter_send_spreads_keys_and_skips_throttled_ones(self):
+        settings = Settings(openrouter_key="or-1, or-2", model="openrouter:anthropic/claude-opus-4.5")
+        responses = [DummyResponse(429), DummyResponse(), DummyResponse()]
+        with patch("cc_adapter.providers.openrouter.requests.post", side_effect=responses) as post:
+            with self.assertRaises(requests.HTTPError):
+                openrouter.send(_payload("one"), settings, "anthropic/claude-opus-4.5")
+            openrouter.send(_payload("two"), settings, "anthropic/claude-opus-4.5")
+            openrouter.send(_payload("three"), settings, "anthropic/claude-opus-4.5")
+
+        used = [call.kwargs["headers"]["Authorization"] for call in post.call_args_list]
+        self.assertEqual(used, ["Bearer or-1", "Bearer or-2", "Bearer or-2"])
+        stats = key_pool.snapshot()
+        self.assertEqual(stats[f"openrouter key:{key_pool.fingerprint('or-1')}"]["throttled"], 1)
+        self.assertEqual(stats[f"openrouter key:{key_pool.fingerprint('or-2')}"]["requests"], 2)
+
+    def test_poe_moves_a_throttled_request_to_the_next_key(self):
+        settings = Settings(poe_api_key="poe-1, poe-2", poe_max_retries=3)
+        throttled = DummyResponse(429)
+        with patch.object(poe.requests.Session, "post", side_effect=[throttled, DummyResponse()]) as post:
+            session, resp = poe._post_with_retries(_payload("one"), settings)
+            session.close()
+
+        used = [call.kwargs["headers"]["Authorization"] for call in post.call_args_list]
+        self.assertEqual(used, ["Bearer poe-1", "Bearer poe-2"])
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(throttled.closed)
+        retries = poe._build_retry_session(settings, retry_throttled=False).get_adapter(settings.poe_base_url)
+        self.assertNotIn(429, retries.max_retries.status_forcelist)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ["CC_ADAPTER_CONFIG_DIR"] = tempfile.mkdtemp(prefix="cc-adapter-tests-")
+
+from cc_adapter import breaker, metrics, prober, server
+from cc_adapter.config import Settings
+from helpers import RecordingHandler
+
+CHAIN = "poe:claude-opus-4.5 -> openrouter:claude-opus-4.5"
+POE = ("poe", "claude-opus-4.5")
+OPENROUTER = ("openrouter", "anthropic/claude-opus-4.5")
+
+
+class StreamedResponse:
+    status_code = 200
+    headers = {}
+
+    def raise_for_status(self):
+        return
+
+    def iter_lines(self, decode_unicode=False):
+        yield b'data: {"choices": [{"delta": {"role": "assistant"}}]}'
+        yield b'data: {"choices": [{"delta": {"content": "o"}}]}'
+        yield b'data: {"choices": [{"delta": {"content": "k"}}]}'
+        yield b'data: {"choices": [], "usage": {"completion_tokens": 2}}'
+        yield b"data: [DONE]"
+
+    def close(self):
+        return
+
+
+def _settings(**overrides):
+    values = dict(
+        model="poe:claude-opus-4.5",
+        poe_api_key="poe-key",
+        openrouter_key="or-key",
+        failover_chains=CHAIN,
+        probe_interval=60,
+    )
+    values.update(overrides)
+    return Settings(**values)
+
+
+class ProberTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        prober.SCORES.reset()
+
+    def tearDown(self):
+        prober.SCORES.reset()
+
+    def test_targets_follow_default_chains_and_credentials(self):
+        settings = _settings(probe_models="lmstudio:qwen3-4b, codex:gpt-5.1-codex")
+        self.assertEqual(prober.probe_targets(settings), [POE, OPENROUTER, ("lmstudio", "qwen3-4b")])
+        self.assertEqual(prober.probe_targets(_settings(openrouter_key="")), [POE])
+
+    def test_probe_measures_connect_ttft_and_throughput(self):
+        with mock.patch.object(prober.requests, "post", return_value=StreamedResponse()) as post:
+            connect, ttft, tokens_per_second = prober.probe("openrouter", OPENROUTER[1], _settings())
+
+        sent = post.call_args.kwargs
+        self.assertEqual(sent["headers"], {"Authorization": "Bearer or-key"})
+        self.assertEqual(sent["json"]["max_tokens"], prober.PROBE_MAX_TOKENS)
+        self.assertLessEqual(connect, ttft)
+        self.assertGreater(tokens_per_second, 0)
+
+    def test_scores_are_moving_averages(self):
+        prober.SCORES.observe("poe", "m", 0.1, 1.0, 50)
+        prober.SCORES.observe("poe", "m", 0.1, 2.0, 0)
+        score = prober.SCORES.get("poe", "m").snapshot()
+        self.assertAlmostEqual(score["ttft"], 1.3)
+        self.assertEqual(score["tokens_per_second"], 50)
+        self.assertEqual(score["samples"], 2)
+
+    def test_run_once_records_failures(self):
+        with mock.patch.object(prober.requests, "post", side_effect=prober.requests.ConnectionError("refused")):
+            prober.Prober(_settings(failover_chains="")).run_once()
+        self.assertIn("refused", prober.snapshot()["poe:claude-opus-4.5"]["last_error"])
+        self.assertEqual(metrics.REGISTRY.get("probe.failed.poe"), 1)
+
+    def test_every_lmstudio_backend_is_probed(self):
+        settings = _settings(
+            failover_chains="",
+            poe_api_key="",
+            openrouter_key="",
+            probe_models="lmstudio:qwen3-4b",
+            lmstudio_backends="http://gpu1:1234/v1/chat/completions, http://gpu2:1234/v1/chat/completions",
+        )
+
+        def _post(url, **kwargs):
+            if "gpu1" in url:
+                raise prober.requests.ConnectionError("refused")
+            return StreamedResponse()
+
+        with mock.patch.object(prober.requests, "post", side_effect=_post) as post:
+            prober.Prober(settings).run_once()
+
+        self.assertEqual(post.call_count, 2)
+        scores = prober.snapshot()
+        self.assertIn("refused", scores["lmstudio:qwen3-4b@http://gpu1:1234/v1/chat/completions"]["last_error"])
+        self.assertEqual(scores["lmstudio:qwen3-4b@http://gpu2:1234/v1/chat/completions"]["samples"], 1)
+        self.assertEqual(scores["lmstudio:qwen3-4b"]["samples"], 1)
+        self.assertNotIn("last_error", scores["lmstudio:qwen3-4b"])
+
+    def test_rank_needs_fresh_scores_for_every_hop(self):
+        prober.SCORES.observe(*OPENROUTER, 0.1, 0.5, 80)
+        self.assertEqual(prober.SCORES.rank([POE, OPENROUTER]), [POE, OPENROUTER])
+        prober.SCORES.observe(*POE, 0.1, 3.0, 40)
+        self.assertEqual(prober.SCORES.rank([POE, OPENROUTER]), [OPENROUTER, POE])
+        prober.SCORES.fail(*OPENROUTER, "HTTP 502")
+        self.assertEqual(prober.SCORES.rank([POE, OPENROUTER]), [POE, OPENROUTER])
+        self.assertEqual(prober.rank([OPENROUTER, POE], _settings(probe_interval=0)), [OPENROUTER, POE])
+
+
+class ProberDispatchTestCase(unittest.TestCase):
+    def setUp(self):
+        breaker.REGISTRY.reset()
+        prober.SCORES.reset()
+        prober.SCORES.observe(*POE, 0.2, 4.0, 30)
+        prober.SCORES.observe(*OPENROUTER, 0.1, 0.8, 90)
+
+    def tearDown(self):
+        prober.SCORES.reset()
+
+    def test_faster_equivalent_hop_is_tried_first(self):
+        body = {"model": "claude-opus-4.5", "max_tokens": 32, "messages": [{"role": "user", "content": "hi"}]}
+        reply = {"choices": [{"message": {"role": "assistant", "content": "hey"}, "finish_reason": "stop"}]}
+        handler = RecordingHandler(_settings(), body)
+        with mock.patch.object(server.openrouter, "send", return_value=reply) as openrouter_send, mock.patch.object(
+            server.poe, "send"
+        ) as poe_send:
+            handler.do_POST()
+
+        poe_send.assert_not_called()
+        self.assertEqual(openrouter_send.call_args[0][1].model, "openrouter:anthropic/claude-opus-4.5")
+        self.assertEqual(handler.sent_headers["X-CC-Adapter-Served-By"], "openrouter:anthropic/claude-opus-4.5")
+
+    def test_scores_are_reported(self):
+        handler = RecordingHandler(_settings(), {})
+        handler.path = "/v1/models"
+        handler.do_GET()
+        models = {entry["id"]: entry for entry in json.loads(handler.wfile.getvalue())["data"]}
+        self.assertEqual(models["poe:claude-opus-4.5"]["latency"]["ttft"], 4.0)
+
+        handler = RecordingHandler(_settings(), {})
+        handler.path = "/health"
+        handler.do_GET()
+        self.assertIn("openrouter:anthropic/claude-opus-4.5", json.loads(handler.wfile.getvalue())["probes"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+from unittest.mock import patch
+
+from cc_adapter import metrics, ratelimit
+from cc_adapter.config import Settings
+from cc_adapter.providers import openrouter
+
+
+class DummyResponse:
+    def __init__(self, status_code=200, headers=None, body=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ""
+        self._body = body or {"choices": [{"message": {"content": "ok"}}], "usage": {"prompt_tokens": 1}}
+
+    def raise_for_status(self):
+        return
+
+    def json(self):
+        return self._body
+
+
+class ResetParsingTestCase(unittest.TestCase):
+    def test_durations_epochs_and_deltas(self):
+        self.assertEqual(ratelimit.parse_reset("6m0s"), 360.0)
+        self.assertAlmostEqual(ratelimit.parse_reset("20ms"), 0.02)
+        self.assertEqual(ratelimit.parse_reset("1700000030000", now=1700000000.0), 30.0)
+        self.assertEqual(ratelimit.parse_reset("1700000012", now=1700000000.0), 12.0)
+        self.assertEqual(ratelimit.parse_reset("7"), 7.0)
+        self.assertIsNone(ratelimit.parse_reset("soon"))
+
+
+class RateGovernorTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        ratelimit.REGISTRY.reset()
+        self.sleeps = []
+
+    def test_does_not_pace_until_limits_are_learned(self):
+        governor = ratelimit.for_key("openrouter", "key-a")
+        for _ in range(5):
+            self.assertEqual(governor.acquire(10, sleep=self.sleeps.append), 0.0)
+        self.assertEqual(self.sleeps, [])
+
+    def test_paces_once_remaining_budget_is_spent(self):
+        governor = ratelimit.for_key("openrouter", "key-a")
+        governor.observe(
+            DummyResponse(
+                headers={"X-RateLimit-Limit": "2", "X-RateLimit-Remaining": "1", "X-RateLimit-Reset": "10"}
+            )
+        )
+        governor.acquire(30, sleep=self.sleeps.append)
+        governor.acquire(30, sleep=self.sleeps.append)
+        governor.acquire(30, sleep=self.sleeps.append)
+
+        # One request left for the next 10s: the rest are paced at 1 per 10s.
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertAlmostEqual(self.sleeps[0], 10.0, places=1)
+        self.assertAlmostEqual(self.sleeps[1], 20.0, places=1)
+        self.assertEqual(metrics.REGISTRY.get("ratelimit.waits.openrouter"), 2)
+
+    def test_keeps_pacing_late_in_a_window(self):
+        governor = ratelimit.for_key("openrouter", "key-a")
+        governor.observe(
+            DummyResponse(headers={"X-RateLimit-Limit": "60", "X-RateLimit-Remaining": "30", "X-RateLimit-Reset": "60"})
+        )
+        governor.observe(
+            DummyResponse(headers={"X-RateLimit-Limit": "60", "X-RateLimit-Remaining": "1", "X-RateLimit-Reset": "1"})
+        )
+        for _ in range(3):
+            governor.acquire(10, sleep=self.sleeps.append)
+
+        self.assertLessEqual(governor.snapshot()["rate_per_second"], 1.0)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertAlmostEqual(self.sleeps[0], 1.0, places=1)
+        self.assertAlmostEqual(self.sleeps[1], 2.0, places=1)
+
+    def test_retry_after_blocks_every_caller(self):
+        governor = ratelimit.for_key("poe", "key-a")
+        governor.observe(DummyResponse(status_code=429, headers={"Retry-After": "3"}))
+        governor.acquire(10, sleep=self.sleeps.append)
+        governor.acquire(2, sleep=self.sleeps.append)
+
+        self.assertAlmostEqual(self.sleeps[0], 3.0, places=1)
+        self.assertEqual(self.sleeps[1], 2)
+        self.assertEqual(metrics.REGISTRY.get("ratelimit.throttled.poe"), 1)
+
+    def test_buckets_are_per_key(self):
+        ratelimit.for_key("poe", "key-a").observe(DummyResponse(status_code=429, headers={"Retry-After": "30"}))
+        self.assertEqual(ratelimit.for_key("poe", "key-b").acquire(10, sleep=self.sleeps.append), 0.0)
+        self.assertEqual(len(ratelimit.snapshot()), 2)
+        self.assertNotIn("key-a", " ".join(ratelimit.snapshot()))
+
+    def test_openrouter_send_feeds_the_governor(self):
+        settings = Settings(openrouter_key="or-key", model="openrouter:anthropic/claude-opus-4.5")
+        headers = {"x-ratelimit-limit": "20", "x-ratelimit-remaining": "0", "x-ratelimit-reset": "4"}
+        payload = {"model": "anthropic/claude-opus-4.5", "messages": []}
+        with patch("cc_adapter.providers.openrouter.requests.post", return_value=DummyResponse(headers=headers)):
+            openrouter.send(payload, settings, "anthropic/claude-opus-4.5")
+
+        state = ratelimit.for_key("openrouter", "or-key").snapshot()
+        self.assertEqual(state["limit"], 20)
+        self.assertGreater(state["blocked_for"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+os.environ["CC_ADAPTER_CONFIG_DIR"] = tempfile.mkdtemp(prefix="cc-adapter-tests-")
+
+from cc_adapter import breaker, metrics, response_cache, server, streaming
+from cc_adapter.config import Settings
+from cc_adapter.sse import SSEWriter
+from helpers import RecordingHandler
+
+
+class Buffer:
+    def __init__(self):
+        self.wfile = io.BytesIO()
+
+
+class TextResponse:
+    headers = {}
+
+    def iter_lines(self, decode_unicode=False):
+        yield b'data: {"choices": [{"delta": {"content": [{"type": "text", "text": "Fix typo"}]}}]}'
+        yield b'data: {"choices": [{"delta": {}, "finish_reason": "stop"}]}'
+
+    def close(self):
+        return
+
+
+MESSAGE = {
+    "id": "msg_1",
+    "type": "message",
+    "role": "assistant",
+    "model": "claude-haiku-4.5",
+    "content": [
+        {"type": "thinking", "thinking": "short", "signature": "sig"},
+        {"type": "text", "text": "Fix typo"},
+        {"type": "tool_use", "id": "toolu_1", "name": "Bash", "input": {"command": "ls"}},
+    ],
+    "stop_reason": "tool_use",
+    "stop_sequence": None,
+    "usage": {"input_tokens": 5, "output_tokens": 3},
+}
+
+REQUEST = {
+    "model": "claude-haiku-4.5",
+    "temperature": 0,
+    "max_tokens": 32,
+    "messages": [{"role": "user", "content": "Write a title for this session"}],
+}
+
+
+def _quiet_logger():
+    logger = logging.getLogger("response-cache-test")
+    logger.setLevel(logging.CRITICAL)
+    return logger
+
+
+class ResponseCacheStoreTestCase(unittest.TestCase):
+    def test_replay_round_trips_through_sse(self):
+        target = Buffer()
+        response_cache.replay(SSEWriter(target), MESSAGE)
+        self.assertEqual(response_cache.message_from_sse(target.wfile.getvalue()), MESSAGE)
+
+    def test_incomplete_or_failed_streams_are_not_cached(self):
+        target = Buffer()
+        writer = SSEWriter(target)
+        streaming.abort_stream(writer, "boom", "claude-haiku-4.5")
+        self.assertIsNone(response_cache.message_from_sse(target.wfile.getvalue()))
+        self.assertIsNone(response_cache.message_from_sse(b'event: message_start\ndata: {"type": "message_start"}\n\n'))
+
+    def test_lru_eviction_and_ttl(self):
+        cache = response_cache.ResponseCache(max_entries=2)
+        cache.put("a", MESSAGE, ttl=60)
+        cache.put("b", MESSAGE, ttl=0.01)
+        cache.put("c", MESSAGE, ttl=60)
+        self.assertIsNone(cache.get("a"))
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c")["content"], MESSAGE["content"])
+
+    def test_disk_store_survives_restart(self):
+        settings = Settings(response_cache_disk="on")
+        response_cache.ResponseCache().configure(settings).put("k1", MESSAGE, ttl=60)
+        self.assertEqual(response_cache.ResponseCache().configure(settings).get("k1"), MESSAGE)
+
+    def test_disk_store_is_pruned_on_write(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = Path(tmp)
+            cache = response_cache.ResponseCache(disk_dir=directory, max_disk_entries=3)
+            cache.put("expired", MESSAGE, ttl=0.01)
+            time.sleep(0.02)
+            for idx in range(5):
+                cache.put(f"k{idx}", MESSAGE, ttl=60)
+                os.utime(directory / f"k{idx}.json", (idx + 1e9, idx + 1e9))
+            self.assertLessEqual(len(list(directory.glob("*.json"))), 4)
+            with mock.patch.object(response_cache, "PRUNE_INTERVAL", 0):
+                cache.put("k5", MESSAGE, ttl=60)
+            names = sorted(path.stem for path in directory.glob("*.json"))
+        self.assertEqual(names, ["k3", "k4", "k5"])
+
+    def test_stream_flag_does_not_change_the_key(self):
+        payload = {"model": "m", "messages": [], "stream": True, "stream_options": {"include_usage": True}}
+        plain = {"model": "m", "messages": []}
+        self.assertEqual(response_cache.cache_key("poe", "m", payload), response_cache.cache_key("poe", "m", plain))
+
+    def test_eligibility(self):
+        on = Settings(response_cache="on", response_cache_models="poe:gpt-5.1-mini")
+        self.assertTrue(response_cache.is_cacheable(REQUEST, {}, "poe", "claude-haiku-4.5", on))
+        self.assertFalse(response_cache.is_cacheable(dict(REQUEST, tools=[{"name": "Bash"}]), {}, "poe", "x", on))
+        self.assertFalse(response_cache.is_cacheable(dict(REQUEST, temperature=1), {}, "poe", "x", on))
+        self.assertTrue(response_cache.is_cacheable(dict(REQUEST, temperature=1), {}, "poe", "gpt-5.1-mini", on))
+        self.assertFalse(response_cache.is_cacheable(REQUEST, {}, "poe", "x", Settings(response_cache="off")))
+        opt_in = {"x-cc-adapter-cache": "on"}
+        self.assertTrue(response_cache.is_cacheable(dict(REQUEST, temperature=1), opt_in, "poe", "x", on))
+        self.assertFalse(response_cache.is_cacheable(REQUEST, opt_in, "poe", "x", Settings(response_cache="off")))
+        with_tools = dict(REQUEST, tools=[{"name": "Bash"}])
+        self.assertFalse(response_cache.is_cacheable(with_tools, opt_in, "poe", "x", on))
+        self.assertFalse(response_cache.is_cacheable(REQUEST, {"x-cc-adapter-cache": "off"}, "poe", "x", on))
+
+
+class ResponseCacheDispatchTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        breaker.REGISTRY.reset()
+        response_cache.CACHE.clear()
+        self.settings = Settings(
+            model="poe:claude-haiku-4.5", poe_api_key="poe-key", response_cache="on", sse_ping_interval=0
+        )
+
+    def test_repeated_request_is_served_from_cache(self):
+        reply = dict(MESSAGE, content=[{"type": "text", "text": "Fix typo"}], stop_reason="end_turn")
+        with mock.patch.object(server.poe, "send", return_value=reply) as poe_send:
+            first = RecordingHandler(self.settings, REQUEST)
+            first.do_POST()
+            second = RecordingHandler(self.settings, REQUEST)
+            second.do_POST()
+
+        self.assertEqual(poe_send.call_count, 1)
+        self.assertEqual(json.loads(second.wfile.getvalue())["content"], reply["content"])
+        self.assertEqual(second.sent_headers.get("X-CC-Adapter-Cache"), "hit")
+        self.assertNotIn("X-CC-Adapter-Cache", first.sent_headers)
+        self.assertEqual(metrics.REGISTRY.get("response_cache.hits"), 1)
+
+    def test_streamed_answer_is_replayed_as_sse(self):
+        def fake_stream(payload, settings, target_model, incoming, handler, _logger):
+            streaming.start_sse_response(handler)
+            streaming.stream_openai_response(TextResponse(), target_model, incoming, handler, _quiet_logger(), settings)
+
+        body = dict(REQUEST, stream=True)
+        with mock.patch.object(server.poe, "stream", side_effect=fake_stream) as poe_stream:
+            RecordingHandler(self.settings, body).do_POST()
+            replayed = RecordingHandler(self.settings, body)
+            replayed.do_POST()
+            as_json = RecordingHandler(self.settings, REQUEST)
+            as_json.do_POST()
+
+        self.assertEqual(poe_stream.call_count, 1)
+        message = response_cache.message_from_sse(replayed.wfile.getvalue())
+        self.assertEqual(message["content"], [{"type": "text", "text": "Fix typo"}])
+        self.assertEqual(json.loads(as_json.wfile.getvalue())["content"][0]["text"], "Fix typo")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ["CC_ADAPTER_CONFIG_DIR"] = tempfile.mkdtemp(prefix="cc-adapter-tests-")
+
+from cc_adapter import breaker, routing, server
+from cc_adapter.config import Settings
+from helpers import RecordingHandler
+
+TITLE_SYSTEM = "Summarize this coding conversation in under 50 characters."
+
+TABLE = json.dumps(
+    [
+        {
+            "name": "tiny-no-tools",
+            "match": {"max_tokens_lte": 512, "tools": False},
+            "target": "openrouter:openai/gpt-5.1-codex-mini",
+            "reasoning_effort": "minimal",
+        },
+        {"name": "bogus", "match": {"colour": "red"}, "target": "poe:x"},
+        {"name": "bad-target", "match": {"tools": True}, "target": "nowhere:x"},
+    ]
+)
+
+
+class RoutingTableTestCase(unittest.TestCase):
+    def test_invalid_routes_are_skipped(self):
+        names = [route.name for route in routing.parse_routes(TABLE)]
+        self.assertEqual(names, ["tiny-no-tools", "haiku-requested", "haiku-codex-mini"])
+
+    def test_table_is_parsed_once_per_spec(self):
+        routing.ROUTES.clear()
+        settings = Settings(model="poe:claude-opus-4.5", routing_table=TABLE)
+        with mock.patch.object(routing.ROUTES, "_parse", wraps=routing.ROUTES._parse) as parse:
+            for _ in range(3):
+                routing.decide({"model": "claude-opus-4.5", "max_tokens": 100}, settings)
+        self.assertEqual(parse.call_count, 1)
+
+    def test_custom_route_by_request_shape(self):
+        settings = Settings(model="poe:claude-opus-4.5", routing_table=TABLE)
+        small = {"model": "claude-opus-4.5", "max_tokens": 100, "messages": []}
+        decision = routing.decide(small, settings)
+        expected = routing.Decision("openrouter", "openai/gpt-5.1-codex-mini", "minimal", "tiny-no-tools")
+        self.assertEqual(decision, expected)
+
+        with_tools = dict(small, tools=[{"name": "Bash"}])
+        self.assertEqual(routing.decide(with_tools, settings).rule, "")
+        self.assertEqual(routing.decide(dict(small, max_tokens=32000), settings).provider, "poe")
+
+    def test_system_fingerprint_route(self):
+        incoming = {"model": "claude-opus-4.5", "system": [{"type": "text", "text": TITLE_SYSTEM}]}
+        table = json.dumps(
+            [
+                {
+                    "name": "titles",
+                    "match": {"system_fingerprint": routing.system_fingerprint(incoming)},
+                    "target": "lmstudio:qwen3-4b",
+                }
+            ]
+        )
+        decision = routing.decide(incoming, Settings(model="poe:claude-opus-4.5", routing_table=table))
+        self.assertEqual((decision.provider, decision.model, decision.rule), ("lmstudio", "qwen3-4b", "titles"))
+        other = dict(incoming, system="You are Claude Code.")
+        self.assertEqual(routing.decide(other, Settings(model="poe:claude-opus-4.5", routing_table=table)).rule, "")
+
+    def test_invalid_default_model_is_rejected(self):
+        with self.assertRaises(ValueError):
+            routing.decide({"model": "claude-opus-4.5"}, Settings(model="claude-opus-4.5"))
+
+
+class RoutingDispatchTestCase(unittest.TestCase):
+    def setUp(self):
+        breaker.REGISTRY.reset()
+
+    def test_route_target_and_effort_reach_the_provider(self):
+        settings = Settings(model="poe:claude-opus-4.5", poe_api_key="k1", openrouter_key="k2", routing_table=TABLE)
+        body = {"model": "claude-opus-4.5", "max_tokens": 64, "messages": [{"role": "user", "content": "title?"}]}
+        reply = {"choices": [{"message": {"role": "assistant", "content": "Title"}, "finish_reason": "stop"}]}
+        handler = RecordingHandler(settings, body)
+        with mock.patch.object(server.openrouter, "send", return_value=reply) as openrouter_send:
+            with self.assertLogs("cc-adapter", level="INFO") as logs:
+                handler.do_POST()
+
+        payload, hop_settings, target = openrouter_send.call_args[0]
+        self.assertEqual(target, "openai/gpt-5.1-codex-mini")
+        self.assertEqual(payload["reasoning"], {"effort": "minimal"})
+        self.assertEqual(hop_settings.model, "openrouter:openai/gpt-5.1-codex-mini")
+        self.assertTrue(any("route=tiny-no-tools" in line for line in logs.output))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import threading
+import time
+import unittest
+
+from cc_adapter import metrics, scheduler
+from cc_adapter.config import Settings
+
+MAIN_REQUEST = {"model": "claude-opus-4.5", "tools": [{"name": "Bash"}, {"name": "Task"}]}
+SUBAGENT_REQUEST = {"model": "claude-opus-4.5", "tools": [{"name": "Bash"}, {"name": "Read"}]}
+HAIKU_REQUEST = {"model": "claude-haiku-4.5", "tools": [{"name": "Bash"}]}
+
+
+class ClassifyTestCase(unittest.TestCase):
+    def test_request_shapes(self):
+        self.assertEqual(scheduler.classify(MAIN_REQUEST), scheduler.MAIN)
+        self.assertEqual(scheduler.classify(SUBAGENT_REQUEST), scheduler.SUBAGENT)
+        self.assertEqual(scheduler.classify(HAIKU_REQUEST), scheduler.BACKGROUND)
+        self.assertEqual(scheduler.classify({"model": "claude-opus-4.5"}), scheduler.BACKGROUND)
+
+    def test_header_override(self):
+        self.assertEqual(scheduler.classify(HAIKU_REQUEST, {"X-CC-Adapter-Priority": "main"}), scheduler.MAIN)
+        self.assertEqual(scheduler.classify(MAIN_REQUEST, {"x-cc-adapter-priority": "2"}), scheduler.BACKGROUND)
+        self.assertEqual(scheduler.classify(MAIN_REQUEST, {"x-cc-adapter-priority": "bogus"}), scheduler.MAIN)
+
+
+class PrioritySchedulerTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        scheduler.REGISTRY.reset()
+
+    def _queue(self, pool, priority, order, label, queued):
+        def _run():
+            with pool.slot(priority):
+                order.append(label)
+
+        thread = threading.Thread(target=_run)
+        thread.start()
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline and sum(pool.snapshot()["queued"].values()) < queued:
+            time.sleep(0.001)
+        return thread
+
+    def test_unlimited_by_default(self):
+        pool = scheduler.for_provider(Settings(), "poe")
+        for _ in range(5):
+            self.assertEqual(pool.acquire(scheduler.BACKGROUND), 0.0)
+        self.assertEqual(pool.snapshot()["active"], 5)
+
+    def test_higher_classes_are_served_first(self):
+        pool = scheduler.for_provider(Settings(scheduler_concurrency=1, scheduler_aging=0), "poe")
+        pool.acquire(scheduler.MAIN)
+        order = []
+        threads = [
+            self._queue(pool, scheduler.BACKGROUND, order, "haiku", queued=1),
+            self._queue(pool, scheduler.SUBAGENT, order, "subagent", queued=2),
+            self._queue(pool, scheduler.MAIN, order, "main", queued=3),
+        ]
+        self.assertEqual(pool.snapshot()["queued"], {"main": 1, "subagent": 1, "background": 1})
+        pool.release()
+        for thread in threads:
+            thread.join(2)
+        self.assertEqual(order, ["main", "subagent", "haiku"])
+        self.assertEqual(metrics.REGISTRY.get("scheduler.queued.background"), 1)
+
+    def test_aging_promotes_long_waiting_background_work(self):
+        pool = scheduler.for_provider(Settings(scheduler_concurrency=1, scheduler_aging=0.01), "openrouter")
+        pool.acquire(scheduler.MAIN)
+        order = []
+        background = self._queue(pool, scheduler.BACKGROUND, order, "haiku", queued=1)
+        time.sleep(0.05)
+        main = self._queue(pool, scheduler.MAIN, order, "main", queued=2)
+        pool.release()
+        background.join(2)
+        main.join(2)
+        self.assertEqual(order, ["haiku", "main"])
+
+    def test_waiter_leaves_the_queue_at_its_deadline(self):
+        pool = scheduler.for_provider(Settings(scheduler_concurrency=1), "poe")
+        pool.acquire(scheduler.MAIN)
+        queued = []
+        with self.assertRaises(scheduler.QueueAbandoned) as ctx:
+            pool.acquire(scheduler.SUBAGENT, deadline=time.monotonic() + 0.05, on_queue=lambda: queued.append(1))
+        self.assertEqual(ctx.exception.reason, "deadline")
+        self.assertEqual(queued, [1])
+        self.assertEqual(sum(pool.snapshot()["queued"].values()), 0)
+        self.assertEqual(metrics.REGISTRY.get("scheduler.abandoned.deadline"), 1)
+        pool.release()
+        self.assertEqual(pool.snapshot()["active"], 0)
+
+    def test_disconnected_waiter_gives_up(self):
+        pool = scheduler.for_provider(Settings(scheduler_concurrency=1), "poe")
+        pool.acquire(scheduler.MAIN)
+        with self.assertRaises(scheduler.QueueAbandoned) as ctx:
+            pool.acquire(scheduler.MAIN, cancelled=lambda: True)
+        self.assertEqual(ctx.exception.reason, "disconnected")
+        self.assertEqual(sum(pool.snapshot()["queued"].values()), 0)
+
+    def test_try_acquire_never_queues(self):
+        pool = scheduler.for_provider(Settings(scheduler_concurrency=1), "poe")
+        self.assertTrue(pool.try_acquire())
+        self.assertFalse(pool.try_acquire())
+        pool.release()
+        self.assertTrue(pool.try_acquire())
+
+
+if __name__ == "__main__":
+    unittest.main()
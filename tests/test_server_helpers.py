@@ -7,7 +7,7 @@ from unittest import mock
 
 os.environ["CC_ADAPTER_CONFIG_DIR"] = tempfile.mkdtemp(prefix="cc-adapter-tests-")
 
-from cc_adapter import streaming
+from cc_adapter import routing, streaming
 from cc_adapter.config import Settings
 from cc_adapter.models import available_models, resolve_provider_model
 from cc_adapter import server
@@ -75,31 +75,25 @@ class ServerHelpersTestCase(unittest.TestCase):
         self.assertEqual(provider, "lmstudio")
         self.assertEqual(name, "gpt-oss-120b")
 
-    def test_effective_codex_settings_maps_haiku_to_codex_mini(self):
-        settings = Settings(model="codex:gpt-5.2-xhigh")
-        effective, model = server._effective_codex_settings(settings, "claude-haiku-4.5", "gpt-5.2")
-        self.assertEqual(model, server.CODEX_HAIKU_FALLBACK_MODEL)
-        self.assertEqual(effective.model, f"codex:{server.CODEX_HAIKU_FALLBACK_MODEL}")
+    def test_routing_maps_haiku_to_codex_mini(self):
+        decision = routing.decide({"model": "claude-haiku-4.5"}, Settings(model="codex:gpt-5.2-xhigh"))
+        self.assertEqual((decision.provider, decision.model), ("codex", "gpt-5.1-codex-mini"))
+        self.assertEqual(decision.rule, "haiku-codex-mini")
 
-    def test_effective_codex_settings_maps_haiku_to_codex_mini_codex_max(self):
+    def test_routing_maps_haiku_to_codex_mini_codex_max(self):
         settings = Settings(model="codex:gpt-5.1-codex-max-xhigh")
-        effective, model = server._effective_codex_settings(
-            settings, "claude-haiku-4-5-20251001", "gpt-5.1-codex-max"
-        )
-        self.assertEqual(model, server.CODEX_HAIKU_FALLBACK_MODEL)
-        self.assertEqual(effective.model, f"codex:{server.CODEX_HAIKU_FALLBACK_MODEL}")
-
-    def test_effective_codex_settings_noop_for_non_haiku(self):
-        settings = Settings(model="codex:gpt-5.2-xhigh")
-        effective, model = server._effective_codex_settings(settings, "claude-opus-4.5", "gpt-5.2")
-        self.assertEqual(model, "gpt-5.2")
-        self.assertEqual(effective.model, "codex:gpt-5.2-xhigh")
-
-    def test_effective_codex_settings_noop_when_not_codex(self):
-        settings = Settings(model="poe:claude-opus-4.5")
-        effective, model = server._effective_codex_settings(settings, "claude-haiku-4.5", "gpt-5.2")
-        self.assertEqual(model, "gpt-5.2")
-        self.assertEqual(effective.model, "poe:claude-opus-4.5")
+        decision = routing.decide({"model": "claude-haiku-4-5-20251001"}, settings)
+        self.assertEqual((decision.provider, decision.model), ("codex", "gpt-5.1-codex-mini"))
+
+    def test_routing_noop_for_non_haiku_on_codex(self):
+        decision = routing.decide({"model": "claude-opus-4.5"}, Settings(model="codex:gpt-5.2-xhigh"))
+        self.assertEqual(decision.provider, "codex")
+        self.assertEqual(decision.rule, "")
+
+    def test_routing_keeps_requested_haiku_when_not_codex(self):
+        decision = routing.decide({"model": "claude-haiku-4.5"}, Settings(model="poe:claude-opus-4.5"))
+        self.assertEqual((decision.provider, decision.model), ("poe", "claude-haiku-4.5"))
+        self.assertEqual(decision.rule, "haiku-requested")
 
     def test_available_models_reflect_keys(self):
         settings = Settings(
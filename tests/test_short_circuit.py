@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ["CC_ADAPTER_CONFIG_DIR"] = tempfile.mkdtemp(prefix="cc-adapter-tests-")
+
+from cc_adapter import breaker, metrics, response_cache, server, shortcircuit
+from cc_adapter.config import Settings
+from helpers import RecordingHandler
+
+
+PROBE = {"model": "claude-haiku-4.5", "max_tokens": 1, "messages": [{"role": "user", "content": "quota"}]}
+
+CLASSIFIER = {
+    "model": "claude-haiku-4.5",
+    "max_tokens": 512,
+    "system": [{"type": "text", "text": "Analyze if this message indicates a new conversation topic."}],
+    "messages": [{"role": "user", "content": "now fix the tests"}],
+}
+
+
+class ShortCircuitRulesTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(shortcircuit.match(PROBE, Settings(short_circuit="off")))
+
+    def test_builtin_rules_match_by_shape(self):
+        settings = Settings(short_circuit="on")
+        self.assertEqual(shortcircuit.match(PROBE, settings).name, "quota-probe")
+        self.assertEqual(shortcircuit.match(CLASSIFIER, settings).name, "topic-classifier")
+        self.assertIsNone(shortcircuit.match(dict(PROBE, tools=[{"name": "Bash"}]), settings))
+        self.assertIsNone(shortcircuit.match(dict(PROBE, max_tokens=64), settings))
+        self.assertEqual(metrics.REGISTRY.get("shortcircuit.quota-probe"), 1)
+        self.assertEqual(metrics.REGISTRY.get("shortcircuit.topic-classifier"), 1)
+
+    def test_custom_rules_come_first_and_invalid_ones_are_skipped(self):
+        spec = json.dumps(
+            [
+                {"name": "bad", "match": {"colour": "blue"}, "reply": "x"},
+                {"name": "local-probe", "match": {"max_tokens_lte": 1}, "route": "lmstudio"},
+            ]
+        )
+        rules = shortcircuit.parse_rules(spec)
+        self.assertEqual([rule.name for rule in rules], ["local-probe", "quota-probe", "topic-classifier"])
+        settings = Settings(short_circuit="on", short_circuit_rules=spec, lmstudio_model="qwen3-4b")
+        rule = shortcircuit.match(PROBE, settings)
+        self.assertEqual(shortcircuit.route_target(rule, settings), ("lmstudio", "qwen3-4b"))
+
+    def test_rules_file(self):
+        path = os.path.join(os.environ["CC_ADAPTER_CONFIG_DIR"], "rules.json")
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump([{"name": "ping", "match": {"text_contains": "ping"}, "reply": "pong"}], handle)
+        self.assertEqual(shortcircuit.parse_rules(path)[0].name, "ping")
+
+    def test_parsed_rules_are_cached_until_the_file_changes(self):
+        path = os.path.join(os.environ["CC_ADAPTER_CONFIG_DIR"], "cached-rules.json")
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump([{"name": "ping", "match": {"text_contains": "ping"}, "reply": "pong"}], handle)
+        with mock.patch.object(shortcircuit.RULES, "_parse", wraps=shortcircuit.RULES._parse) as parse:
+            shortcircuit.parse_rules(path)
+            shortcircuit.parse_rules(path)
+            self.assertEqual(parse.call_count, 1)
+            with open(path, "w", encoding="utf-8") as handle:
+                json.dump([{"name": "pong", "match": {"text_contains": "pong"}, "reply": "ping"}], handle)
+            os.utime(path, (0, os.stat(path).st_mtime + 5))
+            self.assertEqual(shortcircuit.parse_rules(path)[0].name, "pong")
+        self.assertEqual(parse.call_count, 2)
+
+
+class ShortCircuitDispatchTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        breaker.REGISTRY.reset()
+        self.settings = Settings(model="poe:claude-opus-4.5", poe_api_key="poe-key", short_circuit="on")
+
+    def test_probe_is_answered_without_upstream(self):
+        handler = RecordingHandler(self.settings, PROBE)
+        with mock.patch.object(server.poe, "send") as poe_send:
+            handler.do_POST()
+
+        poe_send.assert_not_called()
+        self.assertEqual(handler.status, 200)
+        self.assertEqual(handler.sent_headers["X-CC-Adapter-Short-Circuit"], "quota-probe")
+        body = json.loads(handler.wfile.getvalue())
+        self.assertEqual(body["stop_reason"], "max_tokens")
+
+    def test_streaming_classifier_reply_is_valid_sse(self):
+        handler = RecordingHandler(self.settings, dict(CLASSIFIER, stream=True))
+        handler.do_POST()
+        message = response_cache.message_from_sse(handler.wfile.getvalue())
+        self.assertEqual(json.loads(message["content"][0]["text"]), {"isNewTopic": False, "title": None})
+
+    def test_route_rule_sends_request_to_lmstudio(self):
+        spec = json.dumps([{"name": "local", "match": {"text_contains": "summarize"}, "route": "lmstudio:qwen3-4b"}])
+        settings = Settings(
+            model="poe:claude-opus-4.5", poe_api_key="poe-key", short_circuit="on", short_circuit_rules=spec
+        )
+        body = {"model": "claude-opus-4.5", "max_tokens": 64, "messages": [{"role": "user", "content": "summarize"}]}
+        reply = {"choices": [{"message": {"role": "assistant", "content": "done"}, "finish_reason": "stop"}]}
+        handler = RecordingHandler(settings, body)
+        with mock.patch.object(server.lmstudio, "send", return_value=reply) as lm_send, mock.patch.object(
+            server.poe, "send"
+        ) as poe_send:
+            handler.do_POST()
+
+        poe_send.assert_not_called()
+        self.assertEqual(lm_send.call_count, 1)
+        self.assertEqual(handler.sent_headers["X-CC-Adapter-Served-By"], "lmstudio:qwen3-4b")
+        self.assertEqual(metrics.REGISTRY.get("shortcircuit.local"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
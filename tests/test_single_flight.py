@@ -0,0 +1,144 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+os.environ["CC_ADAPTER_CONFIG_DIR"] = tempfile.mkdtemp(prefix="cc-adapter-tests-")
+
+from cc_adapter import breaker, metrics, server, singleflight, streaming
+from cc_adapter.config import Settings
+from helpers import RecordingHandler
+
+
+class GatedResponse:
+    headers = {}
+
+    def __init__(self, gate: threading.Event):
+        self.gate = gate
+
+    def iter_lines(self, decode_unicode=False):
+        yield b'data: {"choices": [{"delta": {"content": [{"type": "text", "text": "shared "}]}}]}'
+        self.gate.wait(5)
+        yield b'data: {"choices": [{"delta": {"content": [{"type": "text", "text": "answer"}]}}]}'
+        yield b'data: {"choices": [{"delta": {}, "finish_reason": "stop"}]}'
+
+    def close(self):
+        return
+
+
+REQUEST = {"model": "claude-haiku-4.5", "messages": [{"role": "user", "content": "classify"}], "max_tokens": 16}
+
+REPLY = {
+    "id": "msg_1",
+    "type": "message",
+    "role": "assistant",
+    "content": [{"type": "text", "text": "shared"}],
+    "stop_reason": "end_turn",
+    "usage": {"input_tokens": 1, "output_tokens": 1},
+}
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def _events(handler):
+    return [line for line in handler.wfile.getvalue().decode().splitlines() if line.startswith("event:")]
+
+
+class SingleFlightTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        breaker.REGISTRY.reset()
+        self.settings = Settings(
+            model="poe:claude-haiku-4.5", poe_api_key="poe-key", single_flight="on", sse_ping_interval=0
+        )
+
+    def _run_pair(self, body):
+        leader = RecordingHandler(self.settings, body)
+        follower = RecordingHandler(self.settings, body)
+        leader_thread = threading.Thread(target=leader.do_POST)
+        leader_thread.start()
+        _wait_for(lambda: len(singleflight.GROUP) == 1)
+        follower_thread = threading.Thread(target=follower.do_POST)
+        follower_thread.start()
+        _wait_for(lambda: metrics.REGISTRY.get("singleflight.coalesced") == 1)
+        return leader, follower, leader_thread, follower_thread
+
+    def test_identical_requests_share_one_upstream_call(self):
+        gate = threading.Event()
+
+        def slow_send(*_args, **_kwargs):
+            gate.wait(5)
+            return REPLY
+
+        with mock.patch.object(server.poe, "send", side_effect=slow_send) as poe_send:
+            leader, follower, *threads = self._run_pair(REQUEST)
+            gate.set()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(poe_send.call_count, 1)
+        self.assertEqual(leader.status, 200)
+        self.assertEqual(follower.status, 200)
+        self.assertEqual(json.loads(follower.wfile.getvalue())["content"][0]["text"], "shared")
+        self.assertEqual(len(singleflight.GROUP), 0)
+
+    def test_streaming_follower_gets_replay_then_tail(self):
+        gate = threading.Event()
+        logger = logging.getLogger("single-flight-test")
+        logger.setLevel(logging.CRITICAL)
+
+        def gated_stream(payload, settings, target_model, incoming, handler, _logger):
+            streaming.start_sse_response(handler)
+            streaming.stream_openai_response(GatedResponse(gate), target_model, incoming, handler, logger, settings)
+
+        with mock.patch.object(server.poe, "stream", side_effect=gated_stream) as poe_stream:
+            leader, follower, *threads = self._run_pair(dict(REQUEST, stream=True))
+            gate.set()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(poe_stream.call_count, 1)
+        self.assertEqual(_events(leader), _events(follower))
+        self.assertEqual(leader.wfile.getvalue(), follower.wfile.getvalue())
+        self.assertEqual(_events(follower)[-1], "event: message_stop")
+
+    def test_follower_fails_like_the_leader_before_output(self):
+        gate = threading.Event()
+
+        def failing_send(*_args, **_kwargs):
+            gate.wait(5)
+            raise requests.ConnectionError("refused")
+
+        self.settings = Settings(
+            model="poe:claude-haiku-4.5", poe_api_key="poe-key", single_flight="on", upstream_max_retries=0
+        )
+        with mock.patch.object(server.poe, "send", side_effect=failing_send):
+            leader, follower, *threads = self._run_pair(REQUEST)
+            gate.set()
+            for thread in threads:
+                thread.join(5)
+
+        self.assertEqual(leader.status, 502)
+        self.assertEqual(follower.status, 502)
+
+    def test_disabled_by_default(self):
+        self.assertFalse(server._truthy(Settings().single_flight))
+
+    def test_flight_key_ignores_key_order(self):
+        first = singleflight.flight_key("poe", "m", {"a": 1, "b": [1, 2]})
+        self.assertEqual(first, singleflight.flight_key("poe", "m", {"b": [1, 2], "a": 1}))
+        self.assertNotEqual(first, singleflight.flight_key("openrouter", "m", {"a": 1, "b": [1, 2]}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import logging
+import threading
+import unittest
+
+from cc_adapter import streaming
+from cc_adapter.config import Settings
+
+
+class SlowResponse:
+    """Upstream that goes silent between two chunks."""
+
+    def __init__(self, silence: float):
+        self.headers = {}
+        self.silence = silence
+        self.closed = False
+
+    def iter_lines(self, decode_unicode=False):
+        yield b'data: {"choices": [{"delta": {"content": "a"}}]}'
+        threading.Event().wait(self.silence)
+        yield b'data: {"choices": [{"delta": {"content": "b"}, "finish_reason": "stop"}]}'
+
+    def close(self):
+        self.closed = True
+
+
+class DummyHandler:
+    def __init__(self):
+        self.buffer = b""
+        self.close_connection = False
+        self.wfile = self
+
+    def write(self, data: bytes):
+        self.buffer += data
+
+    def flush(self):
+        return
+
+
+class SSEKeepaliveTestCase(unittest.TestCase):
+    def test_ping_emitted_during_upstream_silence(self):
+        handler = DummyHandler()
+        logger = logging.getLogger("sse-keepalive-test")
+        logger.setLevel(logging.CRITICAL)
+
+        streaming.stream_openai_response(
+            SlowResponse(0.35), "poe:deepseek-v3.2", {}, handler, logger, Settings(sse_ping_interval=0.1)
+        )
+
+        body = handler.buffer.decode("utf-8")
+        self.assertIn("event: ping", body)
+        self.assertLess(body.index("event: message_start"), body.index("event: ping"))
+        self.assertLess(body.index("event: ping"), body.index("event: message_stop"))
+        self.assertEqual(body.count("event: message_stop"), 1)
+
+    def test_no_ping_when_disabled(self):
+        handler = DummyHandler()
+        logger = logging.getLogger("sse-keepalive-off-test")
+        logger.setLevel(logging.CRITICAL)
+
+        streaming.stream_openai_response(
+            SlowResponse(0.2), "poe:deepseek-v3.2", {}, handler, logger, Settings(sse_ping_interval=0)
+        )
+
+        self.assertNotIn(b"event: ping", handler.buffer)
+
+
+if __name__ == "__main__":
+    unittest.main()
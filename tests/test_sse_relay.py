@@ -0,0 +1,131 @@
+import logging
+import threading
+import time
+import unittest
+
+from cc_adapter import metrics, streaming
+from cc_adapter.config import Settings
+from cc_adapter.sse import SSEWriter
+
+
+class ChattyResponse:
+    def __init__(self, count: int):
+        self.headers = {}
+        self.count = count
+        self.finished_at = None
+
+    def iter_lines(self, decode_unicode=False):
+        for idx in range(self.count):
+            yield ('data: {"choices": [{"delta": {"content": [{"type": "text", "text": "t%d "}]}}]}' % idx).encode()
+        self.finished_at = time.monotonic()
+        yield b'data: {"choices": [{"delta": {}, "finish_reason": "stop"}]}'
+
+    def close(self):
+        return
+
+
+class SlowClient:
+    def __init__(self, delay: float = 0.0, gate: threading.Event = None):
+        self.buffer = b""
+        self.close_connection = False
+        self.wfile = self
+        self.delay = delay
+        self.gate = gate
+        self.last_write_at = None
+
+    def write(self, data: bytes):
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.delay:
+            time.sleep(self.delay)
+        self.buffer += data
+        self.last_write_at = time.monotonic()
+
+    def flush(self):
+        return
+
+
+def _logger(name):
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.CRITICAL)
+    return logger
+
+
+class SSERelayTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+
+    def test_relay_output_matches_direct_writes(self):
+        direct = SlowClient()
+        streaming.stream_openai_response(
+            ChattyResponse(20), "poe:x", {}, direct, _logger("relay-direct"), Settings(sse_ping_interval=0)
+        )
+        relayed = SlowClient(delay=0.002)
+        streaming.stream_openai_response(
+            ChattyResponse(20),
+            "poe:x",
+            {},
+            relayed,
+            _logger("relay-on"),
+            Settings(sse_ping_interval=0, sse_relay_buffer=1 << 20),
+        )
+
+        self.assertEqual(direct.buffer.count(b"event:"), relayed.buffer.count(b"event:"))
+        self.assertTrue(relayed.buffer.rstrip().endswith(b'{"type": "message_stop"}'))
+        self.assertEqual(metrics.REGISTRY.get("relay.streams"), 1)
+
+    def test_upstream_drained_ahead_of_slow_client(self):
+        client = SlowClient(delay=0.01)
+        resp = ChattyResponse(30)
+        streaming.stream_openai_response(
+            resp, "poe:x", {}, client, _logger("relay-slow"), Settings(sse_ping_interval=0, sse_relay_buffer=1 << 20)
+        )
+        self.assertLess(resp.finished_at, client.last_write_at)
+
+    def test_disconnect_policy_drops_client_past_high_water(self):
+        gate = threading.Event()
+        client = SlowClient(gate=gate)
+        try:
+            streaming.stream_openai_response(
+                ChattyResponse(50),
+                "poe:x",
+                {},
+                client,
+                _logger("relay-drop"),
+                Settings(sse_ping_interval=0, sse_relay_buffer=512, sse_relay_policy="disconnect"),
+            )
+        finally:
+            gate.set()
+        self.assertTrue(client.close_connection)
+        self.assertEqual(metrics.REGISTRY.get("relay.slow_client_dropped"), 1)
+
+    def test_block_policy_applies_backpressure(self):
+        client = SlowClient(delay=0.005)
+        writer = SSEWriter(client).start_relay(256, "block")
+        for idx in range(20):
+            writer.send("ping", {"type": "ping", "n": idx})
+        writer.close_relay()
+        self.assertEqual(client.buffer.count(b"event: ping"), 20)
+        self.assertGreater(metrics.REGISTRY.get("relay.backpressure_waits"), 0)
+
+    def test_block_policy_drops_a_stalled_client_after_the_stall_timeout(self):
+        gate = threading.Event()
+        client = SlowClient(gate=gate)
+        try:
+            streaming.stream_openai_response(
+                ChattyResponse(50),
+                "poe:x",
+                {},
+                client,
+                _logger("relay-stall"),
+                Settings(sse_ping_interval=0, sse_relay_buffer=512, sse_relay_stall_timeout=0.1),
+            )
+        finally:
+            gate.set()
+        self.assertTrue(client.close_connection)
+        self.assertGreater(metrics.REGISTRY.get("relay.backpressure_waits"), 0)
+        self.assertEqual(metrics.REGISTRY.get("relay.slow_client_dropped"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,10 @@
 import logging
 import unittest
 
+import requests
+
 from cc_adapter import streaming
+from cc_adapter.config import Settings
 
 
 class DummyResponse:
@@ -23,6 +26,15 @@ class DummyHandler:
         self.close_connection = False
         self.wfile = self
 
+    def send_response(self, status):
+        self.status = status
+
+    def send_header(self, key, value):
+        return
+
+    def end_headers(self):
+        return
+
     def write(self, data: bytes):
         self.buffer += data
 
@@ -44,6 +56,85 @@ class StreamingErrorHandlingTestCase(unittest.TestCase):
         self.assertIn("stop_reason\": \"error\"", body)
         self.assertIn("event: error", body)
 
+    def test_early_stream_sends_single_message_start(self):
+        handler = DummyHandler()
+        logger = logging.getLogger("stream-early-test")
+        logger.setLevel(logging.CRITICAL)
+
+        streaming.open_early_stream(handler, "poe:deepseek-v3.2", {}, logger)
+        self.assertIn(b"event: message_start", handler.buffer)
+
+        streaming.stream_openai_response(DummyResponse(), "poe:deepseek-v3.2", {}, handler, logger)
+
+        body = handler.buffer.decode("utf-8")
+        self.assertEqual(body.count("event: message_start"), 1)
+        self.assertIn("event: error", body)
+
+    def test_abort_stream_reports_upstream_failure_in_band(self):
+        handler = DummyHandler()
+        logger = logging.getLogger("stream-abort-test")
+        logger.setLevel(logging.CRITICAL)
+
+        writer = streaming.open_early_stream(handler, "poe:deepseek-v3.2", {}, logger)
+        streaming.abort_stream(writer, "Poe error: 503")
+
+        body = handler.buffer.decode("utf-8")
+        self.assertLess(body.index("event: message_start"), body.index("event: error"))
+        self.assertIn("Poe error: 503", body)
+        self.assertTrue(body.rstrip().endswith('{"type": "message_stop"}'))
+
+    def test_resume_continues_interrupted_text_in_same_block(self):
+        class InterruptedResponse(DummyResponse):
+            def iter_lines(self, decode_unicode=False):
+                yield b'data: {"choices": [{"delta": {"content": [{"type": "text", "text": "Hel"}]}}]}'
+                raise requests.exceptions.ChunkedEncodingError("connection reset")
+
+        class ResumedResponse(DummyResponse):
+            def iter_lines(self, decode_unicode=False):
+                yield b'data: {"choices": [{"delta": {"content": [{"type": "text", "text": "lo"}]}}]}'
+                yield b'data: {"choices": [{"delta": {}, "finish_reason": "stop"}]}'
+
+        handler = DummyHandler()
+        logger = logging.getLogger("stream-resume-test")
+        logger.setLevel(logging.CRITICAL)
+        partials = []
+
+        def resume(partial):
+            partials.append(partial)
+            return ResumedResponse()
+
+        streaming.stream_openai_response(
+            InterruptedResponse(),
+            "openrouter:x",
+            {},
+            handler,
+            logger,
+            Settings(stream_resume_attempts=1, sse_ping_interval=0),
+            resume=resume,
+        )
+
+        body = handler.buffer.decode("utf-8")
+        self.assertEqual(partials, ["Hel"])
+        self.assertEqual(body.count("event: content_block_start"), 1)
+        self.assertNotIn("event: error", body)
+        self.assertIn('"stop_reason": "end_turn"', body)
+
+    def test_resume_disabled_by_default(self):
+        class InterruptedResponse(DummyResponse):
+            def iter_lines(self, decode_unicode=False):
+                yield b'data: {"choices": [{"delta": {"content": [{"type": "text", "text": "Hel"}]}}]}'
+                raise requests.exceptions.ChunkedEncodingError("connection reset")
+
+        handler = DummyHandler()
+        logger = logging.getLogger("stream-resume-off-test")
+        logger.setLevel(logging.CRITICAL)
+
+        streaming.stream_openai_response(
+            InterruptedResponse(), "openrouter:x", {}, handler, logger, resume=lambda _partial: None
+        )
+
+        self.assertIn(b"event: error", handler.buffer)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,3 +1,4 @@
+import json
 import logging
 import unittest
 
@@ -99,6 +100,100 @@ class ResponsesStreamingBridgeTestCase(unittest.TestCase):
         self.assertIn("\\\"x\\\":1", body)
         self.assertIn("\"stop_reason\": \"tool_use\"", body)
 
+    def test_streaming_reports_cached_input_tokens(self):
+        handler = DummyHandler()
+        resp = DummyResponse(
+            [
+                b'data: {"type":"response.created","response_id":"resp_4"}',
+                b'data: {"type":"response.output_text.delta","item_id":"msg_1","output_index":0,"content_index":0,"delta":"hi"}',
+                b'data: {"type":"response.completed","response":{"id":"resp_4","usage":{"input_tokens":1000,"output_tokens":1,"input_tokens_details":{"cached_tokens":768}}}}',
+            ]
+        )
+        logger = logging.getLogger("responses-cache-test")
+        logger.setLevel(logging.CRITICAL)
+
+        streaming.stream_responses_response(resp, "codex:gpt-5.1-codex", {}, handler, logger)
+
+        body = handler.buffer.decode("utf-8")
+        self.assertIn("\"cache_read_input_tokens\": 768", body)
+        self.assertIn("\"input_tokens\": 232", body)
+
+    def test_streaming_captures_encrypted_reasoning_in_signature(self):
+        from cc_adapter.codex_reasoning import decode_reasoning_signature
+
+        handler = DummyHandler()
+        resp = DummyResponse(
+            [
+                b'data: {"type":"response.created","response_id":"resp_5"}',
+                b'data: {"type":"response.reasoning_summary_text.delta","item_id":"rs_1","delta":"thinking"}',
+                b'data: {"type":"response.output_item.done","output_index":0,"item":{"type":"reasoning","id":"rs_1","summary":[{"type":"summary_text","text":"thinking"}],"encrypted_content":"gAAA-secret"}}',
+                b'data: {"type":"response.output_text.delta","item_id":"msg_1","output_index":1,"content_index":0,"delta":"done"}',
+                b'data: {"type":"response.completed","response":{"id":"resp_5","usage":{"input_tokens":2,"output_tokens":1}}}',
+            ]
+        )
+        logger = logging.getLogger("responses-reasoning-test")
+        logger.setLevel(logging.CRITICAL)
+
+        streaming.stream_responses_response(resp, "codex:gpt-5.1-codex", {}, handler, logger)
+
+        events = [
+            json.loads(chunk.split("data: ", 1)[1])
+            for chunk in handler.buffer.decode("utf-8").split("\n\n")
+            if "data: " in chunk
+        ]
+        signatures = [
+            e["delta"]["signature"]
+            for e in events
+            if e.get("type") == "content_block_delta" and e["delta"].get("type") == "signature_delta"
+        ]
+        self.assertEqual(len(signatures), 1)
+        item = decode_reasoning_signature(signatures[0])
+        self.assertEqual(item["encrypted_content"], "gAAA-secret")
+        self.assertNotIn("id", item)
+        starts = [e for e in events if e.get("type") == "content_block_start"]
+        self.assertEqual([s["content_block"]["type"] for s in starts], ["thinking", "text"])
+
+    def test_streaming_passes_through_deltas_for_declared_tools(self):
+        handler = DummyHandler()
+        written_before_done = []
+
+        class ObservingResponse(DummyResponse):
+            def iter_lines(self, decode_unicode=False):
+                for line in self._lines:
+                    if b"function_call_arguments.done" in line:
+                        written_before_done.append(handler.buffer.decode("utf-8"))
+                    yield line
+
+        resp = ObservingResponse(
+            [
+                b'data: {"type":"response.created","response_id":"resp_6"}',
+                b'data: {"type":"response.output_item.added","output_index":0,"item":{"type":"function_call","id":"fc_1","call_id":"call_1","name":"Write","arguments":""}}',
+                b'data: {"type":"response.function_call_arguments.delta","item_id":"fc_1","output_index":0,"delta":"{\\"file_path\\":"}',
+                b'data: {"type":"response.function_call_arguments.delta","item_id":"fc_1","output_index":0,"delta":"\\"/a\\"}"}',
+                b'data: {"type":"response.function_call_arguments.done","item_id":"fc_1","output_index":0,"arguments":"{\\"file_path\\":\\"/a\\"}"}',
+                b'data: {"type":"response.completed","response":{"id":"resp_6","usage":{"input_tokens":3,"output_tokens":1}}}',
+            ]
+        )
+        incoming = {"tools": [{"name": "Write", "input_schema": {"type": "object", "properties": {}}}]}
+        logger = logging.getLogger("responses-passthrough-test")
+        logger.setLevel(logging.CRITICAL)
+
+        streaming.stream_responses_response(resp, "codex:gpt-5.1-codex", incoming, handler, logger)
+
+        self.assertIn("input_json_delta", written_before_done[0])
+        events = [
+            json.loads(chunk.split("data: ", 1)[1])
+            for chunk in handler.buffer.decode("utf-8").split("\n\n")
+            if "data: " in chunk
+        ]
+        partials = [
+            e["delta"]["partial_json"]
+            for e in events
+            if e.get("type") == "content_block_delta" and e["delta"].get("type") == "input_json_delta"
+        ]
+        self.assertEqual(partials, ['{"file_path":', '"/a"}'])
+        self.assertIn("\"stop_reason\": \"tool_use\"", handler.buffer.decode("utf-8"))
+
 
 if __name__ == "__main__":
     unittest.main()
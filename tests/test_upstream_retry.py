@@ -0,0 +1,127 @@
+import logging
+import unittest
+
+import requests
+
+from cc_adapter import metrics, retry, streaming
+from cc_adapter.config import Settings
+from cc_adapter.timeouts import UpstreamStalled
+
+
+class DummyResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def _http_error(status, headers=None):
+    original = requests.HTTPError(f"{status} error", response=DummyResponse(status, headers))
+    # Providers re-raise with the body appended, keeping the original as the cause.
+    wrapped = requests.HTTPError(f"{original} | body=...")
+    wrapped.__cause__ = original
+    return wrapped
+
+
+def _policy(provider="openrouter", **overrides):
+    values = {"upstream_max_retries": 2, "upstream_retry_backoff": 0.5, "upstream_retry_max_backoff": 8}
+    values.update(overrides)
+    return retry.RetryPolicy.for_provider(Settings(**values), provider)
+
+
+class Flaky:
+    def __init__(self, *failures):
+        self.failures = list(failures)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return "ok"
+
+
+class RetryLayerTestCase(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        self.sleeps = []
+
+    def test_retries_transient_status_then_succeeds(self):
+        call = Flaky(_http_error(503), requests.ConnectionError("reset"))
+        result = retry.call_with_retries(call, _policy(), sleep=self.sleeps.append)
+
+        self.assertEqual(result, "ok")
+        self.assertEqual(call.calls, 3)
+        self.assertEqual(metrics.REGISTRY.get("upstream.retries"), 2)
+        self.assertEqual(metrics.REGISTRY.get("upstream.retries.openrouter"), 2)
+        self.assertAlmostEqual(metrics.REGISTRY.get("upstream.retry_backoff_seconds"), sum(self.sleeps), places=2)
+        self.assertLessEqual(self.sleeps[0], 0.5)
+        self.assertLessEqual(self.sleeps[1], 1.0)
+
+    def test_honors_retry_after(self):
+        call = Flaky(_http_error(429, {"Retry-After": "3"}))
+        retry.call_with_retries(call, _policy(), sleep=self.sleeps.append)
+        self.assertEqual(self.sleeps, [3.0])
+
+    def test_gives_up_when_retry_after_exceeds_cap(self):
+        call = Flaky(_http_error(429, {"Retry-After": "120"}))
+        with self.assertRaises(requests.HTTPError):
+            retry.call_with_retries(call, _policy(), sleep=self.sleeps.append)
+        self.assertEqual(call.calls, 1)
+
+    def test_client_errors_are_not_retried(self):
+        call = Flaky(_http_error(400))
+        with self.assertRaises(requests.HTTPError):
+            retry.call_with_retries(call, _policy(), sleep=self.sleeps.append)
+        self.assertEqual(call.calls, 1)
+
+    def test_no_retry_once_client_output_started(self):
+        call = Flaky(_http_error(503))
+        with self.assertRaises(requests.HTTPError):
+            retry.call_with_retries(call, _policy(), can_retry=lambda: False, sleep=self.sleeps.append)
+        self.assertEqual(call.calls, 1)
+
+    def test_poe_transport_errors_left_to_session_retries(self):
+        policy = _policy("poe")
+        self.assertFalse(retry.is_retryable(_http_error(503), policy))
+        self.assertFalse(retry.is_retryable(requests.ConnectionError("reset"), policy))
+        self.assertTrue(retry.is_retryable(UpstreamStalled("first_byte", 1), policy))
+
+    def test_retry_after_http_date(self):
+        exc = _http_error(503, {"Retry-After": "Wed, 21 Oct 2015 07:28:05 GMT"})
+        self.assertEqual(retry.retry_after_seconds(exc, now=1445412480.0), 5.0)
+
+
+class BridgeRetryHandoffTestCase(unittest.TestCase):
+    def test_reset_before_output_is_raised_for_retry(self):
+        class ResetResponse:
+            headers = {}
+
+            def iter_lines(self, decode_unicode=False):
+                raise requests.exceptions.ChunkedEncodingError("connection reset")
+                yield b""
+
+            def close(self):
+                return
+
+        class DummyHandler:
+            def __init__(self):
+                self.buffer = b""
+                self.close_connection = False
+                self.wfile = self
+
+            def write(self, data):
+                self.buffer += data
+
+            def flush(self):
+                return
+
+        handler = DummyHandler()
+        logger = logging.getLogger("retry-handoff-test")
+        logger.setLevel(logging.CRITICAL)
+        with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+            streaming.stream_openai_response(ResetResponse(), "openrouter:x", {}, handler, logger)
+        self.assertEqual(handler.buffer, b"")
+
+
+if __name__ == "__main__":
+    unittest.main()
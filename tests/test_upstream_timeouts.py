@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+import unittest
+
+from cc_adapter import server, streaming, timeouts
+from cc_adapter.config import Settings
+
+
+class HangingResponse:
+    """Upstream that yields `lines` and then blocks until closed."""
+
+    def __init__(self, lines=()):
+        self.headers = {}
+        self.lines = list(lines)
+        self.closed = threading.Event()
+
+    def iter_lines(self, decode_unicode=False):
+        for line in self.lines:
+            yield line
+        self.closed.wait(5)
+
+    def close(self):
+        self.closed.set()
+
+
+class DummyHandler:
+    def __init__(self):
+        self.buffer = b""
+        self.close_connection = False
+        self.wfile = self
+
+    def send_response(self, status):
+        return
+
+    def send_header(self, key, value):
+        return
+
+    def end_headers(self):
+        return
+
+    def write(self, data: bytes):
+        self.buffer += data
+
+    def flush(self):
+        return
+
+
+def _logger(name):
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.CRITICAL)
+    return logger
+
+
+class PhaseTimeoutsTestCase(unittest.TestCase):
+    def test_provider_overrides(self):
+        settings = Settings(
+            upstream_connect_timeout=10,
+            upstream_first_byte_timeout=300,
+            upstream_idle_timeout=300,
+            upstream_timeouts="connect=5,poe.idle=120,bogus=1",
+            lmstudio_timeout=3600,
+        )
+        poe = timeouts.for_provider(settings, "poe")
+        self.assertEqual((poe.connect, poe.first_byte, poe.idle), (5.0, 300.0, 120.0))
+        lm = timeouts.for_provider(settings, "lmstudio")
+        self.assertEqual((lm.connect, lm.first_byte, lm.idle), (5.0, 3600.0, 300.0))
+
+    def test_non_streaming_calls_keep_the_long_response_budget(self):
+        poe = timeouts.for_provider(Settings(upstream_first_byte_timeout=300, lmstudio_timeout=3600), "poe")
+        self.assertEqual(poe.request_timeout(), (poe.connect, 3600.0))
+        self.assertEqual(poe.request_timeout(stream=True)[1], 300.0)
+        short = timeouts.for_provider(Settings(upstream_timeouts="poe.response=30"), "poe")
+        self.assertEqual(short.request_timeout()[1], short.first_byte)
+
+    def test_request_timeout_capped_by_deadline(self):
+        phase = timeouts.PhaseTimeouts(connect=10, first_byte=300, idle=60, deadline=time.monotonic() + 2)
+        connect, read = phase.request_timeout(stream=True)
+        self.assertLessEqual(connect, 2)
+        self.assertLessEqual(read, 2)
+        self.assertEqual(timeouts.PhaseTimeouts(10, 300, 60).request_timeout(), (10, 300))
+        self.assertEqual(timeouts.PhaseTimeouts(10, 30, 60).request_timeout(stream=True), (10, 60))
+
+    def test_deadline_from_headers(self):
+        self.assertEqual(timeouts.deadline_from_headers({"x-stainless-timeout": "600"}, now=100.0), 700.0)
+        self.assertEqual(timeouts.deadline_from_headers({"x-stainless-timeout": "soon"}, now=100.0), 0.0)
+        self.assertEqual(timeouts.deadline_from_headers({}, now=100.0), 0.0)
+
+
+class StallDetectionTestCase(unittest.TestCase):
+    def test_first_byte_stall_is_retryable(self):
+        handler = DummyHandler()
+        resp = HangingResponse()
+        phase = timeouts.PhaseTimeouts(connect=1, first_byte=0.1, idle=5)
+
+        with self.assertRaises(timeouts.UpstreamStalled) as ctx:
+            streaming.stream_openai_response(
+                resp, "poe:deepseek-v3.2", {}, handler, _logger("stall-first"), Settings(sse_ping_interval=0), phase
+            )
+
+        self.assertEqual(ctx.exception.phase, "first_byte")
+        self.assertNotIn(b"event:", handler.buffer)
+
+    def test_idle_stall_after_output_reports_error(self):
+        handler = DummyHandler()
+        resp = HangingResponse([b'data: {"choices": [{"delta": {"content": "partial"}}]}'])
+        phase = timeouts.PhaseTimeouts(connect=1, first_byte=5, idle=0.1)
+
+        streaming.stream_openai_response(
+            resp, "poe:deepseek-v3.2", {}, handler, _logger("stall-idle"), Settings(sse_ping_interval=0), phase
+        )
+
+        body = handler.buffer.decode("utf-8")
+        self.assertIn("text_delta", body)
+        self.assertIn("event: error", body)
+        self.assertIn("idle timeout", body)
+        self.assertTrue(handler.close_connection)
+
+    def test_server_retries_stall_before_output(self):
+        handler = server.AdapterHandler.__new__(server.AdapterHandler)
+        handler.close_connection = False
+        handler.sse_writer = None
+        handler.sse_headers_sent = False
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise timeouts.UpstreamStalled("first_byte", 0.1)
+            return "ok"
+
+        settings = Settings(upstream_max_retries=1, upstream_retry_backoff=0)
+        result = handler._call_upstream("poe", flaky, settings, can_retry=handler._nothing_committed)
+        self.assertEqual(result, "ok")
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()